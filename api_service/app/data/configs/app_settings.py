@@ -21,11 +21,67 @@ class AppSettings(BaseSettings):
     POOL_MIN_SIZE: int = 2
     POOL_MAX_SIZE: int = 10
     POOL_ACQUIRE_TIMEOUT: int = 30
+    DB_STATEMENT_CACHE_SIZE: int = 256  # Prepared statements kept per connection (0 disables, e.g. behind PgBouncer)
+    FAST_DB_ENABLED: bool = True  # Separate asyncpg pool for hot read queries (app/data/database/fast_db.py)
+    FAST_POOL_MIN_SIZE: int = 1
+    FAST_POOL_MAX_SIZE: int = 5
+
+    # Event Poller
+    POLL_INTERVAL: float = 2  # Used when change notifications are disabled or unavailable
+    EVENT_NOTIFY_ENABLED: bool = True  # Requires scripts/trigger_v2.sql to be applied
+    EVENT_NOTIFY_CHANNEL: str = "flowlens_events"
+    SAFETY_POLL_INTERVAL: float = 30  # Fallback poll while listening for notifications
+    CLAIM_LEASE_SECONDS: int = 300  # How long a worker may hold claimed rows before others can take them over
+    CLAIM_RETRY_DELAY_SECONDS: int = 5  # Delay before a row that failed processing is claimable again
+    POLL_CONCURRENCY: int = 4  # Rows processed in parallel per table
+    POLL_MIN_BATCH_SIZE: int = 10  # Rows claimed per cycle when caught up
+    POLL_MAX_BATCH_SIZE: int = 200  # Upper bound while draining a backlog
+    POLL_MAX_IDLE_INTERVAL: float = 10  # Idle back-off cap when notifications are unavailable
+    BACKLOG_COUNT_CAP: int = 100000  # Backlog probes stop counting past this many rows
+    POLL_SCHEDULING_MODE: str = "fair"  # "fair" (oldest first, round-robin by repository) or "newest"
+    POLL_FAIR_CANDIDATE_FACTOR: int = 5  # Candidate rows read per batch slot in fair mode
+    POLL_MAX_WAIT_SECONDS: float = 60  # Rows waiting this long are claimed before fairness applies
+    EVENT_COALESCE_WINDOW_MS: int = 50  # Bursts of changes to one PR within this window become one pass/broadcast
+
+    # Insight Jobs
+    RISK_ENGINE_ENABLED: bool = True  # Store a rule-based provisional insight as soon as a PR is seen
+    INSIGHT_WORKERS: int = 8  # Concurrent insight jobs per process; Gemini calls are bounded by AI_MAX_CONCURRENCY
+    INSIGHT_QUEUE_SIZE: int = 10  # Claimed jobs held locally waiting for a free worker
+    INSIGHT_RETRY_BASE_DELAY: int = 300  # Seconds before the first background retry, doubled per attempt
+    INSIGHT_RETRY_MAX_DELAY: int = 3600
+    INSIGHT_RETRY_AI_ATTEMPTS: int = 3  # Attempts that call the AI before switching to the fallback insight
+    INSIGHT_RETRY_MAX_ATTEMPTS: int = 5
+
+    # Insight Cache
+    INSIGHT_CACHE_ENABLED: bool = True
+    INSIGHT_CACHE_MEMORY_SIZE: int = 512  # Entries kept in the in-process LRU tier
+    INSIGHT_CACHE_TTL_SECONDS: int = 604800  # 7 days in the persistent tier
+    INSIGHT_CACHE_PURGE_INTERVAL: int = 3600  # Seconds between deletions of expired entries
 
     # Services
-    GEMINI_API_KEY: str
+    LLM_BACKEND: str = "gemini"  # "gemini", or "fake" for the local stand-in server (scripts/fake_llm_server.py)
+    FAKE_LLM_URL: str = "http://127.0.0.1:8090"  # Base URL of the fake LLM server
+    GEMINI_API_KEY: str = ""  # Required when LLM_BACKEND is "gemini"
     GEMINI_AI_MODEL: str = "gemini-2.5-flash"
     AI_TEMP: float = 0.5
+    AI_MAX_CONCURRENCY: int = 4  # Gemini requests in flight per process
+    AI_REQUEST_TIMEOUT: float = 60  # Seconds before a Gemini request is abandoned
     AI_MAX_TOKEN: int = 2048  # Increased from 1024 to handle larger responses
+    AI_PROMPT_TOKEN_BUDGET: int = 0  # Prompt tokens per request; 0 uses the model default (see prompt_packer)
+    AI_MAX_PATCH_TOKENS: int = 1500  # Upper bound for a single file's patch in the prompt
+    AI_CHUNKED_ANALYSIS_ENABLED: bool = True  # Map-reduce PRs that do not fit one prompt
+    AI_MAX_CHUNKS: int = 6  # File groups analysed per PR (in parallel, within AI_MAX_CONCURRENCY)
+    AI_STRUCTURED_OUTPUT_ENABLED: bool = True  # Ask for schema-constrained JSON (response_schema) instead of free text
+    AI_STREAMING_ENABLED: bool = True  # Stream single-PR responses and stop reading once the insight JSON is complete
+    AI_REQUESTS_PER_MINUTE: int = 60  # Client-side quota per process; 0 disables the limit
+    AI_TOKENS_PER_MINUTE: int = 250000  # Estimated prompt tokens per minute; 0 disables the limit
+    AI_CIRCUIT_FAILURE_THRESHOLD: int = 5  # Consecutive provider failures that open the circuit
+    AI_CIRCUIT_RESET_SECONDS: float = 60  # How long the circuit stays open before probing
+    AI_CIRCUIT_HALF_OPEN_PROBES: int = 1  # Requests let through while half-open
+    AI_INCREMENTAL_ENABLED: bool = True  # On new commits, re-analyse only files whose patches changed
+    AI_BATCHING_ENABLED: bool = True  # Send small PRs that arrive together in one request
+    AI_BATCH_WINDOW_MS: int = 200  # How long a small PR waits for others to join its batch while another batch is in flight
+    AI_BATCH_MAX_ITEMS: int = 8
+    AI_BATCH_ITEM_MAX_TOKENS: int = 1500  # PRs with larger packed diffs are always sent individually
 
 settings = AppSettings()
\ No newline at end of file
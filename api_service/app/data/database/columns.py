@@ -0,0 +1,63 @@
+# api_service/app/data/database/columns.py
+
+from typing import Optional, Sequence, Tuple
+
+# Named column sets per use case, so queries read only what they use.
+# pull_requests.files_changed holds every patch of the PR and is by far the largest
+# value in the database; only insight generation needs it.
+
+PULL_REQUEST_COLUMNS = (
+    "id", "repo_id", "pr_number", "title", "description", "author", "author_avatar",
+    "commit_sha", "branch_name", "base_branch", "pr_url", "commit_urls", "files_changed",
+    "additions", "deletions", "changed_files", "commits_count", "labels", "assignees",
+    "reviewers", "is_draft", "state", "merged", "merged_at", "closed_at", "history",
+    "processed", "claimed_by", "claim_expires_at", "created_at", "updated_at",
+)
+
+# Everything but the diffs: PR lists and claimed poller rows
+PR_SUMMARY = tuple(column for column in PULL_REQUEST_COLUMNS if column != "files_changed")
+PR_FILES = ("files_changed",)
+PR_HISTORY = ("history",)
+PR_METRICS = ("state", "merged", "is_draft", "additions", "deletions")
+
+# Diff stats plus the changed file names, extracted in SQL instead of shipping the patches
+PR_FILE_STATS = (
+    '"repo_id", "pr_number", "additions", "deletions", "changed_files", '
+    'CASE WHEN jsonb_typeof("files_changed") = \'array\' '
+    'THEN ARRAY(SELECT f ->> \'filename\' FROM jsonb_array_elements("files_changed") AS f '
+    'WHERE f ->> \'filename\' IS NOT NULL) '
+    'ELSE \'{}\'::TEXT[] END AS file_paths'
+)
+
+PIPELINE_RUN_COLUMNS = (
+    "id", "repo_id", "pr_number", "commit_sha", "author", "avatar_url", "title",
+    "status_pr", "status_build", "status_approval", "status_merge", "history",
+    "processed", "claimed_by", "claim_expires_at", "created_at", "updated_at",
+)
+PIPELINE_STATUS = ("status_build", "status_approval")
+
+INSIGHT_COLUMNS = (
+    "id", "repo_id", "pr_number", "commit_sha", "author", "avatar_url", "risk_level",
+    "summary", "recommendation", "provisional", "created_at",
+)
+
+# Composite keys for select_many: key column -> SQL type
+PR_KEY = {"repo_id": "UUID", "pr_number": "INT"}
+
+# Columns the poller claims per table (tables not listed return whole rows)
+POLLER_COLUMNS = {"pull_requests": PR_SUMMARY}
+
+
+def parse_fields(requested: Optional[str], allowed: Sequence[str]) -> Optional[Tuple[str, ...]]:
+    """
+    Parses a comma-separated `fields=` query parameter into column names, keeping the
+    requested order. Returns None if nothing was requested; raises ValueError for
+    columns outside `allowed`.
+    """
+    if not requested:
+        return None
+    fields = tuple(dict.fromkeys(name.strip() for name in requested.split(",") if name.strip()))
+    unknown = [name for name in fields if name not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(allowed)}")
+    return fields or None
@@ -26,6 +26,7 @@ def get_db() -> Database:
             max_size=settings.POOL_MAX_SIZE,
             ssl=ssl_context,
             force_rollback=False,  # FIXED: Allow transactions to commit
+            statement_cache_size=settings.DB_STATEMENT_CACHE_SIZE,
             server_settings={'application_name': 'flowlens-api-service'}
         )
     return database
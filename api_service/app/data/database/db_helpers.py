@@ -4,7 +4,8 @@ This module provides a simplified, consistent API for common database operations
 with integrated logging and robust error handling.
 """
 
-from typing import Any, Dict, List, Optional
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
 import asyncpg
 from loguru import logger
 from app.data.database.core_db import get_db
@@ -22,10 +23,159 @@ def quote_identifier(name: str) -> str:
     """Ensures identifiers (table or column names) are properly quoted."""
     return f'"{name}"'
 
+
+# A raw SELECT list ("*", "id, title") or column names, e.g. a set from columns.py
+Fields = Union[str, Sequence[str]]
+
+
+@lru_cache(maxsize=256)
+def _column_list(columns: Tuple[str, ...]) -> str:
+    return ", ".join(quote_identifier(column) for column in columns)
+
+
+def select_list(fields: Fields) -> str:
+    """SQL for `fields`: raw strings pass through, column names are quoted and joined."""
+    if isinstance(fields, str):
+        return fields
+    return _column_list(tuple(fields))
+
+
+# --- Query Shape Cache ---
+# The poller and the API issue the same few query shapes over and over. Every helper
+# in this module builds the SQL for its shape (operation, table, keys, order, limit,
+# fields) once, with asyncpg's native $n placeholders, and runs it on the raw asyncpg
+# connection, whose statement cache keeps each shape prepared server-side. This skips
+# rebuilding the string and the `databases` :name conversion on every call. Values are
+# passed positionally in the order of the keys that made up the shape.
+
+@lru_cache(maxsize=512)
+def _select_sql(
+    table: str,
+    where_keys: Tuple[str, ...],
+    select_fields: str,
+    order_by: Optional[str],
+    desc: bool,
+    limited: bool,
+) -> str:
+    query_parts = [f"SELECT {select_fields} FROM {quote_identifier(table)}"]
+    if where_keys:
+        query_parts.append("WHERE " + " AND ".join(
+            f'{quote_identifier(key)} = ${i}' for i, key in enumerate(where_keys, start=1)
+        ))
+    if order_by:
+        query_parts.append(f"ORDER BY {quote_identifier(order_by)} {'DESC' if desc else 'ASC'}")
+    if limited:
+        query_parts.append(f"LIMIT ${len(where_keys) + 1}")
+    return " ".join(query_parts)
+
+
+@lru_cache(maxsize=256)
+def _update_sql(table: str, data_keys: Tuple[str, ...], where_keys: Tuple[str, ...]) -> str:
+    set_clauses = [f'{quote_identifier(key)} = ${i}' for i, key in enumerate(data_keys, start=1)]
+    where_clauses = [
+        f'{quote_identifier(key)} = ${i}' for i, key in enumerate(where_keys, start=len(data_keys) + 1)
+    ]
+    return f"UPDATE {quote_identifier(table)} SET {', '.join(set_clauses)} WHERE {' AND '.join(where_clauses)}"
+
+
+@lru_cache(maxsize=256)
+def _upsert_sql(table: str, data_keys: Tuple[str, ...], conflict_keys: Tuple[str, ...]) -> str:
+    columns = ", ".join(quote_identifier(k) for k in data_keys)
+    placeholders = ", ".join(f"${i}" for i in range(1, len(data_keys) + 1))
+
+    update_columns = [col for col in data_keys if col not in conflict_keys]
+    update_clause = ", ".join(f'{quote_identifier(col)} = EXCLUDED.{quote_identifier(col)}' for col in update_columns)
+    conflict_clause = ", ".join(quote_identifier(k) for k in conflict_keys)
+
+    return (
+        f"INSERT INTO {quote_identifier(table)} ({columns}) VALUES ({placeholders}) "
+        f"ON CONFLICT ({conflict_clause}) DO UPDATE SET {update_clause}"
+    )
+
+
+@lru_cache(maxsize=128)
+def _count_sql(table: str, where_keys: Tuple[str, ...], capped: bool) -> str:
+    inner = _select_sql(table, where_keys, "1", None, False, capped)
+    return f"SELECT count(*) AS total FROM ({inner}) AS matching"
+
+
+@lru_cache(maxsize=128)
+def _insert_sql(table: str, data_keys: Tuple[str, ...]) -> str:
+    columns = ", ".join(quote_identifier(k) for k in data_keys)
+    placeholders = ", ".join(f"${i}" for i in range(1, len(data_keys) + 1))
+    return f"INSERT INTO {quote_identifier(table)} ({columns}) VALUES ({placeholders}) RETURNING *"
+
+
+@lru_cache(maxsize=128)
+def _update_many_sql(table: str, data_keys: Tuple[str, ...], where_keys: Tuple[str, ...]) -> str:
+    # $1 holds the ids, then the data values, then the extra where values
+    set_clauses = [f'{quote_identifier(key)} = ${i}' for i, key in enumerate(data_keys, start=2)]
+    where_clauses = ["id = ANY($1)"] + [
+        f'{quote_identifier(key)} = ${i}' for i, key in enumerate(where_keys, start=len(data_keys) + 2)
+    ]
+    return f"UPDATE {quote_identifier(table)} SET {', '.join(set_clauses)} WHERE {' AND '.join(where_clauses)} RETURNING id"
+
+
+@lru_cache(maxsize=128)
+def _delete_sql(table: str, where_keys: Tuple[str, ...]) -> str:
+    conditions = [f'{quote_identifier(key)} = ${i}' for i, key in enumerate(where_keys, start=1)]
+    return f"DELETE FROM {quote_identifier(table)} WHERE {' AND '.join(conditions)}"
+
+
+@lru_cache(maxsize=128)
+def _select_many_sql(table: str, key_columns: Tuple[Tuple[str, str], ...], select_fields: str) -> str:
+    # The requested keys are joined as an unnested array per key column. Their aliases
+    # (_k0, _k1, ...) cannot clash with table columns in `select_fields`, and
+    # _key_index points back to the caller's key tuple.
+    arrays = ", ".join(f"CAST(${i} AS {sql_type}[])" for i, (_, sql_type) in enumerate(key_columns, start=1))
+    aliases = ", ".join(f"_k{i}" for i in range(len(key_columns)))
+    join_on = " AND ".join(f"t.{quote_identifier(column)} = k._k{i}" for i, (column, _) in enumerate(key_columns))
+    fields = "t.*" if select_fields.strip() == "*" else select_fields
+    return (
+        f"SELECT k._key_index, {fields} "
+        f"FROM unnest({arrays}) WITH ORDINALITY AS k({aliases}, _key_index) "
+        f"JOIN {quote_identifier(table)} AS t ON {join_on}"
+    )
+
+
+def select_many_query(
+    table: str,
+    key_columns: Dict[str, str],
+    keys: List[Tuple[Any, ...]],
+    select_fields: Fields = "*",
+) -> Tuple[str, List[List[Any]]]:
+    """SQL and positional arguments (one array per key column) for `select_many`."""
+    query = _select_many_sql(table, tuple(key_columns.items()), select_list(select_fields))
+    args = [list(column_values) for column_values in zip(*keys)]
+    return query, args
+
+
+def query_cache_info() -> Dict[str, Any]:
+    """Hit/miss counters of the query shape cache."""
+    return {
+        name: builder.cache_info()._asdict()
+        for name, builder in (
+            ("select", _select_sql), ("select_many", _select_many_sql), ("count", _count_sql),
+            ("insert", _insert_sql), ("update", _update_sql), ("update_many", _update_many_sql),
+            ("upsert", _upsert_sql), ("delete", _delete_sql),
+            ("select_claimable", _claimable_sql), ("claim_batch", _claim_batch_sql),
+            ("release_claims", _release_claims_sql),
+        )
+    }
+
+
+async def _run_prepared(method: str, query: str, args: List[Any]) -> Any:
+    """
+    Runs `query` on the raw asyncpg connection of the current task, so it takes part
+    in any open `databases` transaction.
+    """
+    async with get_db().connection() as connection:
+        return await getattr(connection.raw_connection, method)(query, *args)
+
 async def select(
     table: str,
     where: Optional[Dict[str, Any]] = None,
-    select_fields: str = "*",
+    select_fields: Fields = "*",
     order_by: Optional[str] = None,
     desc: bool = False,
     limit: Optional[int] = None,
@@ -33,31 +183,15 @@ async def select(
     """
     Returns a list of rows (as dicts) with logging and error handling.
     """
-    db = get_db()
-    table_quoted = quote_identifier(table)
-    
-    query_parts = [f"SELECT {select_fields} FROM {table_quoted}"]
-    values = {}
-
-    if where:
-        conditions = []
-        for key, val in where.items():
-            conditions.append(f'{quote_identifier(key)} = :{key}')
-            values[key] = val
-        query_parts.append("WHERE " + " AND ".join(conditions))
-
-    if order_by:
-        query_parts.append(f"ORDER BY {quote_identifier(order_by)} {'DESC' if desc else 'ASC'}")
-    
+    where = where or {}
+    query = _select_sql(table, tuple(where), select_list(select_fields), order_by, desc, limit is not None)
+    args = list(where.values())
     if limit is not None:
-        query_parts.append(f"LIMIT :limit")
-        values["limit"] = limit
-    
-    query = " ".join(query_parts)
-    logger.debug(f"Executing SELECT: {query} with values: {values}")
+        args.append(limit)
+    logger.debug("Executing SELECT: {} with values: {}", query, args)
 
     try:
-        rows = await db.fetch_all(query, values)
+        rows = await _run_prepared("fetch", query, args)
         return [dict(row) for row in rows]
     except asyncpg.PostgresError as e:
         logger.error(f"Database SELECT failed for table '{table}'. Query: {query}, Error: {e}")
@@ -67,31 +201,55 @@ async def select(
         raise DatabaseError(f"An unexpected error occurred while selecting from {table}: {e}") from e
 
 
+async def select_many(
+    table: str,
+    key_columns: Dict[str, str],
+    keys: Iterable[Tuple[Any, ...]],
+    select_fields: Fields = "*",
+) -> Dict[Tuple[Any, ...], Dict[str, Any]]:
+    """
+    Fetches the rows for many composite keys in one round trip, e.g.
+    key_columns={"repo_id": "UUID", "pr_number": "INT"} with keys=[(repo_id, 7), ...].
+    `key_columns` maps each key column to its SQL type, in key tuple order. Keys should
+    identify at most one row each. Returns {key: row (as a dict)}, using the tuples as
+    given; keys without a row are left out.
+    """
+    keys = list(dict.fromkeys(keys))
+    if not keys:
+        return {}
+
+    query, args = select_many_query(table, key_columns, keys, select_fields)
+    logger.debug("Executing SELECT_MANY: {} with {} keys", query, len(keys))
+
+    try:
+        rows = await _run_prepared("fetch", query, args)
+    except asyncpg.PostgresError as e:
+        logger.error(f"Database SELECT_MANY failed for table '{table}'. Query: {query}, Error: {e}")
+        raise DatabaseError(f"Failed to select many from {table}: {e}") from e
+    except Exception as e:
+        logger.error(f"An unexpected error occurred during SELECT_MANY on table '{table}'. Query: {query}, Error: {e}")
+        raise DatabaseError(f"An unexpected error occurred while selecting many from {table}: {e}") from e
+
+    result = {}
+    for row in rows:
+        row = dict(row)
+        result[keys[row.pop("_key_index") - 1]] = row
+    return result
+
+
 async def select_one(
     table: str,
     where: Optional[Dict[str, Any]] = None,
-    select_fields: str = "*"
+    select_fields: Fields = "*"
 ) -> Optional[Dict[str, Any]]:
     """Returns a single row (as a dict) or None, with logging and error handling."""
-    db = get_db()
-    table_quoted = quote_identifier(table)
-
-    query_parts = [f"SELECT {select_fields} FROM {table_quoted}"]
-    values = {}
-
-    if where:
-        conditions = []
-        for key, val in where.items():
-            conditions.append(f'{quote_identifier(key)} = :{key}')
-            values[key] = val
-        query_parts.append("WHERE " + " AND ".join(conditions))
-    
-    query_parts.append("LIMIT 1")
-    query = " ".join(query_parts)
-    logger.debug(f"Executing SELECT_ONE: {query} with values: {values}")
+    where = where or {}
+    query = _select_sql(table, tuple(where), select_list(select_fields), None, False, True)
+    args = [*where.values(), 1]
+    logger.debug("Executing SELECT_ONE: {} with values: {}", query, args)
 
     try:
-        row = await db.fetch_one(query, values)
+        row = await _run_prepared("fetchrow", query, args)
         return dict(row) if row else None
     except asyncpg.PostgresError as e:
         logger.error(f"Database SELECT_ONE failed for table '{table}'. Query: {query}, Error: {e}")
@@ -101,19 +259,41 @@ async def select_one(
         raise DatabaseError(f"An unexpected error occurred while selecting one from {table}: {e}") from e
 
 
+async def count(
+    table: str,
+    where: Optional[Dict[str, Any]] = None,
+    cap: Optional[int] = None,
+) -> int:
+    """
+    Counts matching rows with logging and error handling.
+    With `cap`, counting stops after `cap` rows so large tables stay cheap to probe.
+    """
+    where = where or {}
+    query = _count_sql(table, tuple(where), cap is not None)
+    args = list(where.values())
+    if cap is not None:
+        args.append(cap)
+    logger.debug("Executing COUNT: {} with values: {}", query, args)
+
+    try:
+        row = await _run_prepared("fetchrow", query, args)
+        return row["total"] if row else 0
+    except asyncpg.PostgresError as e:
+        logger.error(f"Database COUNT failed for table '{table}'. Query: {query}, Error: {e}")
+        raise DatabaseError(f"Failed to count rows in {table}: {e}") from e
+    except Exception as e:
+        logger.error(f"An unexpected error occurred during COUNT on table '{table}'. Query: {query}, Error: {e}")
+        raise DatabaseError(f"An unexpected error occurred while counting rows in {table}: {e}") from e
+
+
 async def insert(table: str, data: Dict[str, Any]) -> Dict[str, Any]:
     """Inserts a single row with logging and error handling, returning the inserted row."""
-    db = get_db()
-    table_quoted = quote_identifier(table)
-
-    columns = ", ".join(quote_identifier(k) for k in data.keys())
-    placeholders = ", ".join(f":{k}" for k in data.keys())
-    
-    query = f"INSERT INTO {table_quoted} ({columns}) VALUES ({placeholders}) RETURNING *"
-    logger.debug(f"Executing INSERT: {query} with values: {data}")
+    query = _insert_sql(table, tuple(data))
+    args = list(data.values())
+    logger.debug("Executing INSERT: {} with values: {}", query, args)
 
     try:
-        result = await db.fetch_one(query, data)
+        result = await _run_prepared("fetchrow", query, args)
         return dict(result)
     except asyncpg.PostgresError as e:
         logger.error(f"Database INSERT failed for table '{table}'. Query: {query}, Error: {e}")
@@ -125,20 +305,12 @@ async def insert(table: str, data: Dict[str, Any]) -> Dict[str, Any]:
 
 async def update(table: str, data: Dict[str, Any], where: Dict[str, Any]):
     """Updates rows with logging and error handling."""
-    db = get_db()
-    table_quoted = quote_identifier(table)
-
-    set_clauses = [f'{quote_identifier(key)} = :d_{key}' for key in data.keys()]
-    where_clauses = [f'{quote_identifier(key)} = :w_{key}' for key in where.keys()]
-    
-    values = {f"d_{k}": v for k, v in data.items()}
-    values.update({f"w_{k}": v for k, v in where.items()})
-
-    query = f"UPDATE {table_quoted} SET {', '.join(set_clauses)} WHERE {' AND '.join(where_clauses)}"
-    logger.debug(f"Executing UPDATE: {query} with values: {values}")
+    query = _update_sql(table, tuple(data), tuple(where))
+    args = [*data.values(), *where.values()]
+    logger.debug("Executing UPDATE: {} with values: {}", query, args)
 
     try:
-        await db.execute(query, values)
+        await _run_prepared("execute", query, args)
     except asyncpg.PostgresError as e:
         logger.error(f"Database UPDATE failed for table '{table}'. Query: {query}, Error: {e}")
         raise DatabaseError(f"Failed to update {table}: {e}") from e
@@ -147,26 +319,44 @@ async def update(table: str, data: Dict[str, Any], where: Dict[str, Any]):
         raise DatabaseError(f"An unexpected error occurred while updating {table}: {e}") from e
 
 
-async def upsert(table: str, data: Dict[str, Any], conflict_keys: List[str]):
-    """Performs an UPSERT with logging and error handling."""
-    db = get_db()
-    table_quoted = quote_identifier(table)
+async def update_many(
+    table: str,
+    ids: List[Any],
+    data: Dict[str, Any],
+    where: Optional[Dict[str, Any]] = None,
+) -> List[Any]:
+    """
+    Updates every row whose id is in `ids` with a single statement (id = ANY($1)).
+    Optional `where` conditions further restrict the rows.
+    Returns the ids that were actually updated, so callers can detect partial updates.
+    """
+    if not ids:
+        return []
 
-    columns = ", ".join(quote_identifier(k) for k in data.keys())
-    placeholders = ", ".join(f":{k}" for k in data.keys())
+    where = where or {}
+    query = _update_many_sql(table, tuple(data), tuple(where))
+    args = [list(ids), *data.values(), *where.values()]
+    logger.debug("Executing UPDATE_MANY: {} with {} ids", query, len(ids))
 
-    update_columns = [col for col in data.keys() if col not in conflict_keys]
-    update_clause = ", ".join(f'{quote_identifier(col)} = EXCLUDED.{quote_identifier(col)}' for col in update_columns)
-    conflict_clause = ", ".join(quote_identifier(k) for k in conflict_keys)
+    try:
+        rows = await _run_prepared("fetch", query, args)
+        return [row["id"] for row in rows]
+    except asyncpg.PostgresError as e:
+        logger.error(f"Database UPDATE_MANY failed for table '{table}'. Query: {query}, Error: {e}")
+        raise DatabaseError(f"Failed to update {table}: {e}") from e
+    except Exception as e:
+        logger.error(f"An unexpected error occurred during UPDATE_MANY on table '{table}'. Query: {query}, Error: {e}")
+        raise DatabaseError(f"An unexpected error occurred while updating {table}: {e}") from e
 
-    query = (
-        f"INSERT INTO {table_quoted} ({columns}) VALUES ({placeholders}) "
-        f"ON CONFLICT ({conflict_clause}) DO UPDATE SET {update_clause}"
-    )
-    logger.debug(f"Executing UPSERT: {query} with values: {data}")
+
+async def upsert(table: str, data: Dict[str, Any], conflict_keys: List[str]):
+    """Performs an UPSERT with logging and error handling."""
+    query = _upsert_sql(table, tuple(data), tuple(conflict_keys))
+    args = list(data.values())
+    logger.debug("Executing UPSERT: {} with values: {}", query, args)
 
     try:
-        await db.execute(query, data)
+        await _run_prepared("execute", query, args)
     except asyncpg.PostgresError as e:
         logger.error(f"Database UPSERT failed for table '{table}'. Query: {query}, Error: {e}")
         raise DatabaseError(f"Failed to upsert into {table}: {e}") from e
@@ -180,34 +370,17 @@ async def batch_upsert(table: str, data_list: List[Dict[str, Any]], conflict_key
     if not data_list:
         return
 
-    db = get_db()
-    table_quoted = quote_identifier(table)
-    columns = list(data_list[0].keys())
-    
-    fields_clause = ", ".join(quote_identifier(k) for k in columns)
-    
-    update_columns = [col for col in columns if col not in conflict_keys]
-    update_clause = ", ".join(f'{quote_identifier(col)} = EXCLUDED.{quote_identifier(col)}' for col in update_columns)
-    conflict_clause = ", ".join(quote_identifier(k) for k in conflict_keys)
+    columns = tuple(data_list[0].keys())
+    query = _upsert_sql(table, columns, tuple(conflict_keys))
 
-    # Note: The query string for executemany with 'databases' and asyncpg
-    # should use the native asyncpg parameter style ($1, $2, etc.).
-    # We construct the query string once.
-    placeholders = ", ".join(f"${i+1}" for i, _ in enumerate(columns))
-    query = (
-        f"INSERT INTO {table_quoted} ({fields_clause}) VALUES ({placeholders}) "
-        f"ON CONFLICT ({conflict_clause}) DO UPDATE SET {update_clause}"
-    )
-    
-    # For executemany, we need a list of lists, where the order of values
-    # in the inner list matches the order of columns in the query.
+    # One list of values per row, in the order of the columns in the query
     values_to_execute = [[item.get(col) for col in columns] for item in data_list]
-    logger.debug(f"Executing BATCH_UPSERT on table '{table}' with {len(values_to_execute)} records.")
+    logger.debug("Executing BATCH_UPSERT on table '{}' with {} records.", table, len(values_to_execute))
 
     try:
         # Use a transaction for batch operations to ensure atomicity
-        async with db.transaction():
-            await db.execute_many(query=query, values=values_to_execute)
+        async with get_db().transaction():
+            await _run_prepared("executemany", query, [values_to_execute])
     except asyncpg.PostgresError as e:
         logger.error(f"Database BATCH_UPSERT failed for table '{table}'. Error: {e}")
         raise DatabaseError(f"Failed to batch upsert into {table}: {e}") from e
@@ -218,23 +391,139 @@ async def batch_upsert(table: str, data_list: List[Dict[str, Any]], conflict_key
 
 async def delete(table: str, where: Dict[str, Any]):
     """Deletes rows with logging and error handling."""
-    db = get_db()
-    table_quoted = quote_identifier(table)
-
-    conditions = []
-    values = {}
-    for key, val in where.items():
-        conditions.append(f'{quote_identifier(key)} = :{key}')
-        values[key] = val
-
-    query = f"DELETE FROM {table_quoted} WHERE {' AND '.join(conditions)}"
-    logger.debug(f"Executing DELETE: {query} with values: {values}")
+    query = _delete_sql(table, tuple(where))
+    args = list(where.values())
+    logger.debug("Executing DELETE: {} with values: {}", query, args)
 
     try:
-        await db.execute(query, values)
+        await _run_prepared("execute", query, args)
     except asyncpg.PostgresError as e:
         logger.error(f"Database DELETE failed for table '{table}'. Query: {query}, Error: {e}")
         raise DatabaseError(f"Failed to delete from {table}: {e}") from e
     except Exception as e:
         logger.error(f"An unexpected error occurred during DELETE on table '{table}'. Query: {query}, Error: {e}")
-        raise DatabaseError(f"An unexpected error occurred while deleting from {table}: {e}") from e
\ No newline at end of file
+        raise DatabaseError(f"An unexpected error occurred while deleting from {table}: {e}") from e
+
+# --- Claim / Lease Helpers for Multi-Worker Processing ---
+
+_CLAIMABLE = "processed = FALSE AND (claim_expires_at IS NULL OR claim_expires_at < now())"
+
+
+@lru_cache(maxsize=64)
+def _claimable_sql(table: str, select_fields: str, order_by: str, desc: bool) -> str:
+    return (
+        f"SELECT {select_fields} FROM {quote_identifier(table)} WHERE {_CLAIMABLE} "
+        f"ORDER BY {quote_identifier(order_by)} {'DESC' if desc else 'ASC'} LIMIT $1"
+    )
+
+
+@lru_cache(maxsize=64)
+def _claim_batch_sql(table: str, order_by: str, desc: bool, by_ids: bool, returning: Optional[Tuple[str, ...]]) -> str:
+    # $1 limit, $2 worker id, $3 lease seconds, $4 ids (only with by_ids)
+    table_quoted = quote_identifier(table)
+    id_filter = "AND id = ANY($4) " if by_ids else ""
+    returning_clause = ", ".join(f"t.{quote_identifier(column)}" for column in returning) if returning else "t.*"
+    return (
+        f"WITH claimable AS ("
+        f"SELECT id FROM {table_quoted} WHERE {_CLAIMABLE} {id_filter}"
+        f"ORDER BY {quote_identifier(order_by)} {'DESC' if desc else 'ASC'} LIMIT $1 "
+        f"FOR UPDATE SKIP LOCKED) "
+        f"UPDATE {table_quoted} AS t "
+        f"SET claimed_by = $2, claim_expires_at = now() + make_interval(secs => $3) "
+        f"FROM claimable WHERE t.id = claimable.id "
+        f"RETURNING {returning_clause}"
+    )
+
+
+@lru_cache(maxsize=64)
+def _release_claims_sql(table: str) -> str:
+    return (
+        f"UPDATE {quote_identifier(table)} "
+        f"SET claimed_by = NULL, claim_expires_at = now() + make_interval(secs => $3) "
+        f"WHERE id = ANY($1) AND claimed_by = $2"
+    )
+
+
+async def select_claimable(
+    table: str,
+    select_fields: str,
+    limit: int,
+    order_by: str = "updated_at",
+    desc: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Reads unprocessed, unclaimed rows without locking them, so a scheduler can
+    choose which ones to claim. Callers should select only the columns they need.
+    """
+    query = _claimable_sql(table, select_fields, order_by, desc)
+    logger.debug("Executing SELECT_CLAIMABLE: {} with limit {}", query, limit)
+
+    try:
+        rows = await _run_prepared("fetch", query, [limit])
+        return [dict(row) for row in rows]
+    except asyncpg.PostgresError as e:
+        logger.error(f"Database SELECT_CLAIMABLE failed for table '{table}'. Query: {query}, Error: {e}")
+        raise DatabaseError(f"Failed to select claimable rows from {table}: {e}") from e
+    except Exception as e:
+        logger.error(f"An unexpected error occurred during SELECT_CLAIMABLE on table '{table}'. Query: {query}, Error: {e}")
+        raise DatabaseError(f"An unexpected error occurred while selecting claimable rows from {table}: {e}") from e
+
+
+async def claim_batch(
+    table: str,
+    worker_id: str,
+    limit: int,
+    lease_seconds: int,
+    order_by: str = "updated_at",
+    desc: bool = False,
+    ids: Optional[List[Any]] = None,
+    returning: Optional[Sequence[str]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Atomically claims up to `limit` unprocessed rows for `worker_id`.
+    Rows locked by another transaction are skipped (FOR UPDATE SKIP LOCKED) and
+    rows whose lease has expired (e.g. their worker crashed) become claimable again.
+    If `ids` is given, only those rows are claimed (those still claimable).
+    Returns the claimed rows (as dicts, limited to the `returning` columns if given;
+    these must include `order_by`) in the requested order.
+    """
+    query = _claim_batch_sql(table, order_by, desc, ids is not None, tuple(returning) if returning else None)
+    args = [limit, worker_id, lease_seconds]
+    if ids is not None:
+        args.append(list(ids))
+    logger.debug("Executing CLAIM_BATCH: {} with values: {}", query, args)
+
+    try:
+        rows = await _run_prepared("fetch", query, args)
+        claimed = [dict(row) for row in rows]
+        # UPDATE ... RETURNING does not preserve the CTE order
+        claimed.sort(key=lambda row: row[order_by], reverse=desc)
+        return claimed
+    except asyncpg.PostgresError as e:
+        logger.error(f"Database CLAIM_BATCH failed for table '{table}'. Query: {query}, Error: {e}")
+        raise DatabaseError(f"Failed to claim rows from {table}: {e}") from e
+    except Exception as e:
+        logger.error(f"An unexpected error occurred during CLAIM_BATCH on table '{table}'. Query: {query}, Error: {e}")
+        raise DatabaseError(f"An unexpected error occurred while claiming rows from {table}: {e}") from e
+
+
+async def release_claims(table: str, ids: List[Any], worker_id: str, retry_after_seconds: int = 0):
+    """
+    Releases claims held by `worker_id` without marking the rows processed,
+    making them claimable again after `retry_after_seconds`.
+    """
+    if not ids:
+        return
+
+    query = _release_claims_sql(table)
+    args = [list(ids), worker_id, retry_after_seconds]
+    logger.debug("Executing RELEASE_CLAIMS: {} with values: {}", query, args)
+
+    try:
+        await _run_prepared("execute", query, args)
+    except asyncpg.PostgresError as e:
+        logger.error(f"Database RELEASE_CLAIMS failed for table '{table}'. Query: {query}, Error: {e}")
+        raise DatabaseError(f"Failed to release claims on {table}: {e}") from e
+    except Exception as e:
+        logger.error(f"An unexpected error occurred during RELEASE_CLAIMS on table '{table}'. Query: {query}, Error: {e}")
+        raise DatabaseError(f"An unexpected error occurred while releasing claims on {table}: {e}") from e
@@ -0,0 +1,159 @@
+# api_service/app/data/database/fast_db.py
+
+import json
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+import asyncpg
+from databases import DatabaseURL
+from loguru import logger
+from app.data.configs.app_settings import settings
+from app.data.database.core_db import _create_ssl_context, get_db
+from app.data.database.db_helpers import DatabaseError, Fields, _select_sql, select_list, select_many_query
+
+# Fast-path reads for hot list queries, straight on an asyncpg pool.
+# Rows come back as asyncpg Records: read-only mappings (row['col'], row.get('col'),
+# row.items()) that are not copied into dicts. json/jsonb columns are decoded once by
+# codecs registered when each pooled connection is created, so callers get Python
+# objects, not JSON strings. Query parameters of json/jsonb type therefore take Python
+# objects too.
+#
+# When the pool is disabled (FAST_DB_ENABLED) or could not connect, queries run on the
+# `databases` pool instead. That pool has no JSON codecs (db_helpers writes JSON
+# strings), so json/jsonb columns are decoded here and rows come back as dicts:
+# the types callers see never depend on which pool served the query.
+
+pool: Optional[asyncpg.Pool] = None
+
+# json/jsonb column names per query text, for queries served by the main pool
+_json_columns: Dict[str, List[str]] = {}
+
+
+async def _init_connection(connection: asyncpg.Connection):
+    """Registers the type codecs once per pooled connection."""
+    for type_name in ("json", "jsonb"):
+        await connection.set_type_codec(type_name, encoder=json.dumps, decoder=json.loads, schema="pg_catalog")
+
+
+async def connect():
+    global pool
+    if pool is not None or not settings.FAST_DB_ENABLED:
+        return
+    url = DatabaseURL(settings.DATABASE_URL)
+    logger.info("Connecting fast-path database pool...")
+    try:
+        pool = await asyncpg.create_pool(
+            host=url.hostname,
+            port=url.port,
+            user=url.username,
+            password=url.password,
+            database=url.database,
+            min_size=settings.FAST_POOL_MIN_SIZE,
+            max_size=settings.FAST_POOL_MAX_SIZE,
+            ssl=_create_ssl_context(),
+            statement_cache_size=settings.DB_STATEMENT_CACHE_SIZE,
+            server_settings={'application_name': 'flowlens-api-service-fast'},
+            init=_init_connection,
+        )
+        logger.success("Fast-path database pool connected.")
+    except Exception as e:
+        # Reads fall back to the main pool
+        logger.error(f"Could not connect fast-path database pool, using the main pool: {e}")
+        pool = None
+
+
+async def disconnect():
+    global pool
+    if pool is not None:
+        logger.info("Closing fast-path database pool...")
+        await pool.close()
+        pool = None
+        logger.success("Fast-path database pool closed.")
+
+
+def is_connected() -> bool:
+    return pool is not None
+
+
+def _decode_json_columns(row: asyncpg.Record, json_columns: List[str]) -> Dict[str, Any]:
+    data = dict(row)
+    for column in json_columns:
+        if isinstance(data[column], str):
+            data[column] = json.loads(data[column])
+    return data
+
+
+async def _run_on_main_pool(method: str, query: str, args: tuple) -> Any:
+    """
+    Runs the query on the `databases` pool, decoding json/jsonb columns like the codecs do.
+    The query goes through asyncpg's statement cache; its json/jsonb columns are looked
+    up once per query text.
+    """
+    async with get_db().connection() as connection:
+        raw_connection = connection.raw_connection
+        json_columns = _json_columns.get(query)
+        if json_columns is None:
+            statement = await raw_connection.prepare(query)
+            json_columns = [attribute.name for attribute in statement.get_attributes() if attribute.type.name in ("json", "jsonb")]
+            _json_columns[query] = json_columns
+        rows = await raw_connection.fetch(query, *args)
+    if json_columns:
+        rows = [_decode_json_columns(row, json_columns) for row in rows]
+    if method == "fetchrow":
+        return rows[0] if rows else None
+    return rows
+
+
+async def _run(method: str, query: str, args: tuple) -> Any:
+    try:
+        if pool is not None:
+            return await getattr(pool, method)(query, *args)
+        return await _run_on_main_pool(method, query, args)
+    except asyncpg.PostgresError as e:
+        logger.error(f"Fast-path query failed. Query: {query}, Error: {e}")
+        raise DatabaseError(f"Failed to run query: {e}") from e
+    except Exception as e:
+        logger.error(f"An unexpected error occurred during a fast-path query. Query: {query}, Error: {e}")
+        raise DatabaseError(f"An unexpected error occurred while running a query: {e}") from e
+
+
+async def fetch(query: str, *args: Any) -> List[Mapping[str, Any]]:
+    """Runs a query with $n placeholders and returns its rows (Records on the fast pool)."""
+    return await _run("fetch", query, args)
+
+
+async def fetchrow(query: str, *args: Any) -> Optional[Mapping[str, Any]]:
+    """Like `fetch`, for the first row only (or None)."""
+    return await _run("fetchrow", query, args)
+
+
+async def select(
+    table: str,
+    where: Optional[Dict[str, Any]] = None,
+    select_fields: Fields = "*",
+    order_by: Optional[str] = None,
+    desc: bool = False,
+    limit: Optional[int] = None,
+) -> List[Mapping[str, Any]]:
+    """Same query shapes as db_helpers.select, returning Records instead of dicts."""
+    where = where or {}
+    query = _select_sql(table, tuple(where), select_list(select_fields), order_by, desc, limit is not None)
+    args = list(where.values())
+    if limit is not None:
+        args.append(limit)
+    logger.debug("Executing fast SELECT: {} with values: {}", query, args)
+    return await fetch(query, *args)
+
+
+async def select_many(
+    table: str,
+    key_columns: Dict[str, str],
+    keys: Iterable[Tuple[Any, ...]],
+    select_fields: Fields = "*",
+) -> Dict[Tuple[Any, ...], Mapping[str, Any]]:
+    """Same as db_helpers.select_many, returning Records (with an extra _key_index column)."""
+    keys = list(dict.fromkeys(keys))
+    if not keys:
+        return {}
+    query, args = select_many_query(table, key_columns, keys, select_fields)
+    logger.debug("Executing fast SELECT_MANY: {} with {} keys", query, len(keys))
+    rows = await fetch(query, *args)
+    return {keys[row["_key_index"] - 1]: row for row in rows}
@@ -3,6 +3,7 @@
 from pydantic import BaseModel
 from typing import List, Optional, Any
 from datetime import datetime
+from enum import Enum
 from uuid import UUID
 
 # A base model for common fields
@@ -72,6 +73,37 @@ class Repository(Base):
     open_prs: int = 0
     total_prs: int = 0
 
+# --- AI Output Models ---
+# Sent to Gemini as response schemas (structured output) and used to validate its answers.
+class RiskLevel(str, Enum):
+    LOW = 'low'
+    MEDIUM = 'medium'
+    HIGH = 'high'
+
+    @classmethod
+    def _missing_(cls, value):
+        # Models sometimes answer "High" or "HIGH"
+        if isinstance(value, str):
+            return cls.__members__.get(value.strip().upper())
+        return None
+
+class AIInsight(BaseModel):
+    risk_level: RiskLevel
+    summary: str
+    recommendation: str
+
+class AIBatchInsight(AIInsight):
+    repo_id: str
+    pr_number: int
+
+class AIFileFinding(BaseModel):
+    filename: str
+    risk_level: RiskLevel
+    note: str
+
+class AIIncrementalInsight(AIInsight):
+    files: List[AIFileFinding] = []
+
 # --- Composite Model for Rich API/WebSocket Payloads ---
 # This is what the frontend really wants: a single object with everything.
 class FullPullRequestDetails(BaseModel):
@@ -3,14 +3,19 @@
 import asyncio
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from contextlib import asynccontextmanager
 from loguru import logger
 from app.routes import api
 from app.data.configs.logging_configs import setup_logging
 from app.data.database.core_db import connect as db_connect, disconnect as db_disconnect
+from app.data.database import fast_db
 from app.services.websocket_manager import websocket_manager
+from app.services import metrics
 from app.data.configs.app_settings import settings
-from app.services.event_poller import poll_for_events, stop_poller
+from app.services.event_poller import poll_for_events, stop_poller, get_poller_state, WORKER_ID
+from app.services.event_listener import listen_for_events, stop_listener, is_listening
+from app.services.insight_worker import run_insight_workers, stop_insight_workers, get_insight_worker_state
 
 background_tasks = []
 
@@ -18,21 +23,34 @@ background_tasks = []
 async def lifespan(app: FastAPI):
     global background_tasks
     setup_logging()
-    logger.info("Starting FlowLens API Service with polling-based architecture...")
+    logger.info("Starting FlowLens API Service with event-driven polling architecture...")
     await db_connect()
+    await fast_db.connect()
 
-    # Start only the polling service (removed trigger logic completely)
-    logger.info("Starting database poller with 2-second interval...")
+    # Subscribe to change notifications so the poller wakes immediately on new events
+    if settings.EVENT_NOTIFY_ENABLED:
+        logger.info(f"Starting change notification listener on channel '{settings.EVENT_NOTIFY_CHANNEL}'...")
+        listener_task = asyncio.create_task(listen_for_events())
+        background_tasks.append(listener_task)
+
+    logger.info("Starting database poller...")
     poller_task = asyncio.create_task(poll_for_events())
     background_tasks.append(poller_task)
 
-    logger.success("FlowLens API Service startup complete! Polling architecture ready.")
+    # AI insights are generated off the broadcast path by a dedicated worker pool
+    logger.info("Starting insight worker pool...")
+    insight_task = asyncio.create_task(run_insight_workers(WORKER_ID))
+    background_tasks.append(insight_task)
+
+    logger.success("FlowLens API Service startup complete! Event-driven polling architecture ready.")
     yield
     
     logger.info("Shutting down FlowLens API Service...")
     
-    # Signal poller to stop
+    # Signal poller, listener and insight workers to stop
     stop_poller()
+    stop_listener()
+    stop_insight_workers()
         
     # Gracefully cancel all running tasks
     for task in background_tasks:
@@ -45,6 +63,7 @@ async def lifespan(app: FastAPI):
     except asyncio.CancelledError:
         pass
     
+    await fast_db.disconnect()
     await db_disconnect()
     logger.success("FlowLens API Service shutdown complete!")
 
@@ -82,6 +101,10 @@ async def websocket_endpoint(websocket: WebSocket):
     except WebSocketDisconnect:
         websocket_manager.disconnect(websocket)
 
+def _processing_mode() -> str:
+    """NOTIFY while change notifications are being received, POLL otherwise."""
+    return "NOTIFY" if is_listening() else "POLL"
+
 @app.get("/")
 async def root():
     """Health check endpoint."""
@@ -90,7 +113,7 @@ async def root():
         "service": "flowlens-api-service",
         "version": "2.0.0",
         "architecture": "repository-centric",
-        "processing_mode": "POLL"
+        "processing_mode": _processing_mode()
     }
 
 @app.get("/health")
@@ -104,7 +127,8 @@ async def health_check():
         return {
             "status": "healthy",
             "database": "connected",
-            "processing_mode": "POLL",
+            "fast_pool": "connected" if fast_db.is_connected() else "disabled",
+            "processing_mode": _processing_mode(),
             "version": "2.0.0"
         }
     except Exception as e:
@@ -114,4 +138,19 @@ async def health_check():
             "database": "disconnected",
             "error": str(e),
             "version": "2.0.0"
-        }
\ No newline at end of file
+        }
+
+@app.get("/health/poller")
+async def poller_status():
+    """Adaptive poller state per table: mode, batch size, backlog and next wait."""
+    return get_poller_state()
+
+@app.get("/health/insights")
+async def insight_worker_status():
+    """Insight worker pool state: workers, busy workers, locally queued jobs and totals."""
+    return get_insight_worker_state()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Poller, insight and broadcast metrics in the Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -1,18 +1,17 @@
 # api_service/app/routes/api.py
 
 import json
-from typing import Optional
+from typing import Mapping, Optional
 from datetime import datetime
 from fastapi import APIRouter, HTTPException, Query
 from loguru import logger
-from app.data.database.core_db import get_db
-from app.data.database import db_helpers
+from app.data.database import columns, fast_db
 
 router = APIRouter(prefix="/api", tags=["Frontend API"])
 
 
-def _serialize_datetime_fields(data: dict) -> dict:
-    """Convert datetime objects to ISO format strings for JSON serialization."""
+def _serialize_datetime_fields(data: Mapping) -> dict:
+    """Convert datetime objects to ISO format strings for JSON serialization (one copy per row)."""
     serialized = {}
     for key, value in data.items():
         if isinstance(value, datetime):
@@ -22,24 +21,13 @@ def _serialize_datetime_fields(data: dict) -> dict:
     return serialized
 
 
-async def _build_pr_history(repo_id: str, pr_number: int) -> list:
+def _build_pr_history(pr_history, pr_number: int) -> list:
     """
-    Build comprehensive PR history by extracting state changes from PR history.
+    Build comprehensive PR history by extracting state changes from the PR's history column.
     Returns a chronological list of state changes with state_name and timestamp.
     """
     try:
-        # Get PR record with history
-        pr_records = await db_helpers.select(
-            table="pull_requests",
-            where={"repo_id": repo_id, "pr_number": pr_number},
-            limit=1
-        )
-        
-        if not pr_records:
-            logger.warning(f"No PR record found for repo {repo_id}, PR #{pr_number}")
-            return []
-        
-        pr_history = pr_records[0].get('history', [])
+        pr_history = pr_history if pr_history is not None else []
         
         # Handle case where history might be stored as JSON string
         if isinstance(pr_history, str):
@@ -91,121 +79,48 @@ async def _build_pr_history(repo_id: str, pr_number: int) -> list:
         return history_events
         
     except Exception as e:
-        logger.error(f"Failed to build history for PR #{pr_number} in repo {repo_id}: {e}")
+        logger.error(f"Failed to build history for PR #{pr_number}: {e}")
         return []
 
 
-async def _calculate_pr_metrics(repo_id: str) -> dict:
-    """Calculate comprehensive PR metrics for a repository."""
-    try:
-        # Get all PRs for this repository
-        all_prs = await db_helpers.select(
-            table="pull_requests",
-            where={"repo_id": repo_id}
-        )
-        
-        total = len(all_prs)
-        open_count = 0
-        merged_count = 0
-        closed_count = 0
-        draft_count = 0
-        total_changes = 0
-        pr_count_with_changes = 0
-        
-        for pr in all_prs:
-            state = pr.get("state", "open")
-            merged = pr.get("merged", False)
-            is_draft = pr.get("is_draft", False)
-            
-            if is_draft:
-                draft_count += 1
-            elif merged:
-                merged_count += 1
-            elif state == "closed":
-                closed_count += 1
-            elif state == "open":
-                open_count += 1
-            
-            # Calculate average PR size
-            additions = pr.get("additions", 0) or 0
-            deletions = pr.get("deletions", 0) or 0
-            if additions > 0 or deletions > 0:
-                total_changes += additions + deletions
-                pr_count_with_changes += 1
-        
-        avg_changes = total_changes // pr_count_with_changes if pr_count_with_changes > 0 else 0
-        
-        return {
-            "total": total,
-            "open": open_count,
-            "merged": merged_count,
-            "closed": closed_count,
-            "draft": draft_count,
-            "avg_changes": avg_changes
-        }
-        
-    except Exception as e:
-        logger.error(f"Failed to calculate PR metrics for repo {repo_id}: {e}")
-        return {"total": 0, "open": 0, "merged": 0, "closed": 0, "draft": 0, "avg_changes": 0}
+# Per-repository metrics, one grouped query per table for all repositories.
+# A PR counts as draft first, then merged, then closed or open; the average PR size
+# only covers PRs with changes.
+_PR_METRICS_QUERY = """
+    SELECT repo_id,
+        count(*) AS total,
+        count(*) FILTER (WHERE is_draft IS NOT TRUE AND merged IS NOT TRUE AND state = 'open') AS open,
+        count(*) FILTER (WHERE is_draft IS NOT TRUE AND merged) AS merged,
+        count(*) FILTER (WHERE is_draft IS NOT TRUE AND merged IS NOT TRUE AND state = 'closed') AS closed,
+        count(*) FILTER (WHERE is_draft) AS draft,
+        COALESCE(sum(COALESCE(additions, 0) + COALESCE(deletions, 0))
+            FILTER (WHERE COALESCE(additions, 0) > 0 OR COALESCE(deletions, 0) > 0), 0) AS total_changes,
+        count(*) FILTER (WHERE COALESCE(additions, 0) > 0 OR COALESCE(deletions, 0) > 0) AS prs_with_changes
+    FROM pull_requests
+    GROUP BY repo_id
+"""
 
+_PIPELINE_METRICS_QUERY = """
+    SELECT repo_id,
+        count(*) FILTER (WHERE status_build = 'buildPassed') AS "buildPassed",
+        count(*) FILTER (WHERE status_build = 'buildFailed') AS "buildFailed",
+        count(*) FILTER (WHERE status_build = 'building') AS building,
+        count(*) FILTER (WHERE status_approval = 'pending') AS "pendingApproval",
+        count(*) FILTER (WHERE status_approval = 'approved') AS approved
+    FROM pipeline_runs
+    GROUP BY repo_id
+"""
 
-async def _calculate_pipeline_metrics(repo_id: str) -> dict:
-    """Calculate pipeline status metrics for a repository."""
-    try:
-        # Get all pipeline runs for this repository
-        pipelines = await db_helpers.select(
-            table="pipeline_runs",
-            where={"repo_id": repo_id}
-        )
-        
-        build_passed = 0
-        build_failed = 0
-        building = 0
-        pending_approval = 0
-        approved = 0
-        
-        for pipeline in pipelines:
-            status_build = pipeline.get("status_build", "pending")
-            status_approval = pipeline.get("status_approval", "pending")
-            
-            # Count build statuses
-            if status_build == "buildPassed":
-                build_passed += 1
-            elif status_build == "buildFailed":
-                build_failed += 1
-            elif status_build == "building":
-                building += 1
-            
-            # Count approval statuses
-            if status_approval == "approved":
-                approved += 1
-            elif status_approval == "pending":
-                pending_approval += 1
-        
-        return {
-            "buildPassed": build_passed,
-            "buildFailed": build_failed,
-            "building": building,
-            "pendingApproval": pending_approval,
-            "approved": approved
-        }
-        
-    except Exception as e:
-        logger.error(f"Failed to calculate pipeline metrics for repo {repo_id}: {e}")
-        return {"buildPassed": 0, "buildFailed": 0, "building": 0, "pendingApproval": 0, "approved": 0}
+_INSIGHT_COUNTS_QUERY = "SELECT repo_id, count(*) AS total FROM insights GROUP BY repo_id"
 
 
-async def _count_insights(repo_id: str) -> int:
-    """Count total insights generated for a repository."""
+async def _metrics_by_repo(label: str, query: str) -> dict:
+    """Runs a grouped metrics query and returns {repo_id: row}; empty if it fails."""
     try:
-        insights = await db_helpers.select(
-            table="insights",
-            where={"repo_id": repo_id}
-        )
-        return len(insights)
+        return {row["repo_id"]: row for row in await fast_db.fetch(query)}
     except Exception as e:
-        logger.error(f"Failed to count insights for repo {repo_id}: {e}")
-        return 0
+        logger.error(f"Failed to calculate {label} metrics: {e}")
+        return {}
 
 
 @router.get("/repositories")
@@ -216,45 +131,47 @@ async def get_repositories():
     """
     logger.info("Fetching all repositories with enhanced metrics...")
     try:
-        repositories = await db_helpers.select(
+        repositories = await fast_db.select(
             table="repositories",
             order_by="updated_at",
             desc=True
         )
         
+        # Metrics for all repositories at once; repositories without rows count zero
+        pr_metrics_by_repo = await _metrics_by_repo("PR", _PR_METRICS_QUERY)
+        pipeline_metrics_by_repo = await _metrics_by_repo("pipeline", _PIPELINE_METRICS_QUERY)
+        insight_counts_by_repo = await _metrics_by_repo("insight", _INSIGHT_COUNTS_QUERY)
+
         # Enhanced response data with calculated metrics
         response_data = []
         
         for repo in repositories:
             repo_data = _serialize_datetime_fields(repo)
             repo_id = repo['id']
-            
-            # Calculate PR metrics
-            pr_metrics = await _calculate_pr_metrics(repo_id)
-            
-            # Calculate pipeline metrics  
-            pipeline_metrics = await _calculate_pipeline_metrics(repo_id)
+            pr_metrics = pr_metrics_by_repo.get(repo_id) or {}
+            pipeline_metrics = pipeline_metrics_by_repo.get(repo_id) or {}
+            prs_with_changes = pr_metrics.get("prs_with_changes", 0)
             
             # Enhanced repository data with accurate counts
             enhanced_repo = {
                 **repo_data,
                 # Accurate PR counts
-                "total_prs": pr_metrics["total"],
-                "open_prs": pr_metrics["open"],
-                "merged_prs": pr_metrics["merged"],
-                "closed_prs": pr_metrics["closed"],
-                "draft_prs": pr_metrics["draft"],
+                "total_prs": pr_metrics.get("total", 0),
+                "open_prs": pr_metrics.get("open", 0),
+                "merged_prs": pr_metrics.get("merged", 0),
+                "closed_prs": pr_metrics.get("closed", 0),
+                "draft_prs": pr_metrics.get("draft", 0),
                 
                 # Pipeline status counts
-                "build_passed": pipeline_metrics["buildPassed"],
-                "build_failed": pipeline_metrics["buildFailed"],
-                "builds_running": pipeline_metrics["building"],
-                "pending_approval": pipeline_metrics["pendingApproval"],
-                "approved_prs": pipeline_metrics["approved"],
+                "build_passed": pipeline_metrics.get("buildPassed", 0),
+                "build_failed": pipeline_metrics.get("buildFailed", 0),
+                "builds_running": pipeline_metrics.get("building", 0),
+                "pending_approval": pipeline_metrics.get("pendingApproval", 0),
+                "approved_prs": pipeline_metrics.get("approved", 0),
                 
                 # Additional insights
-                "avg_pr_size": pr_metrics["avg_changes"],
-                "total_insights": await _count_insights(repo_id),
+                "avg_pr_size": int(pr_metrics["total_changes"] // prs_with_changes) if prs_with_changes else 0,
+                "total_insights": (insight_counts_by_repo.get(repo_id) or {}).get("total", 0),
                 
                 # Keep original fields for compatibility
                 "stars": repo_data.get("stars", 0),
@@ -270,35 +187,45 @@ async def get_repositories():
         raise HTTPException(status_code=500, detail="Failed to fetch repositories.")
 
 
+def _requested_fields(fields: Optional[str], allowed: tuple) -> Optional[tuple]:
+    """Validates a `fields=` query parameter, answering 400 for unknown columns."""
+    try:
+        return columns.parse_fields(fields, allowed)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @router.get("/pull-requests")
-async def get_pull_requests(repository_id: Optional[str] = Query(None, description="Filter by repository ID")):
+async def get_pull_requests(
+    repository_id: Optional[str] = Query(None, description="Filter by repository ID"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return (default: all but files_changed)")
+):
     """
     Returns pull requests with optional repository filtering.
     Excludes files_changed field (internal only) and builds comprehensive history from both PR and pipeline data.
     """
     logger.info(f"Fetching pull requests{f' for repository {repository_id}' if repository_id else ' (all repositories)'}...")
+    requested = _requested_fields(fields, columns.PR_SUMMARY)
     try:
         where_clause = {"repo_id": repository_id} if repository_id else None
         
-        pull_requests = await db_helpers.select(
+        # files_changed never leaves the database here
+        selected = requested or columns.PR_SUMMARY
+        
+        pull_requests = await fast_db.select(
             table="pull_requests",
             where=where_clause,
+            select_fields=selected,
             order_by="updated_at",
             desc=True
         )
         
-        # Process each PR to build comprehensive history
+        # Process each PR to build comprehensive history from the history column it came with
         response_data = []
         for pr in pull_requests:
             pr_data = _serialize_datetime_fields(pr)
-            
-            # Remove files_changed field (internal only)
-            pr_data.pop('files_changed', None)
-            
-            # Build comprehensive history from PR history and pipeline data
-            comprehensive_history = await _build_pr_history(pr['repo_id'], pr['pr_number'])
-            pr_data['history'] = comprehensive_history
-            
+            if "history" in pr_data:
+                pr_data['history'] = _build_pr_history(pr['history'], pr.get('pr_number'))
             response_data.append(pr_data)
         
         logger.success(f"Successfully fetched {len(response_data)} pull requests with comprehensive history.")
@@ -309,18 +236,23 @@ async def get_pull_requests(repository_id: Optional[str] = Query(None, descripti
 
 
 @router.get("/pipelines")
-async def get_pipeline_runs(repository_id: Optional[str] = Query(None, description="Filter by repository ID")):
+async def get_pipeline_runs(
+    repository_id: Optional[str] = Query(None, description="Filter by repository ID"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return (default: all)")
+):
     """
     Returns pipeline runs with optional repository filtering.
-    Includes all fields using SELECT * for flexibility.
+    Includes all fields using SELECT * for flexibility, or only the requested `fields`.
     """
     logger.info(f"Fetching pipeline runs{f' for repository {repository_id}' if repository_id else ' (all repositories)'}...")
+    requested = _requested_fields(fields, columns.PIPELINE_RUN_COLUMNS)
     try:
         where_clause = {"repo_id": repository_id} if repository_id else None
         
-        pipeline_runs = await db_helpers.select(
+        pipeline_runs = await fast_db.select(
             table="pipeline_runs",
             where=where_clause,
+            select_fields=requested or "*",
             order_by="updated_at",
             desc=True
         )
@@ -335,6 +267,19 @@ async def get_pipeline_runs(repository_id: Optional[str] = Query(None, descripti
         raise HTTPException(status_code=500, detail="Failed to fetch pipeline runs.")
 
 
+async def _pr_file_stats(insights) -> dict:
+    """
+    Diff stats and file paths of the PRs behind `insights`, keyed by (repo_id, pr_number),
+    fetched in one round trip. Insights are still returned without them if it fails.
+    """
+    keys = [(insight['repo_id'], insight['pr_number']) for insight in insights if insight['repo_id'] and insight['pr_number']]
+    try:
+        return await fast_db.select_many("pull_requests", columns.PR_KEY, keys, select_fields=columns.PR_FILE_STATS)
+    except Exception as pr_error:
+        logger.warning(f"Could not fetch PR details for {len(keys)} insights: {pr_error}")
+        return {}
+
+
 @router.get("/insights")
 async def get_insights(
     repository_id: Optional[str] = Query(None, description="Filter by repository ID"),
@@ -354,47 +299,26 @@ async def get_insights(
             where_clause["pr_number"] = pr_id
         
         # Use simple query to fetch insights
-        insights = await db_helpers.select(
+        insights = await fast_db.select(
             table="insights",
             where=where_clause if where_clause else None,
+            select_fields=columns.INSIGHT_COLUMNS,
             order_by="created_at",
             desc=True,
             limit=15  # Return latest 15 insights when no specific filter
         )
         
+        # Additional PR details for all insights in one query
+        pr_details_by_key = await _pr_file_stats(insights)
+        
         # Format insights for API response
         response_data = []
         for insight in insights:
             insight_data = _serialize_datetime_fields(insight)
+            pr_details = pr_details_by_key.get((insight['repo_id'], insight['pr_number']))
             
-            # Get additional PR details if needed
-            pr_details = None
-            if insight['repo_id'] and insight['pr_number']:
-                try:
-                    pr_records = await db_helpers.select(
-                        table="pull_requests",
-                        where={"repo_id": insight['repo_id'], "pr_number": insight['pr_number']},
-                        limit=1
-                    )
-                    if pr_records:
-                        pr_details = pr_records[0]
-                except Exception as pr_error:
-                    logger.warning(f"Could not fetch PR details for insight {insight['id']}: {pr_error}")
-            
-            # Extract file paths from PR details if available
-            file_paths = []
-            if pr_details:
-                files_changed = pr_details.get('files_changed', [])
-                if isinstance(files_changed, str):
-                    try:
-                        files_changed = json.loads(files_changed)
-                    except json.JSONDecodeError:
-                        files_changed = []
-                
-                if isinstance(files_changed, list):
-                    for file_change in files_changed:
-                        if isinstance(file_change, dict) and 'filename' in file_change:
-                            file_paths.append(file_change['filename'])
+            # File paths are extracted from files_changed in SQL
+            file_paths = list(pr_details['file_paths'] or []) if pr_details else []
             
             cleaned_insight = {
                 "id": insight_data['id'],
@@ -406,6 +330,7 @@ async def get_insights(
                 "risk_level": insight_data['risk_level'],
                 "summary": insight_data['summary'],
                 "recommendation": insight_data['recommendation'],
+                "provisional": insight_data.get('provisional', False),
                 "created_at": insight_data['created_at'],
                 # Additional PR details (0 if no PR details available)
                 "additions": pr_details.get('additions', 0) if pr_details else 0,
@@ -435,44 +360,23 @@ async def get_insights_for_pr(pr_number: int, repository_id: Optional[str] = Que
         if repository_id:
             where_clause["repo_id"] = repository_id
             
-        insights = await db_helpers.select(
+        insights = await fast_db.select(
             table="insights",
             where=where_clause,
+            select_fields=columns.INSIGHT_COLUMNS,
             order_by="created_at",
             desc=True
         )
         
+        # PR details (filenames for keyChanges) for all insights in one query
+        pr_details_by_key = await _pr_file_stats(insights)
+        
         # Format for backward compatibility with Flutter app
         response_data = []
         for insight in insights:
-            # Get PR details to extract filenames for keyChanges
-            key_changes = []
-            try:
-                pr_records = await db_helpers.select(
-                    table="pull_requests",
-                    where={"repo_id": insight['repo_id'], "pr_number": insight['pr_number']},
-                    limit=1
-                )
-                
-                if pr_records:
-                    pr_details = pr_records[0]
-                    files_changed = pr_details.get('files_changed', [])
-                    
-                    # Handle JSON string format
-                    if isinstance(files_changed, str):
-                        try:
-                            files_changed = json.loads(files_changed)
-                        except json.JSONDecodeError:
-                            files_changed = []
-                    
-                    # Extract filenames
-                    if isinstance(files_changed, list):
-                        for file_change in files_changed:
-                            if isinstance(file_change, dict) and 'filename' in file_change:
-                                key_changes.append(file_change['filename'])
-                                
-            except Exception as pr_error:
-                logger.warning(f"Could not fetch PR details for insight {insight['id']}: {pr_error}")
+            pr_details = pr_details_by_key.get((insight['repo_id'], insight['pr_number']))
+            # Filenames are extracted from files_changed in SQL
+            key_changes = list(pr_details['file_paths'] or []) if pr_details else []
             
             response_data.append({
                 "id": insight['id'],
@@ -484,6 +388,7 @@ async def get_insights_for_pr(pr_number: int, repository_id: Optional[str] = Que
                 "riskLevel": insight['risk_level'].lower() if insight.get('risk_level') else 'low',
                 "summary": insight['summary'],
                 "recommendation": insight['recommendation'],
+                "provisional": insight.get('provisional', False),
                 "createdAt": insight['created_at'].isoformat(),
                 # Populated with actual filenames from files_changed
                 "keyChanges": key_changes,
@@ -506,25 +411,27 @@ async def get_all_pull_requests_legacy():
     """
     logger.info("Fetching aggregated PR data (legacy endpoint)...")
     try:
-        db = get_db()
         query = """
             SELECT 
-                pr.*,
+                pr.pr_number, pr.title, pr.author, pr.author_avatar, pr.commit_sha, pr.repo_id,
+                pr.created_at, pr.updated_at, pr.additions, pr.deletions, pr.branch_name, pr.is_draft,
                 r.name as repository_name,
                 r.full_name as repository_full_name,
                 r.owner as repository_owner,
-                (SELECT to_json(p) FROM pipeline_runs p WHERE p.repo_id = pr.repo_id AND p.pr_number = pr.pr_number) AS pipeline_status
+                (SELECT json_build_object(
+                    'status_pr', p.status_pr, 'status_build', p.status_build,
+                    'status_approval', p.status_approval, 'status_merge', p.status_merge
+                ) FROM pipeline_runs p WHERE p.repo_id = pr.repo_id AND p.pr_number = pr.pr_number) AS pipeline_status
             FROM pull_requests pr
             JOIN repositories r ON pr.repo_id = r.id
             ORDER BY pr.updated_at DESC
         """
         
-        rows = await db.fetch_all(query)
+        rows = await fast_db.fetch(query)
         response_data = []
         
-        for row in rows:
-            pr_data = dict(row)
-            pipeline_status = json.loads(pr_data['pipeline_status']) if pr_data.get('pipeline_status') else {}
+        for pr_data in rows:
+            pipeline_status = pr_data['pipeline_status'] or {}
             
             # Status determination logic
             status_map = {
@@ -591,7 +498,7 @@ async def get_repository_info_legacy():
     logger.info("Fetching repository information (legacy endpoint)...")
     try:
         # Try to fetch the first repository from the database
-        repositories = await db_helpers.select(
+        repositories = await fast_db.select(
             table="repositories",
             order_by="updated_at",
             desc=True,
@@ -1,23 +1,30 @@
 # api_service/app/services/ai_service.py
+import asyncio
 import json
 import re
+from contextlib import asynccontextmanager
+from typing import Optional
 from loguru import logger
-from google import genai
-from google.genai import types
+from pydantic import TypeAdapter, ValidationError
+from google.genai import errors, types
 from app.data.configs.app_settings import settings
+from app.data.models.schemas import AIBatchInsight, AIIncrementalInsight, AIInsight
+from app.services import insight_cache, insight_fragments, llm_backends, metrics, prompt_packer
+from app.services.file_categories import categorize
+from app.services.json_stream import JsonObjectScanner
+from app.services.micro_batcher import MicroBatcher
+from app.services.ai_throttle import CircuitBreaker, CircuitOpenError, RateLimiter
 
-# --- Configure Gemini client ---
+# --- Configure the LLM backend (Gemini, or the local fake server for benchmarks) ---
+backend = None
+MODEL_NAME = None
 try:
-    if settings.GEMINI_API_KEY:
-        client = genai.Client(api_key=settings.GEMINI_API_KEY)
+    backend = llm_backends.create_backend()
+    if backend:
         MODEL_NAME = settings.GEMINI_AI_MODEL
-        logger.success("Gemini API configured successfully.")
-    else:
-        MODEL_NAME = None
-        logger.warning("GEMINI_API_KEY not found. AI features will be disabled.")
+        logger.success(f"LLM backend '{backend.name}' configured successfully.")
 except Exception as e:
-    logger.critical(f"FATAL: Failed to configure Gemini API. AI features will be disabled. Error: {e}")
-    MODEL_NAME = None
+    logger.critical(f"FATAL: Failed to configure the LLM backend. AI features will be disabled. Error: {e}")
 
 # --- Load prompt template ---
 PROMPT_TEMPLATE = ""
@@ -27,8 +34,222 @@ try:
 except FileNotFoundError:
     logger.error("FATAL: Prompt file 'app/data/prompts/get_insight.txt' not found!")
 
+BATCH_PROMPT_TEMPLATE = ""
+try:
+    with open("app/data/prompts/get_insight_batch.txt", "r") as f:
+        BATCH_PROMPT_TEMPLATE = f.read()
+except FileNotFoundError:
+    logger.error("Prompt file 'app/data/prompts/get_insight_batch.txt' not found! Batched requests are disabled.")
+
+INCREMENTAL_PROMPT_TEMPLATE = ""
+try:
+    with open("app/data/prompts/get_insight_incremental.txt", "r") as f:
+        INCREMENTAL_PROMPT_TEMPLATE = f.read()
+except FileNotFoundError:
+    logger.error("Prompt file 'app/data/prompts/get_insight_incremental.txt' not found! Incremental re-analysis is disabled.")
+
+# Returned when Gemini stops at MAX_TOKENS without usable text; never cached
+TRUNCATED_INSIGHT = {
+    "risk_level": "medium",
+    "summary": "Complex changes detected that require careful review due to analysis limitations.",
+    "recommendation": "Review this PR carefully as the AI analysis was truncated. Consider breaking down large changes into smaller PRs."
+}
+
+# Bounds in-flight Gemini requests per process (created lazily inside the event loop)
+_request_semaphore: Optional[asyncio.Semaphore] = None
+
+# Groups small PRs that arrive together into one request (created lazily)
+_batcher: Optional[MicroBatcher] = None
+
+# Shared quota guard and circuit breaker for every Gemini call in the process
+rate_limiter = RateLimiter(settings.AI_REQUESTS_PER_MINUTE, settings.AI_TOKENS_PER_MINUTE)
+circuit_breaker = CircuitBreaker(
+    failure_threshold=settings.AI_CIRCUIT_FAILURE_THRESHOLD,
+    reset_seconds=settings.AI_CIRCUIT_RESET_SECONDS,
+    half_open_probes=settings.AI_CIRCUIT_HALF_OPEN_PROBES
+)
+
+
+def _get_request_semaphore() -> asyncio.Semaphore:
+    global _request_semaphore
+    if _request_semaphore is None:
+        _request_semaphore = asyncio.Semaphore(max(settings.AI_MAX_CONCURRENCY, 1))
+    return _request_semaphore
+
+
+def _get_batcher() -> MicroBatcher:
+    global _batcher
+    if _batcher is None:
+        _batcher = MicroBatcher(
+            _request_batch_insights,
+            window_seconds=settings.AI_BATCH_WINDOW_MS / 1000,
+            max_items=settings.AI_BATCH_MAX_ITEMS,
+            max_tokens=prompt_packer.prompt_token_budget(MODEL_NAME)
+        )
+    return _batcher
+
+
+@asynccontextmanager
+async def _provider_call(prompt: str):
+    """
+    Guards one Gemini call: waits for the RPM/TPM rate limiter and a concurrency
+    slot (at most AI_MAX_CONCURRENCY calls run at once), fails fast with
+    CircuitOpenError while the circuit breaker is open, and reports the outcome
+    of the call to the breaker.
+    """
+    # Fail fast before queueing behind the limiter or the semaphore
+    if circuit_breaker.retry_after() > 0:
+        circuit_breaker.before_request()
+
+    await rate_limiter.acquire(prompt_packer.estimate_tokens(prompt))
+    async with _get_request_semaphore():
+        circuit_breaker.before_request()
+        try:
+            yield
+        except errors.ClientError as e:
+            # Throttling counts against the provider; other 4xx mean the provider is up but rejected this request
+            if e.code in (408, 429):
+                circuit_breaker.record_failure()
+            else:
+                circuit_breaker.record_success()
+            raise
+        except asyncio.CancelledError:
+            circuit_breaker.record_cancelled()
+            raise
+        except Exception:
+            # Timeouts, server errors and connection failures count against the provider
+            circuit_breaker.record_failure()
+            raise
+        circuit_breaker.record_success()
+
+
+async def _generate_content(prompt: str, generation_config: types.GenerateContentConfig):
+    """
+    Calls the LLM backend asynchronously so the event loop keeps serving REST,
+    WebSocket and poller work while the request is in flight. The call is cancelled
+    after AI_REQUEST_TIMEOUT seconds (time spent waiting for a slot is not counted).
+    """
+    async with _provider_call(prompt):
+        return await asyncio.wait_for(
+            backend.generate_content(MODEL_NAME, prompt, generation_config),
+            timeout=settings.AI_REQUEST_TIMEOUT
+        )
+
+
+def _generation_config(schema, max_output_tokens: Optional[int] = None) -> types.GenerateContentConfig:
+    """Generation settings; with AI_STRUCTURED_OUTPUT_ENABLED the model must answer with JSON matching `schema`."""
+    config = {
+        "temperature": settings.AI_TEMP,
+        "max_output_tokens": max_output_tokens or settings.AI_MAX_TOKEN,
+    }
+    if settings.AI_STRUCTURED_OUTPUT_ENABLED:
+        config.update(response_mime_type="application/json", response_schema=schema)
+    return types.GenerateContentConfig(**config)
+
+
+def _response_text(response) -> Optional[str]:
+    """Text of a response (the SDK joins the text parts of the first candidate)."""
+    try:
+        return response.text
+    except Exception as e:
+        logger.debug(f"Response has no text: {e}")
+        return None
+
+
+def _parse_insight(raw_response: str, schema, pr_number) -> dict | None:
+    """
+    Decodes and validates the insight in one step. Only output that does not match
+    the schema (e.g. from a backend without structured output) goes through the
+    regex extraction in _clean_json_response.
+    """
+    try:
+        insight = schema.model_validate_json(raw_response)
+        metrics.AI_RESPONSE_PARSE.inc(path="structured")
+        return _normalize_insight(insight.model_dump(mode="json"))
+    except ValidationError:
+        pass
+
+    cleaned_response = _clean_json_response(raw_response)
+    try:
+        insight_json = json.loads(cleaned_response)
+    except json.JSONDecodeError as e:
+        # Safe logging to avoid format string conflicts with JSON braces
+        response_preview = cleaned_response[:200] + "..." if len(cleaned_response) > 200 else cleaned_response
+        response_preview = response_preview.replace('{', '{{').replace('}', '}}')
+        logger.error(
+            f"Failed to decode JSON from the {backend.name} response for PR #{pr_number}. "
+            f"Response preview: {response_preview} | Error: {str(e)}"
+        )
+        metrics.AI_RESPONSE_PARSE.inc(path="failed")
+        return None
+    if not isinstance(insight_json, dict):
+        metrics.AI_RESPONSE_PARSE.inc(path="failed")
+        return None
+
+    metrics.AI_RESPONSE_PARSE.inc(path="fallback")
+    return _normalize_insight(insight_json)
+
+
+def _hit_max_tokens(response) -> bool:
+    """True if the (streamed chunk of the) response stopped at the output token limit."""
+    candidates = getattr(response, 'candidates', None)
+    if not candidates:
+        return False
+    return getattr(candidates[0], 'finish_reason', None) == types.FinishReason.MAX_TOKENS
+
+
+async def _stream_insight(prompt: str, pr_number, generation_config: types.GenerateContentConfig, schema) -> dict | None:
+    """
+    Streams the response and parses the insight object as soon as its closing brace
+    arrives, then stops reading, so trailing tokens are neither awaited nor paid for.
+    A MAX_TOKENS finish before the object is complete returns TRUNCATED_INSIGHT at once.
+    """
+    scanner = JsonObjectScanner()
+    truncated = False
+    chunks = 0
+    async with _provider_call(prompt):
+        async with asyncio.timeout(settings.AI_REQUEST_TIMEOUT):
+            stream = await backend.generate_content_stream(MODEL_NAME, prompt, generation_config)
+            try:
+                async for chunk in stream:
+                    chunks += 1
+                    if scanner.feed(getattr(chunk, 'text', None) or ""):
+                        break
+                    if _hit_max_tokens(chunk):
+                        truncated = True
+                        break
+            finally:
+                # Closing the stream early releases the connection without reading the rest
+                aclose = getattr(stream, 'aclose', None)
+                if aclose:
+                    await aclose()
+
+    if scanner.result is None:
+        if truncated:
+            logger.warning(f"{backend.name} stream for PR #{pr_number} hit MAX_TOKENS before the insight was complete")
+            metrics.AI_STREAM_RESULTS.inc(result="truncated")
+            return TRUNCATED_INSIGHT
+        logger.warning(f"{backend.name} stream for PR #{pr_number} ended without a JSON object after {chunks} chunks")
+        metrics.AI_STREAM_RESULTS.inc(result="no_json")
+        return None
+
+    insight = _parse_insight(scanner.result, schema, pr_number)
+    if insight is None:
+        metrics.AI_STREAM_RESULTS.inc(result="invalid_json")
+        return None
+
+    metrics.AI_STREAM_RESULTS.inc(result="complete")
+    logger.success(f"Successfully generated AI insight for PR #{pr_number} from {chunks} streamed chunks")
+    return insight
+
+
+def circuit_retry_after() -> float:
+    """Seconds until the AI circuit lets requests through again (0 when it is not open)."""
+    return circuit_breaker.retry_after()
+
+
 def _clean_json_response(raw_response: str) -> str:
-    """Extracts JSON from markdown code blocks and cleans the response."""
+    """Extracts JSON from markdown code blocks and cleans the response (fallback for unstructured output)."""
     # Remove markdown code blocks
     response = raw_response.strip()
     
@@ -59,63 +280,14 @@ def _clean_json_response(raw_response: str) -> str:
     return response
 
 
-def _format_files_changed(files_changed: list, max_total_length: int = 4000) -> str:
-    """
-    Formats the files_changed JSON data into a readable string for the AI prompt.
-    Includes intelligent truncation to stay within token limits.
-    """
-    if not files_changed:
-        return "No files changed"
-    
-    formatted_files = []
-    current_length = 0
-    
-    for i, file_data in enumerate(files_changed):
-        filename = file_data.get('filename', 'unknown')
-        status = file_data.get('status', 'unknown')
-        additions = file_data.get('additions', 0)
-        deletions = file_data.get('deletions', 0)
-        changes = file_data.get('changes', 0)
-        
-        # Start with basic file info
-        file_summary = f"- {filename} ({status}): +{additions}/-{deletions} ({changes} changes)"
-        
-        # Include patch data if available and within limits
-        patch = file_data.get('patch', '')
-        if patch:
-            # Determine how much patch to include based on remaining space
-            remaining_space = max_total_length - current_length - len(file_summary)
-            
-            if remaining_space > 200:  # Only include patch if we have decent space
-                patch_preview_length = min(len(patch), remaining_space - 50, 500)
-                patch_preview = patch[:patch_preview_length]
-                if len(patch) > patch_preview_length:
-                    patch_preview += "... [truncated]"
-                file_summary += f"\n  Patch preview: {patch_preview}"
-            else:
-                file_summary += f"\n  Patch: {len(patch)} characters (truncated for space)"
-        
-        # Check if adding this file would exceed our limit
-        if current_length + len(file_summary) > max_total_length:
-            remaining_files = len(files_changed) - i
-            if remaining_files > 0:
-                formatted_files.append(f"... and {remaining_files} more files (truncated for API limits)")
-            break
-        
-        formatted_files.append(file_summary)
-        current_length += len(file_summary)
-    
-    result = "\n".join(formatted_files)
-    logger.debug(f"Formatted files_changed: {len(result)} characters from {len(files_changed)} files")
-    return result
-
-
-async def get_ai_insights(pr_data: dict) -> dict | None:
+async def get_ai_insights(pr_data: dict, previous_insight: Optional[dict] = None) -> dict | None:
     """
     Generates AI insights for a PR using Gemini with enhanced files_changed analysis.
     Expects `pr_data` to have keys like: title, author, branch_name, files_changed, etc.
+    `previous_insight` is the PR's last insight; when it was made for an earlier commit,
+    only files whose patches changed since then are re-analysed.
     Returns clean JSON with risk_level, summary, recommendation fields.
-    Enhanced with better error handling and data size management.
+    Raises CircuitOpenError while the provider is considered down, so callers can defer.
     """
     if not MODEL_NAME or not PROMPT_TEMPLATE:
         logger.error("AI service is not configured. Cannot get insights.")
@@ -140,141 +312,359 @@ async def get_ai_insights(pr_data: dict) -> dict | None:
             logger.warning(f"No files_changed data available for AI analysis of PR #{pr_number}")
             return None
         
+        # Identical prompt inputs (same commit and diff) reuse the stored insight
+        cache_key = insight_cache.cache_key(pr_data, files_changed, MODEL_NAME, PROMPT_TEMPLATE)
+        cached_insight = await insight_cache.get(cache_key)
+        if cached_insight:
+            logger.info(f"Using cached AI insight for PR #{pr_number} (commit {pr_data.get('commit_sha')})")
+            return cached_insight
+        
         # Calculate total patch size for logging
         total_patch_size = sum(len(f.get('patch', '')) for f in files_changed)
         logger.info(f"PR #{pr_number}: Processing {len(files_changed)} files, total patch size: {total_patch_size} chars")
         
-        # Format files with intelligent truncation
-        formatted_files = _format_files_changed(files_changed, max_total_length=4000)
+        prompt_fields = {
+            "author": pr_data.get("author", "N/A"),
+            "branch_name": pr_data.get("branch_name", "N/A"),
+            "commit_message": pr_data.get("title", "N/A"),
+        }
+        token_budget = prompt_packer.prompt_token_budget(MODEL_NAME)
+        base_tokens = prompt_packer.estimate_tokens(PROMPT_TEMPLATE.format(files_changed="", **prompt_fields))
+        files_budget = max(token_budget - base_tokens, 0)
         
-        # Build enhanced prompt with actual file change data
-        prompt = PROMPT_TEMPLATE.format(
-            author=pr_data.get("author", "N/A"),
-            branch_name=pr_data.get("branch_name", "N/A"),
-            commit_message=pr_data.get("title", "N/A"),
-            files_changed=formatted_files
+        fragments = {}
+        if (
+            previous_insight and settings.AI_INCREMENTAL_ENABLED and INCREMENTAL_PROMPT_TEMPLATE
+            and previous_insight.get('commit_sha') != pr_data.get('commit_sha')
+        ):
+            fragments = await insight_fragments.load(repo_id, files_changed)
+        
+        if fragments:
+            # Earlier commits already covered some of these patches: analyse only the rest
+            insight = await _incremental_insights(pr_data, files_changed, fragments, previous_insight, prompt_fields, token_budget)
+        elif settings.AI_CHUNKED_ANALYSIS_ENABLED and prompt_packer.needs_chunking(files_changed, files_budget):
+            insight = await _map_reduce_insights(pr_number, files_changed, prompt_fields, files_budget)
+        else:
+            # Fill the model's token budget with the riskiest files first, in a single pass
+            formatted_files = prompt_packer.pack_files_changed(files_changed, files_budget)
+            prompt = PROMPT_TEMPLATE.format(files_changed=formatted_files, **prompt_fields)
+            prompt_tokens = prompt_packer.estimate_tokens(prompt)
+            logger.info(f"PR #{pr_number}: prompt ~{prompt_tokens} tokens (budget {token_budget})")
+            
+            insight = None
+            files_tokens = prompt_packer.estimate_tokens(formatted_files)
+            if settings.AI_BATCHING_ENABLED and BATCH_PROMPT_TEMPLATE and files_tokens <= settings.AI_BATCH_ITEM_MAX_TOKENS:
+                # Small PRs arriving together share one request
+                item = {"pr_number": pr_number, "prompt": prompt, "fields": prompt_fields, "files": formatted_files}
+                insight = await _get_batcher().submit((str(repo_id), pr_number), item, tokens=files_tokens)
+                if insight is None:
+                    logger.info(f"PR #{pr_number} got no result from its batch, requesting it individually")
+            
+            if insight is None:
+                logger.info(f"Requesting AI insight for PR #{pr_number} in repository {repo_id}")
+                insight = await _request_insight(prompt, pr_number)
+        
+        if insight and insight is not TRUNCATED_INSIGHT:
+            insight.pop('files', None)
+            if not fragments and settings.AI_INCREMENTAL_ENABLED:
+                # Fragments are only read by incremental re-analysis
+                await insight_fragments.store(repo_id, pr_data.get('commit_sha'), files_changed, MODEL_NAME)
+            await insight_cache.put(cache_key, insight, model=MODEL_NAME)
+        return insight
+
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error with the {backend.name} backend for PR #{pr_data.get('pr_number', 'unknown')}: {str(e)}")
+        return None
+
+
+async def _map_reduce_insights(pr_number, files_changed: list, prompt_fields: dict, files_budget: int) -> dict | None:
+    """
+    Analyses a PR too large for one prompt: files are split into risk-ranked groups
+    that each fit the budget, the groups are analysed in parallel (bounded by the
+    request semaphore, so wall-clock time stays close to a single call) and the
+    per-group insights are reduced locally into one.
+    """
+    chunks = prompt_packer.split_into_chunks(files_changed, files_budget, max(settings.AI_MAX_CHUNKS, 1))
+    logger.info(f"PR #{pr_number}: {len(files_changed)} files exceed one prompt, analysing {len(chunks)} file groups in parallel")
+
+    prompts = []
+    for index, chunk in enumerate(chunks, start=1):
+        fields = dict(prompt_fields)
+        fields["commit_message"] = (
+            f"{prompt_fields['commit_message']} "
+            f"[part {index} of {len(chunks)}: {len(chunk)} of {len(files_changed)} changed files, riskiest parts first]"
         )
+        prompts.append(PROMPT_TEMPLATE.format(files_changed=prompt_packer.pack_files_changed(chunk, files_budget), **fields))
+
+    results = await asyncio.gather(*(_request_insight(prompt, pr_number) for prompt in prompts))
+    return _reduce_insights(pr_number, results, len(files_changed))
 
-        # Check prompt size
-        prompt_length = len(prompt)
-        if prompt_length > 6000:
-            logger.warning(f"Large prompt for PR #{pr_number}: {prompt_length} characters")
-        
-        logger.info(f"Requesting AI insight for PR #{pr_number} in repository {repo_id}")
 
-        generation_config = types.GenerateContentConfig(
-            temperature=settings.AI_TEMP,
-            max_output_tokens=settings.AI_MAX_TOKEN,
+async def _incremental_insights(
+    pr_data: dict, files_changed: list, fragments: dict, previous_insight: dict, prompt_fields: dict, token_budget: int
+) -> dict | None:
+    """
+    Re-analyses a PR after new commits. Files whose patch already has a fragment are
+    listed with their earlier finding instead of their diff; only new or updated
+    patches are sent. Per-file results are stored as fragments for the next commit,
+    and the merged risk is never below the riskiest unchanged file.
+    """
+    pr_number = pr_data.get('pr_number')
+    repo_id = pr_data.get('repo_id')
+    changed = [f for f in files_changed if f.get('filename', 'unknown') not in fragments]
+    metrics.INSIGHT_INCREMENTAL_FILES.inc(len(files_changed) - len(changed), result="reused")
+    metrics.INSIGHT_INCREMENTAL_FILES.inc(len(changed), result="analysed")
+    
+    if not changed:
+        # Same patches as an analysed commit (e.g. a rebase), nothing to send
+        logger.info(f"PR #{pr_number}: no file patches changed since commit {previous_insight.get('commit_sha')}, reusing its insight")
+        return {
+            "risk_level": previous_insight.get('risk_level') or 'low',
+            "summary": previous_insight.get('summary'),
+            "recommendation": previous_insight.get('recommendation'),
+        }
+    
+    unchanged_lines = []
+    for file_data in prompt_packer.rank_files([f for f in files_changed if f.get('filename', 'unknown') in fragments]):
+        filename = file_data.get('filename', 'unknown')
+        fragment = fragments[filename]
+        finding = f"earlier risk {fragment['risk_level']}" if fragment.get('risk_level') else "covered by the earlier analysis"
+        if fragment.get('note'):
+            finding += f": {fragment['note']}"
+        unchanged_lines.append(f"- {filename} [{categorize(filename)}]: {finding}")
+    
+    # The unchanged file list may take at most a quarter of the budget
+    unchanged_budget = token_budget // 4
+    unchanged_text, used = [], 0
+    for line in unchanged_lines:
+        cost = prompt_packer.estimate_tokens(line) + 1
+        if used + cost > unchanged_budget:
+            unchanged_text.append(f"... and {len(unchanged_lines) - len(unchanged_text)} more unchanged files")
+            break
+        unchanged_text.append(line)
+        used += cost
+    
+    template_fields = {
+        **prompt_fields,
+        "previous_commit": previous_insight.get('commit_sha') or 'unknown',
+        "previous_risk_level": previous_insight.get('risk_level') or 'unknown',
+        "previous_summary": previous_insight.get('summary') or '-',
+        "previous_recommendation": previous_insight.get('recommendation') or '-',
+        "unchanged_files": "\n".join(unchanged_text),
+    }
+    base_tokens = prompt_packer.estimate_tokens(INCREMENTAL_PROMPT_TEMPLATE.format(files_changed="", **template_fields))
+    formatted_files = prompt_packer.pack_files_changed(changed, max(token_budget - base_tokens, 0))
+    prompt = INCREMENTAL_PROMPT_TEMPLATE.format(files_changed=formatted_files, **template_fields)
+    logger.info(
+        f"PR #{pr_number}: incremental analysis of {len(changed)}/{len(files_changed)} files "
+        f"since commit {previous_insight.get('commit_sha')}, prompt ~{prompt_packer.estimate_tokens(prompt)} tokens"
+    )
+    
+    insight = await _request_insight(prompt, pr_number, schema=AIIncrementalInsight)
+    if not insight or insight is TRUNCATED_INSIGHT:
+        return insight
+    
+    analyses = {entry['filename']: entry for entry in insight.pop('files', [])}
+    await insight_fragments.store(repo_id, pr_data.get('commit_sha'), changed, MODEL_NAME, analyses)
+    
+    order = {"low": 0, "medium": 1, "high": 2}
+    unchanged_risks = [fragment['risk_level'] for fragment in fragments.values() if fragment.get('risk_level') in order]
+    if unchanged_risks:
+        floor = max(unchanged_risks, key=order.get)
+        if order[floor] > order.get(insight['risk_level'], 0):
+            insight['risk_level'] = floor
+    return insight
+
+
+def _reduce_insights(pr_number, results: list, total_files: int) -> dict | None:
+    """
+    Combines per-group insights: the highest risk wins, and summaries and
+    recommendations are merged from the riskiest groups first.
+    """
+    insights = [result for result in results if result and result is not TRUNCATED_INSIGHT]
+    if not insights:
+        logger.warning(f"No file group of PR #{pr_number} produced an insight")
+        return TRUNCATED_INSIGHT if any(results) else None
+
+    order = {"low": 0, "medium": 1, "high": 2}
+    insights.sort(key=lambda insight: order.get(insight['risk_level'], 0), reverse=True)
+    risk_level = insights[0]['risk_level']
+
+    def _merge(field: str, limit: int) -> str:
+        parts = []
+        for insight in insights:
+            text = (insight.get(field) or "").strip()
+            if text and text not in parts:
+                parts.append(text)
+        merged = " ".join(parts)
+        return merged if len(merged) <= limit else merged[:limit - 3] + "..."
+
+    recommendation = _merge('recommendation', 1000)
+    if len(insights) < len(results):
+        recommendation = (
+            f"Only {len(insights)} of {len(results)} parts of this {total_files}-file change could be analysed; "
+            f"review the remaining files manually. " + recommendation
+        )[:1000]
+
+    logger.success(f"Reduced {len(insights)} file group insights for PR #{pr_number} (risk {risk_level})")
+    return {
+        "risk_level": risk_level,
+        "summary": _merge('summary', 500),
+        "recommendation": recommendation,
+    }
+
+
+def _normalize_insight(insight_json: dict) -> dict:
+    """Cleans and validates a parsed insight to match our schema exactly."""
+    cleaned_insight = {
+        "risk_level": str(insight_json.get('risk_level', insight_json.get('riskLevel', 'low'))).lower(),
+        "summary": str(insight_json.get('summary', 'AI analysis completed')),
+        "recommendation": str(insight_json.get('recommendation', 'Review changes carefully'))
+    }
+    
+    # Validate risk_level is one of the allowed values
+    if cleaned_insight['risk_level'] not in ['low', 'medium', 'high']:
+        cleaned_insight['risk_level'] = 'low'
+    
+    # Ensure summary and recommendation are not too long
+    if len(cleaned_insight['summary']) > 500:
+        cleaned_insight['summary'] = cleaned_insight['summary'][:497] + "..."
+    if len(cleaned_insight['recommendation']) > 1000:
+        cleaned_insight['recommendation'] = cleaned_insight['recommendation'][:997] + "..."
+    
+    # Per-file findings, only requested by the incremental prompt
+    if isinstance(insight_json.get('files'), list):
+        cleaned_insight['files'] = [
+            {"filename": str(entry['filename']), "risk_level": entry.get('risk_level'), "note": entry.get('note')}
+            for entry in insight_json['files']
+            if isinstance(entry, dict) and entry.get('filename')
+        ]
+    return cleaned_insight
+
+
+_BATCH_ADAPTER = TypeAdapter(list[AIBatchInsight])
+
+
+def _parse_batch_response(raw_response: str) -> list:
+    """
+    Validates the batched JSON array in one step; output that does not match the
+    schema falls back to extracting the array from markdown fences.
+    """
+    try:
+        return [entry.model_dump(mode="json") for entry in _BATCH_ADAPTER.validate_json(raw_response)]
+    except ValidationError:
+        pass
+    response = raw_response.strip()
+    fence_match = re.search(r'```(?:json)?\s*([\s\S]*?)\s*```', response)
+    if fence_match:
+        response = fence_match.group(1).strip()
+    start, end = response.find('['), response.rfind(']')
+    if start == -1 or end < start:
+        raise json.JSONDecodeError("No JSON array found", response, 0)
+    parsed = json.loads(response[start:end + 1])
+    return parsed if isinstance(parsed, list) else []
+
+
+async def _request_batch_insights(items: list) -> dict:
+    """
+    MicroBatcher handler: sends several small PRs in one request and maps the
+    returned array back by (repo_id, pr_number). A single item is sent with the normal prompt.
+    Items missing from (or invalid in) the response are left out, so their callers
+    fall back to individual requests.
+    """
+    if len(items) == 1:
+        key, item = items[0]
+        return {key: await _request_insight(item["prompt"], key[1])}
+
+    sections = []
+    for (repo_id, pr_number), item in items:
+        fields = item["fields"]
+        sections.append(
+            f"=== PR #{pr_number} in repository {repo_id} ===\n"
+            f"Author: {fields['author']}\n"
+            f"Branch: {fields['branch_name']}\n"
+            f"Commit Message: {fields['commit_message']}\n"
+            f"Files Changed Analysis:\n{item['files']}"
         )
+    prompt = BATCH_PROMPT_TEMPLATE.format(count=len(items), pull_requests="\n\n".join(sections))
+    keys = [key for key, _ in items]
+    pr_numbers = [pr_number for _, pr_number in keys]
+    metrics.AI_BATCH_ITEMS.observe(len(items))
+    logger.info(f"Requesting AI insights for {len(items)} PRs in one batch: {pr_numbers}")
+
+    generation_config = _generation_config(list[AIBatchInsight], max_output_tokens=min(settings.AI_MAX_TOKEN * len(items), 8192))
+    try:
+        response = await _generate_content(prompt, generation_config)
+        raw_response = _response_text(response)
+        if not raw_response:
+            logger.warning(f"Empty response for batched PRs {pr_numbers}")
+            return {}
+        entries = _parse_batch_response(raw_response)
+    except CircuitOpenError:
+        return {}
+    except asyncio.TimeoutError:
+        logger.warning(f"Batched {backend.name} request for PRs {pr_numbers} timed out after {settings.AI_REQUEST_TIMEOUT}s")
+        return {}
+    except json.JSONDecodeError as e:
+        logger.warning(f"Failed to decode the batched response for PRs {pr_numbers}: {str(e)}")
+        return {}
+    except Exception as e:
+        logger.error(f"Unexpected error with batched {backend.name} request for PRs {pr_numbers}: {str(e)}")
+        return {}
+
+    results = {}
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        try:
+            key = (str(entry.get('repo_id')), int(entry.get('pr_number')))
+        except (TypeError, ValueError):
+            continue
+        if key in keys and key not in results:
+            results[key] = _normalize_insight(entry)
+
+    missing = [pr_number for repo_id, pr_number in keys if (repo_id, pr_number) not in results]
+    logger.success(f"Batched request returned insights for {len(results)}/{len(items)} PRs" + (f", missing {missing}" if missing else ""))
+    return results
+
+
+async def _request_insight(prompt: str, pr_number, schema=AIInsight) -> dict | None:
+    """
+    Sends one prompt to Gemini and parses the insight JSON from the response
+    (streamed when AI_STREAMING_ENABLED is on).
+    Returns the insight dict, TRUNCATED_INSIGHT if the output hit MAX_TOKENS, or None.
+    """
+    try:
+        generation_config = _generation_config(schema)
         
-        response = client.models.generate_content(
-            model=MODEL_NAME,
-            contents=[{"role": "user", "parts": [{"text": prompt}]}],
-            config=generation_config,
-        )        
-        
-        logger.info(f"Raw Gemini response structure: {type(response)}")
-        
-        # Extract the text from the response using the correct structure
-        raw_response = None
-        
-        # Check for finish_reason to understand why response might be incomplete
-        if hasattr(response, 'candidates') and response.candidates:
-            candidate = response.candidates[0]
-            finish_reason = getattr(candidate, 'finish_reason', None)
-            if finish_reason and str(finish_reason) == 'MAX_TOKENS':
-                logger.warning(f"Gemini response truncated due to MAX_TOKENS limit for PR #{pr_number}")
-                # We'll still try to extract partial content below
-        
-        logger.debug(f"Response has text attribute: {hasattr(response, 'text')}")
-        if hasattr(response, 'text'):
-            response_text = response.text
-            logger.debug(f"Response.text type: {type(response_text)}, value: {response_text}")
-        
-        # Method 1: Try response.text (direct access)
-        if hasattr(response, 'text') and response.text:
-            raw_response = response.text
-            logger.info(f"Extracted text via response.text: {raw_response[:200]}...")
-        # Method 2: Try candidates[0].content.parts[0].text
-        elif hasattr(response, 'candidates') and response.candidates:
-            candidate = response.candidates[0]
-            logger.debug(f"Candidate: {candidate}")
-            if hasattr(candidate, 'content') and candidate.content and hasattr(candidate.content, 'parts') and candidate.content.parts:
-                part = candidate.content.parts[0]
-                logger.debug(f"Part: {part}")
-                if hasattr(part, 'text') and part.text:
-                    raw_response = part.text
-                    logger.info(f"Extracted text via candidates path: {raw_response[:200]}...")
-                else:
-                    logger.debug(f"Part has no text or empty text. Part attributes: {[attr for attr in dir(part) if not attr.startswith('_')]}")
-            else:
-                logger.debug(f"Candidate structure issue. Content: {getattr(candidate, 'content', None)}")
+        if settings.AI_STREAMING_ENABLED:
+            return await _stream_insight(prompt, pr_number, generation_config, schema)
         
+        response = await _generate_content(prompt, generation_config)
+        truncated = _hit_max_tokens(response)
+        raw_response = _response_text(response)
         if not raw_response:
-            logger.warning(f"No text content found in Gemini response for PR #{pr_number}.")
-            # Try to access the text property directly
-            try:
-                text_prop = getattr(response, 'text', None)
-                logger.debug(f"Direct text property: {text_prop}")
-                if text_prop:
-                    raw_response = text_prop
-                    logger.info(f"Got text via direct property access: {raw_response[:200]}...")
-            except Exception as e:
-                logger.debug(f"Failed to access text property: {e}")
-            
-            if not raw_response:
-                # Check if this was a MAX_TOKENS issue and return a fallback
-                if hasattr(response, 'candidates') and response.candidates:
-                    candidate = response.candidates[0]
-                    finish_reason = getattr(candidate, 'finish_reason', None)
-                    if finish_reason and str(finish_reason) == 'MAX_TOKENS':
-                        logger.warning(f"Returning fallback insight due to MAX_TOKENS limit for PR #{pr_number}")
-                        return {
-                            "risk_level": "medium",
-                            "summary": "Complex changes detected that require careful review due to analysis limitations.",
-                            "recommendation": "Review this PR carefully as the AI analysis was truncated. Consider breaking down large changes into smaller PRs."
-                        }
-                
-                logger.debug(f"Response structure: {dir(response)}")
-                return None
-        
-        cleaned_response = _clean_json_response(raw_response)
+            if truncated:
+                logger.warning(f"Returning fallback insight due to MAX_TOKENS limit for PR #{pr_number}")
+                return TRUNCATED_INSIGHT
+            logger.warning(f"No text content found in the {backend.name} response for PR #{pr_number}.")
+            return None
         
-        # Parse JSON response with robust error handling
-        try:
-            insight_json = json.loads(cleaned_response)
-            
-            # Clean and validate the response to match our schema exactly
-            cleaned_insight = {
-                "risk_level": insight_json.get('risk_level', insight_json.get('riskLevel', 'low')).lower(),
-                "summary": insight_json.get('summary', 'AI analysis completed'),
-                "recommendation": insight_json.get('recommendation', 'Review changes carefully')
-            }
-            
-            # Validate risk_level is one of the allowed values
-            if cleaned_insight['risk_level'] not in ['low', 'medium', 'high']:
-                cleaned_insight['risk_level'] = 'low'
-            
-            # Ensure summary and recommendation are not too long
-            if len(cleaned_insight['summary']) > 500:
-                cleaned_insight['summary'] = cleaned_insight['summary'][:497] + "..."
-            if len(cleaned_insight['recommendation']) > 1000:
-                cleaned_insight['recommendation'] = cleaned_insight['recommendation'][:997] + "..."
-            
+        insight = _parse_insight(raw_response, schema, pr_number)
+        if insight is None and truncated:
+            logger.warning(f"{backend.name} response for PR #{pr_number} was cut at MAX_TOKENS before the JSON was complete")
+            return TRUNCATED_INSIGHT
+        if insight:
             logger.success(f"Successfully generated AI insight for PR #{pr_number}")
-            return cleaned_insight
-            
-        except json.JSONDecodeError as e:
-            # Safe logging to avoid format string conflicts with JSON braces
-            response_preview = cleaned_response[:200] + "..." if len(cleaned_response) > 200 else cleaned_response
-            response_preview = response_preview.replace('{', '{{').replace('}', '}}')  # Escape braces for logging
-            
-            logger.error(
-                f"Failed to decode JSON from Gemini response for PR #{pr_number}. "
-                f"Response preview: {response_preview} | Error: {str(e)}"
-            )
-            return None
+        return insight
 
+    except CircuitOpenError:
+        raise
+    except asyncio.TimeoutError:
+        logger.warning(f"{backend.name} request for PR #{pr_number} timed out after {settings.AI_REQUEST_TIMEOUT}s")
+        return None
     except Exception as e:
-        logger.error(f"Unexpected error with Gemini API for PR #{pr_data.get('pr_number', 'unknown')}: {str(e)}")
-        return None
\ No newline at end of file
+        logger.error(f"Unexpected error with the {backend.name} backend for PR #{pr_number}: {str(e)}")
+        return None
@@ -0,0 +1,149 @@
+# api_service/app/services/ai_throttle.py
+
+import asyncio
+import time
+from loguru import logger
+from app.services import metrics
+
+# Client-side protection for the AI provider: token buckets keep us inside the
+# requests/tokens-per-minute quota and a circuit breaker stops calling a provider
+# that keeps failing, probing it again after a cool-down.
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the provider while the circuit is open."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"AI circuit is open, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Allows `capacity` units per `period` seconds, refilled continuously. Capacity 0 disables it."""
+
+    def __init__(self, capacity: float, period: float = 60.0):
+        self.capacity = capacity
+        self.refill_rate = capacity / period if capacity > 0 else 0
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.refill_rate)
+        self._updated = now
+
+    async def acquire(self, amount: float = 1) -> float:
+        """Waits until `amount` units are available and takes them. Returns the time waited."""
+        if self.capacity <= 0:
+            return 0.0
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        # The lock keeps waiters in FIFO order so large requests are not starved
+        async with self._lock:
+            self._refill()
+            while self._tokens < amount:
+                delay = (amount - self._tokens) / self.refill_rate
+                await asyncio.sleep(delay)
+                waited += delay
+                self._refill()
+            self._tokens -= amount
+        return waited
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute buckets shared by every AI call in the process."""
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+
+    async def acquire(self, tokens: int):
+        waited = await self.requests.acquire(1)
+        waited += await self.tokens.acquire(tokens)
+        if waited > 0:
+            metrics.AI_RATE_LIMIT_WAIT_SECONDS.observe(waited)
+            logger.debug(f"AI rate limiter delayed a request by {waited:.2f}s")
+
+
+class CircuitBreaker:
+    """
+    closed: calls pass; `failure_threshold` consecutive failures open the circuit.
+    open: calls fail fast with CircuitOpenError for `reset_seconds`.
+    half_open: up to `half_open_probes` probe calls pass; a success closes the
+    circuit, a failure opens it again.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    _STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, failure_threshold: int, reset_seconds: float, half_open_probes: int = 1):
+        self.failure_threshold = max(failure_threshold, 1)
+        self.reset_seconds = reset_seconds
+        self.half_open_probes = max(half_open_probes, 1)
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        metrics.AI_CIRCUIT_STATE.set(0)
+
+    def _transition(self, state: str):
+        if state == self.state:
+            return
+        logger.warning(f"AI circuit breaker: {self.state} -> {state}")
+        self.state = state
+        metrics.AI_CIRCUIT_STATE.set(self._STATE_VALUES[state])
+        metrics.AI_CIRCUIT_TRANSITIONS.inc(state=state)
+
+    def retry_after(self) -> float:
+        """Seconds until the circuit lets a probe through (0 when calls are allowed)."""
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self._opened_at + self.reset_seconds - time.monotonic())
+
+    def before_request(self):
+        """Raises CircuitOpenError if the call must not reach the provider."""
+        if self.state == self.OPEN:
+            remaining = self.retry_after()
+            if remaining > 0:
+                metrics.AI_REJECTED.inc()
+                raise CircuitOpenError(remaining)
+            self._transition(self.HALF_OPEN)
+            self._probes_in_flight = 0
+
+        if self.state == self.HALF_OPEN:
+            if self._probes_in_flight >= self.half_open_probes:
+                metrics.AI_REJECTED.inc()
+                raise CircuitOpenError(self.reset_seconds)
+            self._probes_in_flight += 1
+
+    def record_success(self):
+        self._failures = 0
+        if self.state == self.HALF_OPEN:
+            self._probes_in_flight = max(self._probes_in_flight - 1, 0)
+            self._transition(self.CLOSED)
+
+    def record_failure(self):
+        self._failures += 1
+        if self.state == self.HALF_OPEN:
+            self._probes_in_flight = max(self._probes_in_flight - 1, 0)
+            self._open()
+        elif self.state == self.CLOSED and self._failures >= self.failure_threshold:
+            self._open()
+
+    def record_cancelled(self):
+        """A call was cancelled before it completed; it proves nothing about the provider."""
+        if self.state == self.HALF_OPEN:
+            self._probes_in_flight = max(self._probes_in_flight - 1, 0)
+
+    def _open(self):
+        self._opened_at = time.monotonic()
+        self._transition(self.OPEN)
+
+    def snapshot(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "retry_after_seconds": round(self.retry_after(), 1),
+        }
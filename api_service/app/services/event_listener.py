@@ -0,0 +1,104 @@
+# api_service/app/services/event_listener.py
+
+import asyncio
+from typing import Dict
+from loguru import logger
+from app.data.configs.app_settings import settings
+from app.data.database.core_db import get_db
+
+_running = True
+_listening = False
+# One wakeup flag per table so each table's poll loop only wakes for its own changes
+_wakeup_events: Dict[str, asyncio.Event] = {}
+
+
+def _get_wakeup_event(table: str) -> asyncio.Event:
+    if table not in _wakeup_events:
+        _wakeup_events[table] = asyncio.Event()
+    return _wakeup_events[table]
+
+
+def _wake_all():
+    for event in _wakeup_events.values():
+        event.set()
+
+
+def is_listening() -> bool:
+    """True while a LISTEN connection is active and notifications can be trusted."""
+    return _listening
+
+
+def stop_listener():
+    global _running
+    _running = False
+    logger.info("Stop signal received for event listener.")
+
+
+def _on_notification(connection, pid, channel, payload):
+    """asyncpg notification callback. Payload is the name of the changed table."""
+    logger.debug(f"Received notification on '{channel}' for table '{payload}'")
+    if payload in _wakeup_events:
+        _wakeup_events[payload].set()
+    else:
+        _wake_all()
+
+
+async def wait_for_events(table: str, timeout: float) -> bool:
+    """
+    Blocks until a change notification for `table` arrives or `timeout` seconds elapse.
+    The wakeup flag is cleared on return so the caller can run a fresh cycle.
+    Returns True if woken by a notification, False on timeout.
+    """
+    event = _get_wakeup_event(table)
+    try:
+        await asyncio.wait_for(event.wait(), timeout=timeout)
+        return True
+    except asyncio.TimeoutError:
+        return False
+    finally:
+        event.clear()
+
+
+async def listen_for_events():
+    """
+    Holds a dedicated database connection subscribed to the change channel.
+    Triggers on pull_requests, pipeline_runs and insights (see scripts/trigger_v2.sql)
+    call pg_notify whenever a row is written with processed = FALSE.
+    Reconnects automatically if the connection is lost.
+    """
+    global _listening
+    channel = settings.EVENT_NOTIFY_CHANNEL
+
+    while _running:
+        try:
+            async with get_db().connection() as connection:
+                raw_connection = connection.raw_connection
+                await raw_connection.add_listener(channel, _on_notification)
+                _listening = True
+                logger.success(f"Listening for change notifications on channel '{channel}'")
+
+                # Wake the poller once so anything written while we were offline is picked up
+                _wake_all()
+
+                try:
+                    while _running and not raw_connection.is_closed():
+                        await asyncio.sleep(1)
+                finally:
+                    _listening = False
+                    if not raw_connection.is_closed():
+                        await raw_connection.remove_listener(channel, _on_notification)
+
+            if _running:
+                logger.warning("Notification connection closed. Reconnecting in 5s.")
+                await asyncio.sleep(5)
+
+        except asyncio.CancelledError:
+            logger.warning("Event listener task was cancelled.")
+            break
+        except Exception as e:
+            _listening = False
+            logger.error(f"Event listener encountered an error: {e}. Retrying in 5s.")
+            await asyncio.sleep(5)
+
+    _listening = False
+    logger.info("Database event listener has shut down.")
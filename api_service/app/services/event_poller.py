@@ -1,120 +1,301 @@
 # api_service/app/services/event_poller.py
 
 import asyncio
+import os
+import socket
+import time
+from datetime import datetime, timezone
 from loguru import logger
-from app.data.database import db_helpers
-from app.services.event_processor import process_new_pull_request, process_new_pipeline, process_new_insight, process_failed_insight_retries
+from app.data.configs.app_settings import settings
+from app.data.database import columns, db_helpers
+from app.services import event_listener, metrics
+from app.services.fair_scheduler import fair_select, waited_seconds
+from app.services.event_processor import process_new_pull_request, process_new_pipeline, process_new_insight
 
 _running = True
 
+# Identifies this process in the claimed_by column so leases never collide across workers/replicas
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# (table, handler, order column, label) - each table is polled by its own loop
+POLL_TARGETS = [
+    ("pull_requests", process_new_pull_request, "updated_at", "pull request"),
+    ("pipeline_runs", process_new_pipeline, "updated_at", "pipeline run"),
+    ("insights", process_new_insight, "created_at", "insight"),
+]
+
+# Adaptive scheduler state per table, exposed via get_poller_state()
+_poller_state: dict = {}
+
+
 def stop_poller():
     global _running
     _running = False
     logger.info("Stop signal received for event poller.")
 
 
-async def poll_for_events():
+def get_poller_state() -> dict:
+    """Returns a snapshot of the adaptive scheduler state for every table."""
+    return {
+        "worker_id": WORKER_ID,
+        "listening": event_listener.is_listening(),
+        "scheduling_mode": settings.POLL_SCHEDULING_MODE,
+        "tables": {table: dict(state) for table, state in _poller_state.items()},
+    }
+
+
+def _new_table_state() -> dict:
+    return {
+        "mode": "idle",
+        "batch_size": settings.POLL_MIN_BATCH_SIZE,
+        "backlog": 0,
+        "wait_seconds": settings.POLL_INTERVAL,
+        "idle_backoff": settings.POLL_INTERVAL,
+        "last_claimed": 0,
+        "processed_total": 0,
+        "failed_total": 0,
+        "last_cycle_at": None,
+    }
+
+
+def _max_idle_wait() -> float:
     """
-    Polls the database every 2 seconds for new or updated records.
-    Uses 'processed' column to track which records have been handled.
-    Also processes failed insight retries periodically.
+    Upper bound for the idle back-off.
+    While the LISTEN connection is healthy we only need a slow safety poll,
+    since notifications wake the loop immediately.
     """
-    POLL_INTERVAL = 2  # 2 seconds as requested
-    retry_counter = 0  # Counter for retry processing
-    
-    logger.info(f"Starting database poller with {POLL_INTERVAL}s interval...")
-    
-    while _running:
+    if settings.EVENT_NOTIFY_ENABLED and event_listener.is_listening():
+        return settings.SAFETY_POLL_INTERVAL
+    return max(settings.POLL_INTERVAL, settings.POLL_MAX_IDLE_INTERVAL)
+
+
+async def _measure_backlog(table: str) -> int:
+    """Counts unprocessed rows (served by the partial processed = FALSE indexes)."""
+    return await db_helpers.count(table, where={"processed": False}, cap=settings.BACKLOG_COUNT_CAP)
+
+
+async def _schedule_next_cycle(table: str, state: dict, claimed: int, failed: int) -> float:
+    """
+    Adapts batch size and wait time to the backlog and returns how long to wait.
+    - Draining (a full batch was claimed): grow the batch and poll again immediately.
+    - Caught up (a partial batch): shrink back to the minimum batch size and wait.
+    - Idle (nothing claimed): back off exponentially up to the idle cap.
+    """
+    state["last_claimed"] = claimed
+    state["last_cycle_at"] = datetime.now(timezone.utc).isoformat()
+    state["processed_total"] += claimed - failed
+    state["failed_total"] += failed
+
+    if claimed >= state["batch_size"]:
+        backlog = await _measure_backlog(table)
+        state["backlog"] = backlog
+        if backlog > 0:
+            state["mode"] = "draining"
+            if backlog > state["batch_size"]:
+                state["batch_size"] = min(state["batch_size"] * 2, settings.POLL_MAX_BATCH_SIZE)
+            state["wait_seconds"] = 0
+            metrics.BACKLOG.set(backlog, table=table)
+            logger.info(f"Draining {table} backlog: {backlog} pending, batch size {state['batch_size']}")
+            return 0
+
+    state["backlog"] = 0
+    metrics.BACKLOG.set(0, table=table)
+    state["batch_size"] = settings.POLL_MIN_BATCH_SIZE
+    if claimed or state["mode"] != "idle":
+        state["mode"] = "active" if claimed else "idle"
+        state["idle_backoff"] = settings.POLL_INTERVAL
+    else:
+        state["idle_backoff"] = min(state["idle_backoff"] * 2, _max_idle_wait())
+
+    # Notifications wake the loop immediately, so only the safety poll is needed while listening
+    wait = _max_idle_wait() if event_listener.is_listening() else state["idle_backoff"]
+    if failed:
+        # Come back for released rows once their retry delay has passed
+        wait = min(wait, settings.CLAIM_RETRY_DELAY_SECONDS)
+    state["wait_seconds"] = wait
+    return wait
+
+
+async def _process_record(table: str, handler, label: str, record, semaphore: asyncio.Semaphore) -> bool:
+    """Handles one claimed row; returns False if it failed and must be released for a retry."""
+    async with semaphore:
         try:
-            # Check for unprocessed pull requests (including updates)
-            new_prs = await db_helpers.select(
-                "pull_requests",
-                where={"processed": False},
-                order_by="updated_at",
-                desc=True,
-                limit=10  # Process up to 10 at a time
-            )
-            
-            if new_prs:
-                logger.info(f"Found {len(new_prs)} unprocessed pull requests (new or updated)")
-                for pr in new_prs:
-                    try:
-                        await process_new_pull_request(pr)
-                        # Mark as processed
-                        await db_helpers.update(
-                            "pull_requests",
-                            where={"id": pr['id']},
-                            data={"processed": True}
-                        )
-                        logger.success(f"Processed PR #{pr['pr_number']} from repository {pr['repo_id']}")
-                    except Exception as e:
-                        logger.error(f"Failed to process PR {pr['id']}: {e}")
-            
-            # Check for unprocessed pipeline runs (including updates)
-            new_pipelines = await db_helpers.select(
-                "pipeline_runs",
-                where={"processed": False},
-                order_by="updated_at",
-                desc=True,
-                limit=10
+            await handler(record)
+        except Exception as e:
+            logger.error(f"Failed to process {label} {record['id']}: {e}")
+            metrics.ERRORS.inc(table=table, stage="process")
+            return False
+    return True
+
+
+async def _acknowledge(table: str, label: str, records: list, order_by: str):
+    """
+    Marks a whole batch of records processed with a single statement.
+    Rows that were updated again while we held the claim are not acknowledged
+    (their claim was dropped) and will be processed again in a later cycle.
+    If the statement itself fails, the claims simply expire and the rows are
+    re-delivered, so processing stays at-least-once.
+    Records the event lag of every acknowledged row.
+    """
+    if not records:
+        return
+
+    ids = [record['id'] for record in records]
+    for attempt in range(2):
+        try:
+            acked_ids = await db_helpers.update_many(
+                table,
+                ids=ids,
+                where={"claimed_by": WORKER_ID},
+                data={"processed": True, "claimed_by": None, "claim_expires_at": None}
             )
-            
-            if new_pipelines:
-                logger.info(f"Found {len(new_pipelines)} unprocessed pipeline runs (new or updated)")
-                for pipeline in new_pipelines:
-                    try:
-                        await process_new_pipeline(pipeline)
-                        # Mark as processed
-                        await db_helpers.update(
-                            "pipeline_runs",
-                            where={"id": pipeline['id']},
-                            data={"processed": True}
-                        )
-                        logger.success(f"Processed pipeline for PR #{pipeline['pr_number']} from repository {pipeline['repo_id']}")
-                    except Exception as e:
-                        logger.error(f"Failed to process pipeline {pipeline['id']}: {e}")
-            
-            # Check for unprocessed insights
-            new_insights = await db_helpers.select(
-                "insights",
-                where={"processed": False},
-                order_by="created_at",
-                desc=True,
-                limit=10
+            break
+        except Exception as e:
+            if attempt == 0:
+                logger.warning(f"Failed to acknowledge {len(ids)} {label}s, retrying once: {e}")
+                await asyncio.sleep(0.5)
+            else:
+                logger.error(f"Failed to acknowledge {len(ids)} {label}s; they will be re-processed after the claim lease expires: {e}")
+                metrics.ERRORS.inc(table=table, stage="ack")
+                return
+
+    acked = set(acked_ids)
+    now = datetime.now(timezone.utc)
+    metrics.EVENTS_PROCESSED.inc(len(acked), table=table)
+    for record in records:
+        if record['id'] in acked:
+            lag = waited_seconds(record, order_by, now)
+            if lag is not None:
+                metrics.EVENT_LAG_SECONDS.observe(lag, table=table)
+            logger.success(f"Processed {label} for PR #{record['pr_number']} from repository {record['repo_id']}")
+        else:
+            logger.info(f"{label.capitalize()} {record['id']} changed while processing; it will be processed again")
+
+
+async def _claim_records(table: str, order_by: str, batch_size: int) -> list:
+    """
+    Claims the next batch according to POLL_SCHEDULING_MODE.
+    - "fair": reads the oldest claimable rows (id, repo_id and timestamp only), picks
+      the batch with fair_select (overdue rows first, then round-robin by repository)
+      and claims exactly those rows.
+    - "newest": claims the most recently written rows first.
+    """
+    if settings.POLL_SCHEDULING_MODE != "fair":
+        return await db_helpers.claim_batch(
+            table,
+            worker_id=WORKER_ID,
+            limit=batch_size,
+            lease_seconds=settings.CLAIM_LEASE_SECONDS,
+            order_by=order_by,
+            desc=True,
+            returning=columns.POLLER_COLUMNS.get(table)
+        )
+
+    candidates = await db_helpers.select_claimable(
+        table,
+        select_fields=f'id, repo_id, {db_helpers.quote_identifier(order_by)}',
+        limit=batch_size * max(settings.POLL_FAIR_CANDIDATE_FACTOR, 1),
+        order_by=order_by
+    )
+    if not candidates:
+        return []
+
+    ids = fair_select(candidates, batch_size, order_by, datetime.now(timezone.utc), settings.POLL_MAX_WAIT_SECONDS)
+    # Rows claimed by another worker in the meantime are skipped
+    return await db_helpers.claim_batch(
+        table,
+        worker_id=WORKER_ID,
+        limit=len(ids),
+        lease_seconds=settings.CLAIM_LEASE_SECONDS,
+        order_by=order_by,
+        ids=ids,
+        returning=columns.POLLER_COLUMNS.get(table)
+    )
+
+
+async def _process_table(table: str, handler, order_by: str, label: str, semaphore: asyncio.Semaphore, batch_size: int) -> tuple:
+    """
+    Claims a batch of unprocessed rows from `table` and processes them with bounded
+    concurrency (POLL_CONCURRENCY rows at a time), then acknowledges the batch with one
+    statement. Claims are leased, so rows held by a crashed worker become claimable
+    again once the lease expires; failed rows are released for a later retry.
+    Returns (rows claimed, rows that failed processing).
+    """
+    with metrics.STAGE_SECONDS.time(table=table, stage="fetch"):
+        records = await _claim_records(table, order_by, batch_size)
+    if not records:
+        return 0, 0
+
+    logger.info(f"Claimed {len(records)} unprocessed {label}s (new or updated)")
+    with metrics.STAGE_SECONDS.time(table=table, stage="process"):
+        results = await asyncio.gather(
+            *(_process_record(table, handler, label, record, semaphore) for record in records)
+        )
+
+    processed = [record for record, ok in zip(records, results) if ok]
+    failed = [record for record, ok in zip(records, results) if not ok]
+
+    with metrics.STAGE_SECONDS.time(table=table, stage="ack"):
+        await _acknowledge(table, label, processed, order_by)
+
+    if failed:
+        try:
+            await db_helpers.release_claims(
+                table, [record['id'] for record in failed], WORKER_ID,
+                retry_after_seconds=settings.CLAIM_RETRY_DELAY_SECONDS
             )
-            
-            if new_insights:
-                logger.info(f"Found {len(new_insights)} unprocessed insights")
-                for insight in new_insights:
-                    try:
-                        await process_new_insight(insight)
-                        # Mark as processed
-                        await db_helpers.update(
-                            "insights",
-                            where={"id": insight['id']},
-                            data={"processed": True}
-                        )
-                        logger.success(f"Processed insight for PR #{insight['pr_number']} from repository {insight['repo_id']}")
-                    except Exception as e:
-                        logger.error(f"Failed to process insight {insight['id']}: {e}")
-            
-            # Process failed insight retries every 30 poll cycles (60 seconds)
-            retry_counter += 1
-            if retry_counter >= 30:
-                retry_counter = 0
-                try:
-                    await process_failed_insight_retries()
-                except Exception as e:
-                    logger.error(f"Failed to process insight retries: {e}")
-            
-            # Sleep before next poll
-            await asyncio.sleep(POLL_INTERVAL)
+        except Exception as e:
+            logger.warning(f"Could not release {len(failed)} failed {label}s, they will be retried after the lease expires: {e}")
+            metrics.ERRORS.inc(table=table, stage="release")
+    return len(records), len(failed)
+
+
+async def _poll_table(table: str, handler, order_by: str, label: str):
+    """
+    Poll loop for a single table. Each table runs independently so a burst on one
+    table never delays broadcasts for the others.
+    """
+    semaphore = asyncio.Semaphore(settings.POLL_CONCURRENCY)
+    state = _poller_state.setdefault(table, _new_table_state())
+
+    while _running:
+        try:
+            started = time.perf_counter()
+            claimed, failed = await _process_table(table, handler, order_by, label, semaphore, state["batch_size"])
+            if claimed:
+                metrics.POLL_CYCLE_SECONDS.observe(time.perf_counter() - started, table=table)
+            timeout = await _schedule_next_cycle(table, state, claimed, failed)
+
+            # Wait for the next change notification (or the adaptive poll interval)
+            if timeout > 0:
+                woken = await event_listener.wait_for_events(table, timeout=timeout)
+                if woken and settings.EVENT_COALESCE_WINDOW_MS > 0:
+                    # Let a burst of writes for the same PR settle into one row version
+                    await asyncio.sleep(settings.EVENT_COALESCE_WINDOW_MS / 1000)
 
         except asyncio.CancelledError:
-            logger.warning("Event poller task was cancelled.")
-            break
+            logger.warning(f"Event poller for {table} was cancelled.")
+            raise
         except Exception as e:
-            logger.error(f"Event poller encountered an error: {e}. Retrying in 5s.")
+            logger.error(f"Event poller for {table} encountered an error: {e}. Retrying in 5s.")
+            metrics.ERRORS.inc(table=table, stage="cycle")
             await asyncio.sleep(5)
-    
-    logger.info("Database event poller has shut down.")
\ No newline at end of file
+
+
+async def poll_for_events():
+    """
+    Processes new or updated records as soon as a change notification arrives,
+    falling back to a periodic safety poll when no notifications are received.
+    Uses 'processed' column to track which records have been handled and a leased
+    claim so multiple workers or replicas can share the backlog without duplicates.
+    Insight generation runs separately in the insight worker pool.
+    """
+    mode = "notification-driven" if settings.EVENT_NOTIFY_ENABLED else "polling"
+    logger.info(f"Starting database poller {WORKER_ID} in {mode} mode (poll interval {settings.POLL_INTERVAL}s, safety poll {settings.SAFETY_POLL_INTERVAL}s, concurrency {settings.POLL_CONCURRENCY})...")
+
+    try:
+        await asyncio.gather(*(_poll_table(*target) for target in POLL_TARGETS))
+    except asyncio.CancelledError:
+        logger.warning("Event poller task was cancelled.")
+
+    logger.info("Database event poller has shut down.")
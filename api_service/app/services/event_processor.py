@@ -2,19 +2,18 @@
 
 import json
 import asyncio
+import time
 from typing import Set
 from datetime import datetime
 from loguru import logger
-from app.data.database import db_helpers
-from app.services import ai_service
+from app.data.configs.app_settings import settings
+from app.data.database import columns, db_helpers
+from app.services import ai_service, insight_queue, metrics, risk_engine
 from app.services.websocket_manager import websocket_manager
 
 # A simple in-memory lock to prevent race conditions
 PROCESSING_EVENTS: Set[str] = set()
 
-# Retry tracking for failed AI insights
-FAILED_INSIGHTS_RETRY: dict = {}
-
 
 def _serialize_datetime_fields(data: dict) -> dict:
     """Convert datetime objects to ISO format strings for JSON serialization."""
@@ -30,9 +29,10 @@ def _serialize_datetime_fields(data: dict) -> dict:
 async def process_new_pull_request(pr_record: dict):
     """
     Process a new or updated pull request.
-    Generates AI insights for new PRs with files_changed data or attempts alternative approaches.
-    For updates (status changes, approvals, etc.), just broadcasts the updated state.
-    Now includes robust retry mechanisms and fallback strategies.
+    Broadcasts the PR state immediately. New PRs without an insight get a provisional
+    insight from the local risk engine and an insight job for the worker pool, so
+    LLM latency never delays the broadcast or the first risk level. PRs whose
+    commit_sha moved past their latest insight get a job for incremental re-analysis.
     """
     repo_id = pr_record['repo_id']
     pr_number = pr_record['pr_number']
@@ -47,59 +47,28 @@ async def process_new_pull_request(pr_record: dict):
     try:
         logger.info(f"Processing PR #{pr_number} in repository {repo_id}")
         
-        # Check if this is a genuinely new PR or just a status update
-        files_changed = pr_record.get('files_changed', [])
-        
-        # Handle case where files_changed might be a JSON string
-        if isinstance(files_changed, str):
-            try:
-                files_changed = json.loads(files_changed)
-            except json.JSONDecodeError:
-                logger.warning(f"Invalid JSON in files_changed for PR #{pr_number}")
-                files_changed = []
-        
         existing_insights = await db_helpers.select(
             "insights",
             where={"repo_id": repo_id, "pr_number": pr_number},
+            order_by="created_at",
+            desc=True,
             limit=1
         )
         
-        # Enhanced insight generation logic with fallback strategies
-        should_attempt_insights = not existing_insights
-        
-        if should_attempt_insights:
-            insight_success = False
-            
-            if files_changed:
-                logger.info(f"New PR #{pr_number} detected with {len(files_changed)} changed files, generating AI analysis...")
-                # Update pr_record with parsed files_changed for AI processing
-                pr_record_with_parsed_files = pr_record.copy()
-                pr_record_with_parsed_files['files_changed'] = files_changed
-                insight_success = await _generate_ai_insight_for_pr_with_retry(pr_record_with_parsed_files)
-            else:
-                logger.warning(f"PR #{pr_number} has no files_changed data, attempting fallback insight generation...")
-                # Fallback: Generate basic insight with available PR metadata
-                insight_success = await _generate_fallback_insight(pr_record)
-            
-            if insight_success:
-                # Broadcast as new PR with insight generation
-                event_state = _determine_pr_event_state(pr_record)
-                await websocket_manager.broadcast_pr_state_update(repo_id, pr_number, event_state)
-            else:
-                logger.error(f"Failed to generate any insight for PR #{pr_number}, will retry in background")
-                # Schedule for background retry
-                await _schedule_insight_retry(pr_record)
-                
-        elif existing_insights:
-            logger.info(f"PR #{pr_number} update detected (status/approval change), broadcasting updated state...")
-            # Broadcast as state update only
-            event_state = _determine_pr_event_state(pr_record)
-            await websocket_manager.broadcast_pr_state_update(repo_id, pr_number, event_state)
+        provisional_saved = False
+        if not existing_insights:
+            logger.info(f"New PR #{pr_number} detected, queuing insight generation...")
+            if settings.RISK_ENGINE_ENABLED:
+                provisional_saved = await _save_provisional_insight(pr_record)
+            await insight_queue.enqueue(repo_id, pr_number)
+        elif _insight_is_stale(existing_insights[0], pr_record):
+            logger.info(f"PR #{pr_number} has new commits ({pr_record.get('commit_sha')}), queuing incremental re-analysis...")
+            await insight_queue.enqueue(repo_id, pr_number)
         else:
-            logger.info(f"PR #{pr_number} processing complete, broadcasting basic update...")
-            # Broadcast as basic update
-            event_state = _determine_pr_event_state(pr_record)
-            await websocket_manager.broadcast_pr_state_update(repo_id, pr_number, event_state)
+            logger.info(f"PR #{pr_number} update detected (status/approval change), broadcasting updated state...")
+        
+        event_state = _determine_pr_event_state(pr_record)
+        await websocket_manager.queue_pr_state_update(repo_id, pr_number, event_state, provisional_insight=provisional_saved)
         
     except Exception as e:
         logger.error(f"Failed to process PR #{pr_number} in repo {repo_id}", exception=e)
@@ -108,6 +77,82 @@ async def process_new_pull_request(pr_record: dict):
         PROCESSING_EVENTS.discard(record_id)
 
 
+def _insight_is_stale(insight: dict, pr_record: dict) -> bool:
+    """
+    True if the insight was made for an earlier commit than the PR's current one.
+    Final insights are only re-analysed with AI_INCREMENTAL_ENABLED; a provisional one
+    (e.g. its job gave up) always is, so a new commit gets a fresh attempt.
+    """
+    commit_sha = pr_record.get('commit_sha')
+    if not commit_sha or insight.get('commit_sha') == commit_sha:
+        return False
+    return bool(insight.get('provisional')) or settings.AI_INCREMENTAL_ENABLED
+
+
+def _parse_files_changed(pr_record: dict) -> list:
+    """Returns the PR's files_changed as a list, decoding it if it is stored as a JSON string."""
+    files_changed = pr_record.get('files_changed') or []
+    if isinstance(files_changed, str):
+        try:
+            files_changed = json.loads(files_changed)
+        except json.JSONDecodeError:
+            logger.warning(f"Invalid JSON in files_changed for PR #{pr_record.get('pr_number')}")
+            files_changed = []
+    return files_changed
+
+
+async def _save_insight(pr_record: dict, insight: dict, provisional: bool = False):
+    """
+    Stores an insight for the PR. A provisional insight from the risk engine is
+    superseded in place, so each PR keeps a single row for the same analysis.
+    """
+    repo_id = pr_record['repo_id']
+    pr_number = pr_record['pr_number']
+    insight_record = {
+        "commit_sha": pr_record.get("commit_sha"),
+        "author": pr_record.get("author"),
+        "avatar_url": pr_record.get("author_avatar"),
+        "risk_level": insight.get("risk_level", insight.get("riskLevel", "low")).lower(),
+        "summary": insight.get("summary"),
+        "recommendation": insight.get("recommendation"),
+        "provisional": provisional,
+    }
+    
+    existing = None
+    if not provisional:
+        existing = await db_helpers.select_one(
+            "insights",
+            where={"repo_id": repo_id, "pr_number": pr_number, "provisional": True}
+        )
+    if existing:
+        await db_helpers.update("insights", insight_record, where={"id": existing['id']})
+    else:
+        await db_helpers.insert("insights", {"repo_id": repo_id, "pr_number": pr_number, **insight_record, "processed": False})
+
+
+async def _save_provisional_insight(pr_record: dict) -> bool:
+    """Scores the PR with the local risk engine and stores the result as a provisional insight."""
+    pr_number = pr_record['pr_number']
+    try:
+        if 'files_changed' not in pr_record:
+            # The poller claims PRs without their diffs; only new PRs need them
+            files_row = await db_helpers.select_one(
+                "pull_requests", where={"id": pr_record['id']}, select_fields=columns.PR_FILES
+            )
+            pr_record = {**pr_record, **(files_row or {})}
+        scored = {**pr_record, "files_changed": _parse_files_changed(pr_record)}
+        started = time.perf_counter()
+        insight = risk_engine.assess(scored)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        await _save_insight(pr_record, insight, provisional=True)
+        logger.info(f"Saved provisional {insight['risk_level']} risk insight for PR #{pr_number} (score {insight['score']}, {elapsed_ms:.1f}ms)")
+        return True
+    except Exception as e:
+        # The AI insight job still runs; the PR just has no risk level until it finishes
+        logger.warning(f"Could not save provisional insight for PR #{pr_number}: {e}")
+        return False
+
+
 async def process_new_pipeline(pipeline_record: dict):
     """
     Process a new or updated pipeline run.
@@ -129,7 +174,7 @@ async def process_new_pipeline(pipeline_record: dict):
         event_state = _determine_pipeline_event_state(pipeline_record)
         
         # Broadcast pipeline state change with actual event state
-        await websocket_manager.broadcast_pr_state_update(repo_id, pr_number, event_state)
+        await websocket_manager.queue_pr_state_update(repo_id, pr_number, event_state)
         
     except Exception as e:
         logger.error(f"Failed to process pipeline for PR #{pr_number} in repo {repo_id}", exception=e)
@@ -262,20 +307,7 @@ async def _generate_ai_insight_for_pr(pr_record: dict):
         logger.info(f"AI service returned: {ai_insight_json}")
         
         if ai_insight_json:
-            # Store the insights in the database with processed=false initially
-            insight_record = {
-                "repo_id": repo_id,
-                "pr_number": pr_number,
-                "commit_sha": pr_record.get("commit_sha"),
-                "author": pr_record.get("author"),
-                "avatar_url": pr_record.get("author_avatar"),
-                "risk_level": ai_insight_json.get("risk_level", ai_insight_json.get("riskLevel", "low")).lower(),
-                "summary": ai_insight_json.get("summary"),
-                "recommendation": ai_insight_json.get("recommendation"),
-                "processed": False  # Will be processed by the poller
-            }
-            
-            result = await db_helpers.insert("insights", insight_record)
+            await _save_insight(pr_record, ai_insight_json)
             logger.success(f"Generated and saved AI insight for PR #{pr_number} in repository {repo_id}")
             return True
         else:
@@ -287,10 +319,12 @@ async def _generate_ai_insight_for_pr(pr_record: dict):
         return False
 
 
-async def _generate_ai_insight_for_pr_with_retry(pr_record: dict, max_retries: int = 3):
+async def _generate_ai_insight_for_pr_with_retry(pr_record: dict, max_retries: int = 3, previous_insight: dict = None):
     """
-    Enhanced AI insight generation with retry logic and progressive data reduction.
-    Attempts multiple strategies to handle large file changes and API limitations.
+    AI insight generation with retries for transient failures.
+    The prompt is already packed to the model's token budget, so every attempt
+    sends the same request. With `previous_insight` from an earlier commit, only
+    changed files are re-analysed and the result is saved as a fresh insight row.
     """
     repo_id = pr_record['repo_id']
     pr_number = pr_record['pr_number']
@@ -299,28 +333,18 @@ async def _generate_ai_insight_for_pr_with_retry(pr_record: dict, max_retries: i
         try:
             logger.info(f"AI insight generation attempt {attempt + 1}/{max_retries} for PR #{pr_number}")
             
-            # Progressive data reduction for large files
-            if attempt > 0:
-                pr_record = await _reduce_file_data_for_retry(pr_record, attempt)
-            
             # Generate AI insights using the AI service
-            ai_insight_json = await ai_service.get_ai_insights(pr_record)
+            started = time.perf_counter()
+            try:
+                ai_insight_json = await ai_service.get_ai_insights(pr_record, previous_insight=previous_insight)
+            except Exception:
+                metrics.AI_REQUEST_SECONDS.observe(time.perf_counter() - started, outcome="error")
+                raise
+            metrics.AI_REQUEST_SECONDS.observe(time.perf_counter() - started, outcome="success" if ai_insight_json else "failure")
             
             if ai_insight_json:
-                # Store the insights in the database
-                insight_record = {
-                    "repo_id": repo_id,
-                    "pr_number": pr_number,
-                    "commit_sha": pr_record.get("commit_sha"),
-                    "author": pr_record.get("author"),
-                    "avatar_url": pr_record.get("author_avatar"),
-                    "risk_level": ai_insight_json.get("risk_level", ai_insight_json.get("riskLevel", "low")).lower(),
-                    "summary": ai_insight_json.get("summary"),
-                    "recommendation": ai_insight_json.get("recommendation"),
-                    "processed": False
-                }
-                
-                result = await db_helpers.insert("insights", insight_record)
+                # Supersedes the provisional insight, if any
+                await _save_insight(pr_record, ai_insight_json)
                 logger.success(f"Generated and saved AI insight for PR #{pr_number} in repository {repo_id} (attempt {attempt + 1})")
                 return True
             else:
@@ -329,6 +353,9 @@ async def _generate_ai_insight_for_pr_with_retry(pr_record: dict, max_retries: i
                     await asyncio.sleep(2 ** attempt)  # Exponential backoff
                     
         except Exception as e:
+            if isinstance(e, ai_service.CircuitOpenError):
+                # Retrying now would only be rejected again; let the job queue defer it
+                raise
             logger.error(f"AI insight generation attempt {attempt + 1} failed for PR #{pr_number}: {e}")
             if attempt < max_retries - 1:
                 await asyncio.sleep(2 ** attempt)  # Exponential backoff
@@ -338,47 +365,6 @@ async def _generate_ai_insight_for_pr_with_retry(pr_record: dict, max_retries: i
     return False
 
 
-async def _reduce_file_data_for_retry(pr_record: dict, attempt: int) -> dict:
-    """
-    Progressively reduce file data size for retry attempts.
-    """
-    pr_record_copy = pr_record.copy()
-    files_changed = pr_record_copy.get('files_changed', [])
-    
-    if not files_changed:
-        return pr_record_copy
-    
-    logger.info(f"Reducing file data for retry attempt {attempt}")
-    
-    reduced_files = []
-    for file_data in files_changed:
-        reduced_file = file_data.copy()
-        patch = reduced_file.get('patch', '')
-        
-        if attempt == 1:
-            # First retry: Reduce patch size to 300 characters
-            if len(patch) > 300:
-                reduced_file['patch'] = patch[:300] + "... [truncated for retry]"
-        elif attempt == 2:
-            # Second retry: Remove patch data entirely, keep only metadata
-            reduced_file['patch'] = f"[File modified: +{file_data.get('additions', 0)}/-{file_data.get('deletions', 0)} changes]"
-        else:
-            # Final retry: Keep only filename and basic stats
-            reduced_file = {
-                'filename': file_data.get('filename', 'unknown'),
-                'status': file_data.get('status', 'modified'),
-                'additions': file_data.get('additions', 0),
-                'deletions': file_data.get('deletions', 0),
-                'patch': '[Patch data removed for compatibility]'
-            }
-        
-        reduced_files.append(reduced_file)
-    
-    pr_record_copy['files_changed'] = reduced_files
-    logger.info(f"Reduced files_changed from original to {len(reduced_files)} files for attempt {attempt}")
-    return pr_record_copy
-
-
 async def _generate_fallback_insight(pr_record: dict):
     """
     Generate a basic insight when files_changed data is missing.
@@ -418,19 +404,7 @@ async def _generate_fallback_insight(pr_record: dict):
             recommendation += " This appears to be a bug fix - verify the fix addresses the root cause."
         
         # Store the fallback insight
-        insight_record = {
-            "repo_id": repo_id,
-            "pr_number": pr_number,
-            "commit_sha": pr_record.get("commit_sha"),
-            "author": author,
-            "avatar_url": pr_record.get("author_avatar"),
-            "risk_level": risk_level,
-            "summary": summary,
-            "recommendation": recommendation,
-            "processed": False
-        }
-        
-        result = await db_helpers.insert("insights", insight_record)
+        await _save_insight(pr_record, {"risk_level": risk_level, "summary": summary, "recommendation": recommendation})
         logger.success(f"Generated and saved fallback insight for PR #{pr_number} in repository {repo_id}")
         return True
         
@@ -439,74 +413,80 @@ async def _generate_fallback_insight(pr_record: dict):
         return False
 
 
-async def _schedule_insight_retry(pr_record: dict):
+async def process_insight_job(job: dict) -> bool:
     """
-    Schedule a PR for background retry of insight generation.
+    Generates the insight for one claimed job from the insight queue.
+    The first attempt gets the full inline retry loop; later attempts make a single
+    AI call, switch to the fallback insight once INSIGHT_RETRY_AI_ATTEMPTS are used,
+    and give up after INSIGHT_RETRY_MAX_ATTEMPTS. Failed jobs are rescheduled with backoff.
+    Broadcasts an "insight ready" event and returns True when an insight was saved.
     """
-    repo_id = pr_record['repo_id']
-    pr_number = pr_record['pr_number']
-    retry_key = f"{repo_id}:{pr_number}"
-    
-    # Track retry attempts
-    if retry_key not in FAILED_INSIGHTS_RETRY:
-        FAILED_INSIGHTS_RETRY[retry_key] = {
-            'attempts': 0,
-            'pr_record': pr_record,
-            'last_attempt': datetime.now()
-        }
+    repo_id = job['repo_id']
+    pr_number = job['pr_number']
+    attempts = job['attempts']
     
-    FAILED_INSIGHTS_RETRY[retry_key]['attempts'] += 1
-    logger.info(f"Scheduled PR #{pr_number} for background insight retry (attempt {FAILED_INSIGHTS_RETRY[retry_key]['attempts']})")
-
-
-async def process_failed_insight_retries():
-    """
-    Background task to retry failed insight generations.
-    Should be called periodically by the poller.
-    """
-    if not FAILED_INSIGHTS_RETRY:
-        return
-    
-    logger.info(f"Processing {len(FAILED_INSIGHTS_RETRY)} failed insight retries...")
-    
-    completed_retries = []
+    if attempts > settings.INSIGHT_RETRY_MAX_ATTEMPTS:
+        logger.warning(f"Giving up on insight generation for PR #{pr_number} in {repo_id} after {attempts - 1} attempts")
+        await insight_queue.complete(job)
+        return False
     
-    for retry_key, retry_data in FAILED_INSIGHTS_RETRY.items():
-        if retry_data['attempts'] >= 5:  # Max 5 attempts
-            logger.warning(f"Giving up on insight generation for {retry_key} after 5 attempts")
-            completed_retries.append(retry_key)
-            continue
+    try:
+        # A provisional insight does not count, the job exists to replace it
+        existing_insights = await db_helpers.select(
+            "insights",
+            where={"repo_id": repo_id, "pr_number": pr_number, "provisional": False},
+            order_by="created_at",
+            desc=True,
+            limit=1
+        )
+        pr_record = await db_helpers.select_one(
+            "pull_requests",
+            where={"repo_id": repo_id, "pr_number": pr_number}
+        )
+        previous_insight = existing_insights[0] if existing_insights else None
+        if not pr_record or (previous_insight and not _insight_is_stale(previous_insight, pr_record)):
+            logger.info(f"Insight job for PR #{pr_number} in {repo_id} is no longer needed")
+            await insight_queue.complete(job)
+            return False
         
-        # Wait at least 5 minutes between retries
-        time_since_last = (datetime.now() - retry_data['last_attempt']).total_seconds()
-        if time_since_last < 300:  # 5 minutes
-            continue
+        logger.info(f"Generating insight for PR #{pr_number} in {repo_id} (attempt {attempts})")
+        files_changed = _parse_files_changed(pr_record)
+        pr_record['files_changed'] = files_changed
         
+        if not files_changed:
+            logger.warning(f"PR #{pr_number} has no files_changed data, generating fallback insight...")
+            success = await _generate_fallback_insight(pr_record)
+        elif attempts > settings.INSIGHT_RETRY_AI_ATTEMPTS:
+            # AI attempts are exhausted, settle for the risk engine's assessment
+            logger.warning(f"AI attempts exhausted for PR #{pr_number}, keeping the risk engine insight")
+            await _save_insight(pr_record, risk_engine.assess(pr_record))
+            success = True
+        else:
+            max_retries = 3 if attempts == 1 else 1
+            success = await _generate_ai_insight_for_pr_with_retry(pr_record, max_retries=max_retries, previous_insight=previous_insight)
+        
+        if not success:
+            await insight_queue.reschedule(job, error="AI insight generation failed")
+            return False
+        
+        await insight_queue.complete(job)
+        event_state = _determine_pr_event_state(pr_record)
+        await websocket_manager.broadcast_insight_ready(repo_id, pr_number, event_state)
+        return True
+        
+    except ai_service.CircuitOpenError as e:
+        # The provider is unavailable, not this PR: defer without spending an attempt
+        logger.info(f"Deferring insight job for PR #{pr_number} in {repo_id}: {e}")
         try:
-            logger.info(f"Retrying insight generation for {retry_key}")
-            pr_record = retry_data['pr_record']
-            
-            # Try fallback insight if multiple attempts failed
-            if retry_data['attempts'] >= 3:
-                success = await _generate_fallback_insight(pr_record)
-            else:
-                success = await _generate_ai_insight_for_pr_with_retry(pr_record, max_retries=1)
-            
-            if success:
-                logger.success(f"Successfully generated insight for {retry_key} on retry attempt {retry_data['attempts']}")
-                completed_retries.append(retry_key)
-            else:
-                retry_data['attempts'] += 1
-                retry_data['last_attempt'] = datetime.now()
-                
-        except Exception as e:
-            logger.error(f"Failed retry attempt for {retry_key}: {e}")
-            retry_data['attempts'] += 1
-            retry_data['last_attempt'] = datetime.now()
-    
-    # Clean up completed retries
-    for retry_key in completed_retries:
-        del FAILED_INSIGHTS_RETRY[retry_key]
+            await insight_queue.defer(job, delay=int(e.retry_after) + 1, error=str(e))
+        except Exception as defer_error:
+            logger.warning(f"Could not defer insight job for PR #{pr_number}, it will run again after the claim lease expires: {defer_error}")
+        return False
         
-    if completed_retries:
-        logger.info(f"Completed {len(completed_retries)} insight retries")
\ No newline at end of file
+    except Exception as e:
+        logger.error(f"Insight job for PR #{pr_number} in {repo_id} failed: {e}")
+        try:
+            await insight_queue.reschedule(job, error=str(e))
+        except Exception as reschedule_error:
+            logger.warning(f"Could not reschedule insight job for PR #{pr_number}, it will run again after the claim lease expires: {reschedule_error}")
+        return False
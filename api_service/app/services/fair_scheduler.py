@@ -0,0 +1,52 @@
+# api_service/app/services/fair_scheduler.py
+
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+# Pure selection logic for the poller's "fair" scheduling mode. Kept free of I/O so
+# scripts/simulate_fair_scheduling.py can exercise exactly the code the poller runs.
+
+
+def waited_seconds(record: Dict[str, Any], order_by: str, now: datetime) -> Optional[float]:
+    """Seconds between the row being written and `now`, or None if the timestamp is missing."""
+    written_at = record.get(order_by)
+    if not isinstance(written_at, datetime):
+        return None
+    if written_at.tzinfo is None:
+        written_at = written_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (now - written_at).total_seconds())
+
+
+def fair_select(candidates: List[Dict[str, Any]], limit: int, order_by: str, now: datetime, max_wait: float) -> List[Any]:
+    """
+    Chooses up to `limit` row ids from `candidates` (unprocessed rows, oldest first).
+    1. Rows that have waited at least `max_wait` seconds are taken first, oldest first,
+       so no row can be passed over indefinitely.
+    2. The remaining slots are filled round-robin across repositories, oldest row of
+       each repository first, so one busy repository cannot monopolise a batch.
+    Returns the chosen ids in candidate (oldest first) order.
+    """
+    if limit <= 0:
+        return []
+
+    chosen = []
+    per_repo = OrderedDict()
+    for record in candidates:
+        waited = waited_seconds(record, order_by, now)
+        if waited is not None and waited >= max_wait and len(chosen) < limit:
+            chosen.append(record)
+        else:
+            per_repo.setdefault(record['repo_id'], []).append(record)
+
+    # Repositories are visited in order of their oldest pending row
+    queues = list(per_repo.values())
+    while len(chosen) < limit and queues:
+        for rows in queues:
+            if len(chosen) >= limit:
+                break
+            chosen.append(rows.pop(0))
+        queues = [rows for rows in queues if rows]
+
+    chosen_ids = {record['id'] for record in chosen}
+    return [record['id'] for record in candidates if record['id'] in chosen_ids]
@@ -0,0 +1,74 @@
+# api_service/app/services/file_categories.py
+
+import re
+
+# Classifies changed files by the kind of risk they usually carry.
+# Categories are checked in order; the first match wins.
+
+MIGRATION = "migration"
+SECURITY = "security"
+CONFIG = "config"
+CORE = "core"
+TEST = "test"
+DOCS = "docs"
+LOCKFILE = "lockfile"
+OTHER = "other"
+
+_LOCKFILE_NAMES = {
+    "package-lock.json", "yarn.lock", "pnpm-lock.yaml", "poetry.lock", "pipfile.lock",
+    "pubspec.lock", "go.sum", "cargo.lock", "composer.lock", "gemfile.lock", "podfile.lock",
+}
+
+_PATTERNS = [
+    (MIGRATION, re.compile(r"(^|/)(migrations?|alembic|flyway|liquibase)/|\.sql$|schema\.(sql|prisma|rb)$")),
+    # Tests and docs come before security, so tests/test_auth.py and docs/security.md
+    # rank as the tests and docs they are
+    (TEST, re.compile(r"(^|/)(tests?|__tests__|spec)/|(^|/)test_[^/]*$|_test\.\w+$|\.(test|spec)\.\w+$")),
+    (DOCS, re.compile(
+        r"\.(md|rst|adoc)$|(^|/)(?!requirements)[^/]*\.txt$|(^|/)(docs?|documentation)/"
+        r"|(^|/)(license|changelog|readme|authors|contributors)[^/]*$"
+    )),
+    # Keywords must be whole path segments (or parts of names split by _ . -), so
+    # author_profile.py is not an auth file
+    (SECURITY, re.compile(
+        r"(^|[/_.-])(auth|authn|authz|authenticat\w*|authoriz\w*|oauth2?|security|secrets?"
+        r"|(en|de)?crypt\w*|permissions?|login|passwords?|credentials?"
+        r"|acl|rbac|jwt|tokens?|sessions?)([/_.-]|$)"
+    )),
+    (CONFIG, re.compile(
+        r"(^|/)dockerfile[^/]*$|docker-compose|\.(ya?ml|toml|ini|cfg|conf|env|properties|tf|tfvars)$"
+        r"|(^|/)\.env|(^|/)(config|configs|settings|deploy|k8s|helm|terraform|\.github)/"
+        r"|(^|/)(requirements[^/]*\.txt|package\.json|pyproject\.toml|setup\.py|pubspec\.yaml|makefile)$"
+    )),
+    (CORE, re.compile(
+        r"\.(py|js|jsx|ts|tsx|go|java|kt|kts|rb|rs|cs|c|cc|cpp|h|hpp|php|swift|dart|scala|sh)$"
+    )),
+]
+
+# Relative review risk per category, used to rank files (higher first)
+CATEGORY_RISK = {
+    MIGRATION: 100,
+    SECURITY: 90,
+    CONFIG: 70,
+    CORE: 60,
+    OTHER: 40,
+    TEST: 30,
+    DOCS: 10,
+    LOCKFILE: 0,
+}
+
+
+def categorize(filename: str) -> str:
+    """Returns the risk category of a changed file path."""
+    path = (filename or "").lower()
+    if path.rsplit("/", 1)[-1] in _LOCKFILE_NAMES:
+        return LOCKFILE
+    for category, pattern in _PATTERNS:
+        if pattern.search(path):
+            return category
+    return OTHER
+
+
+def risk_score(filename: str) -> int:
+    """Relative review risk of a changed file (see CATEGORY_RISK)."""
+    return CATEGORY_RISK[categorize(filename)]
@@ -0,0 +1,134 @@
+# api_service/app/services/insight_cache.py
+
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from loguru import logger
+from app.data.configs.app_settings import settings
+from app.data.database.core_db import get_db
+from app.services.metrics import INSIGHT_CACHE_REQUESTS
+
+# Two-tier cache of AI insights keyed by a fingerprint of the prompt inputs:
+# an in-process LRU in front of the `insight_cache` table (scripts/insight_cache_v1.sql).
+# Cache failures are logged and treated as misses; they never fail insight generation.
+
+# key -> (monotonic expiry, insight)
+_memory: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+_last_purge = 0.0
+
+
+def _normalize_files(files_changed: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Keeps only the fields that reach the prompt, in a stable order, with patches hashed."""
+    normalized = []
+    for file_data in files_changed:
+        patch = file_data.get('patch') or ''
+        normalized.append({
+            "filename": file_data.get('filename', 'unknown'),
+            "status": file_data.get('status', 'unknown'),
+            "additions": file_data.get('additions', 0),
+            "deletions": file_data.get('deletions', 0),
+            "patch": hashlib.sha256(patch.encode('utf-8')).hexdigest(),
+        })
+    return sorted(normalized, key=lambda f: f["filename"])
+
+
+def cache_key(pr_data: Dict[str, Any], files_changed: List[Dict[str, Any]], model: str, prompt_template: str) -> str:
+    """
+    SHA-256 over everything that shapes the prompt: commit sha, the normalized
+    files_changed digest, the PR metadata in the prompt, the model and the template.
+    """
+    fingerprint = {
+        "commit_sha": pr_data.get("commit_sha"),
+        "files": _normalize_files(files_changed),
+        "author": pr_data.get("author"),
+        "branch_name": pr_data.get("branch_name"),
+        "title": pr_data.get("title"),
+        "model": model,
+        "prompt": hashlib.sha256(prompt_template.encode('utf-8')).hexdigest(),
+    }
+    payload = json.dumps(fingerprint, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _remember(key: str, insight: Dict[str, Any], ttl: float):
+    _memory[key] = (time.monotonic() + ttl, insight)
+    _memory.move_to_end(key)
+    while len(_memory) > max(settings.INSIGHT_CACHE_MEMORY_SIZE, 0):
+        _memory.popitem(last=False)
+
+
+async def get(key: str) -> Optional[Dict[str, Any]]:
+    """Returns a copy of the cached insight for `key`, or None."""
+    if not settings.INSIGHT_CACHE_ENABLED:
+        return None
+
+    if key in _memory:
+        expires, insight = _memory[key]
+        if expires > time.monotonic():
+            _memory.move_to_end(key)
+            INSIGHT_CACHE_REQUESTS.inc(result="memory_hit")
+            return dict(insight)
+        del _memory[key]
+
+    try:
+        row = await get_db().fetch_one(
+            "SELECT insight, EXTRACT(EPOCH FROM expires_at - now()) AS ttl_left "
+            "FROM insight_cache WHERE cache_key = :key AND expires_at > now()",
+            {"key": key}
+        )
+    except Exception as e:
+        logger.warning(f"Insight cache lookup failed, treating as a miss: {e}")
+        row = None
+
+    if not row:
+        INSIGHT_CACHE_REQUESTS.inc(result="miss")
+        return None
+
+    insight = row["insight"]
+    if isinstance(insight, str):
+        insight = json.loads(insight)
+    _remember(key, insight, float(row["ttl_left"]))
+    INSIGHT_CACHE_REQUESTS.inc(result="db_hit")
+    return dict(insight)
+
+
+async def put(key: str, insight: Dict[str, Any], model: Optional[str] = None):
+    """Stores an insight in both tiers for INSIGHT_CACHE_TTL_SECONDS."""
+    if not settings.INSIGHT_CACHE_ENABLED:
+        return
+
+    _remember(key, dict(insight), settings.INSIGHT_CACHE_TTL_SECONDS)
+    query = """
+        INSERT INTO insight_cache (cache_key, insight, model, expires_at)
+        VALUES (:key, CAST(:insight AS JSONB), :model, now() + make_interval(secs => :ttl))
+        ON CONFLICT (cache_key) DO UPDATE SET
+            insight = EXCLUDED.insight,
+            model = EXCLUDED.model,
+            created_at = now(),
+            expires_at = EXCLUDED.expires_at
+    """
+    values = {"key": key, "insight": json.dumps(insight), "model": model, "ttl": settings.INSIGHT_CACHE_TTL_SECONDS}
+    try:
+        await get_db().execute(query, values)
+    except Exception as e:
+        logger.warning(f"Failed to store insight in the persistent cache: {e}")
+        return
+
+    await _purge_if_due()
+
+
+async def _purge_if_due():
+    """Deletes expired entries at most once per INSIGHT_CACHE_PURGE_INTERVAL."""
+    global _last_purge
+    now = time.monotonic()
+    if now - _last_purge < settings.INSIGHT_CACHE_PURGE_INTERVAL:
+        return
+    _last_purge = now
+
+    try:
+        result = await get_db().execute("DELETE FROM insight_cache WHERE expires_at <= now()")
+        logger.debug(f"Purged expired insight cache entries: {result}")
+    except Exception as e:
+        logger.warning(f"Failed to purge expired insight cache entries: {e}")
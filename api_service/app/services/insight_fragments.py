@@ -0,0 +1,87 @@
+# api_service/app/services/insight_fragments.py
+
+import hashlib
+import json
+from typing import Any, Dict, List, Optional
+from loguru import logger
+from app.data.database.core_db import get_db
+
+# Per-file analysis fragments in the `insight_file_fragments` table
+# (scripts/insight_file_fragments_v1.sql), keyed by file path and patch hash.
+# They tell incremental re-analysis which files already have an analysis for their
+# current patch. Failures are logged and treated as "no fragments", which only costs
+# a full re-analysis.
+
+
+def patch_hash(file_data: Dict[str, Any]) -> str:
+    return hashlib.sha256((file_data.get('patch') or '').encode('utf-8')).hexdigest()
+
+
+async def load(repo_id: Any, files_changed: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Returns {filename: fragment} for the files whose current patch already has a fragment."""
+    wanted = {f.get('filename', 'unknown'): patch_hash(f) for f in files_changed}
+    if not wanted:
+        return {}
+
+    query = """
+        SELECT f.filename, f.patch_hash, f.risk_level, f.note, f.commit_sha
+        FROM insight_file_fragments AS f
+        JOIN unnest(CAST(:filenames AS TEXT[]), CAST(:hashes AS TEXT[])) AS w(filename, patch_hash)
+          ON f.filename = w.filename AND f.patch_hash = w.patch_hash
+        WHERE f.repo_id = :repo_id
+    """
+    values = {"repo_id": repo_id, "filenames": list(wanted), "hashes": list(wanted.values())}
+    try:
+        rows = await get_db().fetch_all(query, values)
+    except Exception as e:
+        logger.warning(f"Insight fragment lookup failed, re-analysing all files: {e}")
+        return {}
+    return {row["filename"]: dict(row) for row in rows}
+
+
+async def store(
+    repo_id: Any,
+    commit_sha: Optional[str],
+    files_changed: List[Dict[str, Any]],
+    model: Optional[str],
+    analyses: Optional[Dict[str, Dict[str, Any]]] = None,
+):
+    """
+    Records the analysed patch of every file in `files_changed`. `analyses` holds
+    per-file results ({filename: {risk_level, note}}) when the model returned them;
+    files without one are stored with no risk level, meaning the PR as a whole was rated.
+    """
+    if not files_changed:
+        return
+
+    analyses = analyses or {}
+    fragments = {}
+    for file_data in files_changed:
+        filename = file_data.get('filename', 'unknown')
+        analysis = analyses.get(filename) or {}
+        risk_level = str(analysis.get('risk_level') or '').lower()
+        fragments[filename] = {
+            "filename": filename,
+            "patch_hash": patch_hash(file_data),
+            "risk_level": risk_level if risk_level in ('low', 'medium', 'high') else None,
+            "note": (str(analysis['note'])[:300] if analysis.get('note') else None),
+        }
+
+    # One statement for all files; an existing per-file rating is kept over a PR-level one
+    query = """
+        INSERT INTO insight_file_fragments (repo_id, filename, patch_hash, risk_level, note, commit_sha, model)
+        SELECT :repo_id, f.filename, f.patch_hash, f.risk_level, f.note, :commit_sha, :model
+        FROM jsonb_to_recordset(CAST(:fragments AS JSONB))
+            AS f(filename TEXT, patch_hash TEXT, risk_level TEXT, note TEXT)
+        ON CONFLICT (repo_id, filename, patch_hash) DO UPDATE SET
+            risk_level = COALESCE(EXCLUDED.risk_level, insight_file_fragments.risk_level),
+            note = COALESCE(EXCLUDED.note, insight_file_fragments.note),
+            commit_sha = EXCLUDED.commit_sha,
+            model = EXCLUDED.model,
+            created_at = now()
+    """
+    values = {"repo_id": repo_id, "commit_sha": commit_sha, "model": model, "fragments": json.dumps(list(fragments.values()))}
+    try:
+        await get_db().execute(query, values)
+    except Exception as e:
+        logger.warning(f"Failed to store insight fragments for {len(fragments)} files: {e}")
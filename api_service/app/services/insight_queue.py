@@ -0,0 +1,215 @@
+# api_service/app/services/insight_queue.py
+
+import asyncio
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+import asyncpg
+from loguru import logger
+from app.data.configs.app_settings import settings
+from app.data.database.core_db import get_db
+from app.data.database.db_helpers import DatabaseError
+
+# Durable queue of pending insight generations, stored in the `insight_jobs` table.
+# Only the PR key is stored; the PR record is reloaded when the job runs, so memory
+# stays flat no matter how long the AI provider is unavailable.
+# A job enqueued again while a worker holds it (e.g. a new commit arrived) keeps its
+# lease and is flagged `requeued`; the holder then releases it instead of deleting it,
+# so the newer state is analysed by exactly one worker afterwards.
+
+# Set when this process enqueues a job so the scheduler re-evaluates its next wakeup
+_wakeup_event: Optional[asyncio.Event] = None
+
+
+def _get_wakeup_event() -> asyncio.Event:
+    global _wakeup_event
+    if _wakeup_event is None:
+        _wakeup_event = asyncio.Event()
+    return _wakeup_event
+
+
+def retry_delay(attempts: int) -> int:
+    """Exponential backoff: base delay doubled per failed attempt, capped at the max delay."""
+    delay = settings.INSIGHT_RETRY_BASE_DELAY * (2 ** max(attempts - 1, 0))
+    return min(delay, settings.INSIGHT_RETRY_MAX_DELAY)
+
+
+async def enqueue(repo_id: Any, pr_number: int, attempts: int = 0, delay: int = 0, error: Optional[str] = None):
+    """
+    Schedules insight generation for a PR `delay` seconds from now.
+    If a job already exists for the PR, the earlier due time and the higher attempt count win,
+    except that a job under a live claim keeps its lease and is marked requeued.
+    """
+    db = get_db()
+    query = """
+        INSERT INTO insight_jobs (repo_id, pr_number, attempts, next_attempt_at, last_error)
+        VALUES (:repo_id, :pr_number, :attempts, now() + make_interval(secs => :delay), :error)
+        ON CONFLICT (repo_id, pr_number) DO UPDATE SET
+            attempts = GREATEST(insight_jobs.attempts, EXCLUDED.attempts),
+            next_attempt_at = CASE
+                WHEN insight_jobs.claimed_by IS NOT NULL AND insight_jobs.next_attempt_at > now()
+                THEN insight_jobs.next_attempt_at
+                ELSE LEAST(insight_jobs.next_attempt_at, EXCLUDED.next_attempt_at)
+            END,
+            requeued = insight_jobs.requeued
+                OR (insight_jobs.claimed_by IS NOT NULL AND insight_jobs.next_attempt_at > now()),
+            last_error = COALESCE(EXCLUDED.last_error, insight_jobs.last_error),
+            updated_at = now()
+    """
+    values = {"repo_id": repo_id, "pr_number": pr_number, "attempts": attempts, "delay": delay, "error": error}
+    logger.debug(f"Enqueuing insight job for PR #{pr_number} in {repo_id} (attempts={attempts}, delay={delay}s)")
+
+    try:
+        await db.execute(query, values)
+    except asyncpg.PostgresError as e:
+        logger.error(f"Failed to enqueue insight job for PR #{pr_number}: {e}")
+        raise DatabaseError(f"Failed to enqueue insight job: {e}") from e
+
+    _get_wakeup_event().set()
+
+
+async def claim_due(worker_id: str, limit: int = 10) -> List[Dict[str, Any]]:
+    """
+    Claims jobs whose next_attempt_at has passed. The claim pushes next_attempt_at
+    forward by the claim lease, so jobs held by a crashed worker become due again.
+    """
+    db = get_db()
+    query = """
+        WITH due AS (
+            SELECT id FROM insight_jobs
+            WHERE next_attempt_at <= now()
+            ORDER BY next_attempt_at ASC
+            LIMIT :limit
+            FOR UPDATE SKIP LOCKED
+        )
+        UPDATE insight_jobs AS j
+        SET claimed_by = :worker_id,
+            attempts = j.attempts + 1,
+            requeued = FALSE,
+            next_attempt_at = now() + make_interval(secs => :lease_seconds),
+            updated_at = now()
+        FROM due WHERE j.id = due.id
+        RETURNING j.*
+    """
+    values = {"limit": limit, "worker_id": worker_id, "lease_seconds": settings.CLAIM_LEASE_SECONDS}
+
+    try:
+        rows = await db.fetch_all(query, values)
+        return [dict(row) for row in rows]
+    except asyncpg.PostgresError as e:
+        logger.error(f"Failed to claim due insight jobs: {e}")
+        raise DatabaseError(f"Failed to claim insight jobs: {e}") from e
+
+
+async def complete(job: Dict[str, Any]):
+    """
+    Removes a finished (or abandoned) job from the queue. If the job was enqueued again
+    while it ran, it is released instead: due now, with a fresh attempt count.
+    Jobs whose claim was lost to another worker are left alone.
+    """
+    db = get_db()
+    values = {"id": job["id"], "worker_id": job["claimed_by"]}
+    try:
+        deleted = await db.fetch_one(
+            "DELETE FROM insight_jobs WHERE id = :id AND claimed_by = :worker_id AND NOT requeued RETURNING id",
+            values
+        )
+        if deleted:
+            return
+        released = await db.fetch_one(
+            """
+            UPDATE insight_jobs
+            SET claimed_by = NULL, requeued = FALSE, attempts = 0, next_attempt_at = now(), updated_at = now()
+            WHERE id = :id AND claimed_by = :worker_id AND requeued
+            RETURNING id
+            """,
+            values
+        )
+        if released:
+            logger.info(f"Insight job for PR #{job['pr_number']} was enqueued again while running, released it")
+            _get_wakeup_event().set()
+    except asyncpg.PostgresError as e:
+        logger.error(f"Failed to complete insight job {job['id']}: {e}")
+        raise DatabaseError(f"Failed to complete insight job: {e}") from e
+
+
+async def reschedule(job: Dict[str, Any], error: Optional[str] = None, delay: Optional[int] = None):
+    """
+    Releases a failed job and schedules its next attempt using the backoff policy.
+    A job enqueued again while it ran is due at once, with a fresh attempt count.
+    """
+    db = get_db()
+    delay = retry_delay(job["attempts"]) if delay is None else delay
+    query = """
+        UPDATE insight_jobs
+        SET claimed_by = NULL,
+            attempts = CASE WHEN requeued THEN 0 ELSE attempts END,
+            next_attempt_at = CASE WHEN requeued THEN now() ELSE now() + make_interval(secs => :delay) END,
+            requeued = FALSE,
+            last_error = :error,
+            updated_at = now()
+        WHERE id = :id AND claimed_by = :worker_id
+    """
+    try:
+        await db.execute(query, {"id": job["id"], "worker_id": job["claimed_by"], "delay": delay, "error": error})
+        logger.info(f"Rescheduled insight job for PR #{job['pr_number']} in {delay}s (attempt {job['attempts']})")
+    except asyncpg.PostgresError as e:
+        logger.error(f"Failed to reschedule insight job {job['id']}: {e}")
+        raise DatabaseError(f"Failed to reschedule insight job: {e}") from e
+
+
+async def defer(job: Dict[str, Any], delay: int, error: Optional[str] = None):
+    """Releases a job that could not run (e.g. the AI circuit is open) without counting the attempt."""
+    db = get_db()
+    query = """
+        UPDATE insight_jobs
+        SET claimed_by = NULL,
+            attempts = GREATEST(attempts - 1, 0),
+            requeued = FALSE,
+            next_attempt_at = now() + make_interval(secs => :delay),
+            last_error = :error,
+            updated_at = now()
+        WHERE id = :id AND claimed_by = :worker_id
+    """
+    try:
+        await db.execute(query, {"id": job["id"], "worker_id": job["claimed_by"], "delay": delay, "error": error})
+        logger.debug(f"Deferred insight job for PR #{job['pr_number']} by {delay}s")
+    except asyncpg.PostgresError as e:
+        logger.error(f"Failed to defer insight job {job['id']}: {e}")
+        raise DatabaseError(f"Failed to defer insight job: {e}") from e
+
+
+async def seconds_until_next_due() -> Optional[float]:
+    """Seconds until the earliest job is due (0 if overdue), or None if the queue is empty."""
+    db = get_db()
+    try:
+        row = await db.fetch_one("SELECT min(next_attempt_at) AS next_due FROM insight_jobs")
+    except asyncpg.PostgresError as e:
+        logger.error(f"Failed to read next insight job due time: {e}")
+        raise DatabaseError(f"Failed to read insight job schedule: {e}") from e
+
+    if not row or row["next_due"] is None:
+        return None
+    return max(0.0, (row["next_due"] - datetime.now(timezone.utc)).total_seconds())
+
+
+async def wait_for_next_due():
+    """
+    Sleeps until the next job is due, or until a job is enqueued by this process.
+    The wait is capped at SAFETY_POLL_INTERVAL so jobs enqueued by other workers
+    or replicas are picked up even when the queue was empty.
+    """
+    timeout = settings.SAFETY_POLL_INTERVAL
+    try:
+        next_due = await seconds_until_next_due()
+        if next_due is not None:
+            timeout = min(timeout, next_due)
+    except DatabaseError:
+        pass
+
+    event = _get_wakeup_event()
+    try:
+        await asyncio.wait_for(event.wait(), timeout=timeout)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        event.clear()
@@ -0,0 +1,123 @@
+# api_service/app/services/insight_worker.py
+
+import asyncio
+from typing import Optional
+from loguru import logger
+from app.data.configs.app_settings import settings
+from app.services import ai_service, insight_queue, metrics
+from app.services.event_processor import process_insight_job
+
+_running = True
+
+# Set by a worker whenever it takes a job off the local queue, so the dispatcher can claim more
+_slot_freed: Optional[asyncio.Event] = None
+
+# Counters exposed via get_insight_worker_state()
+_worker_state: dict = {
+    "workers": 0,
+    "busy": 0,
+    "queued": 0,
+    "completed_total": 0,
+    "failed_total": 0,
+}
+
+
+def stop_insight_workers():
+    global _running
+    _running = False
+    logger.info("Stop signal received for insight workers.")
+
+
+def get_insight_worker_state() -> dict:
+    """Returns a snapshot of the insight worker pool."""
+    return {**_worker_state, "ai_circuit": ai_service.circuit_breaker.snapshot()}
+
+
+async def _insight_worker(worker_number: int, jobs: asyncio.Queue):
+    """Takes claimed jobs off the local queue and generates their insights one at a time."""
+    while True:
+        job = await jobs.get()
+        _slot_freed.set()
+        _worker_state["queued"] = jobs.qsize()
+        _worker_state["busy"] += 1
+        try:
+            if await process_insight_job(job):
+                _worker_state["completed_total"] += 1
+                metrics.INSIGHT_JOBS.inc(outcome="completed")
+            else:
+                _worker_state["failed_total"] += 1
+                metrics.INSIGHT_JOBS.inc(outcome="failed")
+        except Exception as e:
+            _worker_state["failed_total"] += 1
+            metrics.INSIGHT_JOBS.inc(outcome="failed")
+            logger.error(f"Insight worker {worker_number} failed on PR #{job['pr_number']}: {e}")
+        finally:
+            _worker_state["busy"] -= 1
+            jobs.task_done()
+
+
+async def _dispatch_jobs(worker_id: str, jobs: asyncio.Queue):
+    """
+    Claims due jobs from the durable queue only as fast as the local queue has room,
+    so jobs are never leased long before a worker can start them.
+    """
+    while _running:
+        try:
+            paused = ai_service.circuit_retry_after()
+            if paused > 0:
+                # Leave jobs in the durable queue instead of leasing them to be rejected
+                await asyncio.sleep(paused)
+                continue
+
+            free = jobs.maxsize - jobs.qsize()
+            if free > 0:
+                claimed = await insight_queue.claim_due(worker_id, limit=free)
+                for job in claimed:
+                    jobs.put_nowait(job)
+                _worker_state["queued"] = jobs.qsize()
+                if claimed:
+                    logger.info(f"Dispatched {len(claimed)} insight jobs to the worker pool")
+                if len(claimed) < free:
+                    # Nothing else is due, sleep until the next job is due or enqueued
+                    await insight_queue.wait_for_next_due()
+                    continue
+
+            # Local queue is full, wait for a worker to take a job
+            _slot_freed.clear()
+            await _slot_freed.wait()
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Insight dispatcher encountered an error: {e}. Retrying in 5s.")
+            metrics.ERRORS.inc(table="insight_jobs", stage="dispatch")
+            await asyncio.sleep(5)
+
+
+async def run_insight_workers(worker_id: str):
+    """
+    Runs the insight generation pipeline: a dispatcher feeding INSIGHT_WORKERS workers
+    through a bounded local queue (INSIGHT_QUEUE_SIZE). It runs separately from the
+    event poller, so PR state broadcasts never wait on the AI provider.
+    """
+    global _slot_freed
+    _slot_freed = asyncio.Event()
+    jobs = asyncio.Queue(maxsize=max(settings.INSIGHT_QUEUE_SIZE, 1))
+    workers = [
+        asyncio.create_task(_insight_worker(number, jobs))
+        for number in range(settings.INSIGHT_WORKERS)
+    ]
+    _worker_state["workers"] = len(workers)
+    logger.info(f"Starting insight worker pool with {len(workers)} workers (queue size {jobs.maxsize})...")
+
+    try:
+        await _dispatch_jobs(worker_id, jobs)
+    except asyncio.CancelledError:
+        logger.warning("Insight worker pool was cancelled.")
+    finally:
+        # Jobs still queued locally keep their lease and are re-claimed once it expires
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    logger.info("Insight worker pool has shut down.")
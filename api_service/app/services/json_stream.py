@@ -0,0 +1,53 @@
+# api_service/app/services/json_stream.py
+
+from typing import Optional
+
+# Incremental extraction of the first JSON object from streamed model output.
+# Text before the object (markdown fences, preambles) is skipped, and braces inside
+# strings are ignored, so the object is recognised as soon as its closing brace arrives.
+
+
+class JsonObjectScanner:
+    """Feed text chunks in order; `feed` returns the object text once it is complete."""
+
+    def __init__(self):
+        self._buffer = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._started = False
+        self.result: Optional[str] = None
+
+    def feed(self, chunk: str) -> Optional[str]:
+        if self.result is not None or not chunk:
+            return self.result
+
+        start = 0
+        if not self._started:
+            start = chunk.find('{')
+            if start == -1:
+                return None
+            self._started = True
+
+        for index in range(start, len(chunk)):
+            char = chunk[index]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == '{':
+                self._depth += 1
+            elif char == '}':
+                self._depth -= 1
+                if self._depth == 0:
+                    self._buffer.append(chunk[start:index + 1])
+                    self.result = "".join(self._buffer)
+                    return self.result
+
+        self._buffer.append(chunk[start:])
+        return None
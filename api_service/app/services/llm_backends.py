@@ -0,0 +1,114 @@
+# api_service/app/services/llm_backends.py
+
+import json
+from typing import AsyncIterator, Optional
+import httpx
+from loguru import logger
+from google import genai
+from google.genai import errors, types
+from app.data.configs.app_settings import settings
+
+# LLM backends behind ai_service. Every backend returns google.genai response types and
+# raises google.genai errors, so parsing, retries and the circuit breaker behave the
+# same whichever backend is configured (LLM_BACKEND).
+
+
+class GeminiBackend:
+    """The Gemini API through the async google-genai client."""
+    name = "gemini"
+
+    def __init__(self, api_key: str):
+        self.client = genai.Client(api_key=api_key)
+
+    async def generate_content(self, model: str, prompt: str, config: types.GenerateContentConfig) -> types.GenerateContentResponse:
+        return await self.client.aio.models.generate_content(
+            model=model,
+            contents=[{"role": "user", "parts": [{"text": prompt}]}],
+            config=config,
+        )
+
+    async def generate_content_stream(self, model: str, prompt: str, config: types.GenerateContentConfig) -> AsyncIterator[types.GenerateContentResponse]:
+        return await self.client.aio.models.generate_content_stream(
+            model=model,
+            contents=[{"role": "user", "parts": [{"text": prompt}]}],
+            config=config,
+        )
+
+
+class FakeHTTPBackend:
+    """
+    Talks to the local stand-in server (scripts/fake_llm_server.py) for offline
+    benchmarking. Requests go to POST {base_url}/v1/generate; streamed responses are
+    newline-delimited JSON chunks of the form {"text": ..., "finish_reason": ...}.
+    """
+    name = "fake"
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip("/")
+        self.client = httpx.AsyncClient(base_url=self.base_url, timeout=None)
+
+    def _payload(self, model: str, prompt: str, config: types.GenerateContentConfig, stream: bool) -> dict:
+        return {
+            "model": model,
+            "prompt": prompt,
+            "max_output_tokens": config.max_output_tokens,
+            "temperature": config.temperature,
+            "response_mime_type": config.response_mime_type,
+            "stream": stream,
+        }
+
+    @staticmethod
+    def _to_response(chunk: dict) -> types.GenerateContentResponse:
+        return types.GenerateContentResponse(candidates=[types.Candidate(
+            content=types.Content(role="model", parts=[types.Part(text=chunk.get("text") or "")]),
+            finish_reason=chunk.get("finish_reason"),
+        )])
+
+    @staticmethod
+    def _raise_for_status(status_code: int, body: bytes):
+        if status_code < 400:
+            return
+        try:
+            response_json = json.loads(body)
+        except ValueError:
+            response_json = {"error": {"code": status_code, "message": body.decode(errors="replace")}}
+        if status_code < 500:
+            raise errors.ClientError(status_code, response_json)
+        raise errors.ServerError(status_code, response_json)
+
+    async def generate_content(self, model: str, prompt: str, config: types.GenerateContentConfig) -> types.GenerateContentResponse:
+        response = await self.client.post("/v1/generate", json=self._payload(model, prompt, config, stream=False))
+        self._raise_for_status(response.status_code, response.content)
+        return self._to_response(response.json())
+
+    async def generate_content_stream(self, model: str, prompt: str, config: types.GenerateContentConfig) -> AsyncIterator[types.GenerateContentResponse]:
+        request = self.client.build_request("POST", "/v1/generate", json=self._payload(model, prompt, config, stream=True))
+        response = await self.client.send(request, stream=True)
+        if response.status_code >= 400:
+            body = await response.aread()
+            await response.aclose()
+            self._raise_for_status(response.status_code, body)
+        return self._iter_chunks(response)
+
+    async def _iter_chunks(self, response: httpx.Response) -> AsyncIterator[types.GenerateContentResponse]:
+        try:
+            async for line in response.aiter_lines():
+                if line.strip():
+                    yield self._to_response(json.loads(line))
+        finally:
+            await response.aclose()
+
+
+def create_backend() -> Optional[object]:
+    """Builds the backend selected by LLM_BACKEND, or None if it is not configured."""
+    backend = settings.LLM_BACKEND.lower()
+    if backend == "fake":
+        logger.warning(f"Using the fake LLM backend at {settings.FAKE_LLM_URL}. Insights are simulated.")
+        return FakeHTTPBackend(settings.FAKE_LLM_URL)
+    if backend != "gemini":
+        logger.error(f"Unknown LLM_BACKEND '{settings.LLM_BACKEND}'. AI features will be disabled.")
+        return None
+    if not settings.GEMINI_API_KEY:
+        logger.warning("GEMINI_API_KEY not found. AI features will be disabled.")
+        return None
+    return GeminiBackend(settings.GEMINI_API_KEY)
@@ -0,0 +1,239 @@
+# api_service/app/services/metrics.py
+
+import math
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+# Minimal in-process metrics registry rendered in the Prometheus text exposition
+# format by GET /metrics. Values are per process; a scraper aggregates replicas.
+
+_REGISTRY: List["_Metric"] = []
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+LAG_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+AI_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        _REGISTRY.append(self)
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: Tuple[str, ...], extra: Dict[str, str] = None) -> str:
+        pairs = list(zip(self.labelnames, key)) + list((extra or {}).items())
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+            *self._samples(),
+        ]
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, e.g. processed events or errors."""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{self._labels(key)} {_format_value(value)}" for key, value in self._values.items()]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down, e.g. the current backlog."""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{self._labels(key)} {_format_value(value)}" for key, value in self._values.items()]
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets, plus their sum and count."""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # key -> [per-bucket counts, sum, count]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        entry = self._values.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                entry[0][index] += 1
+                break
+        entry[1] += value
+        entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observes the wall-clock duration of the enclosed block (awaits included)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, (counts, total, count) in self._values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{self._labels(key, {'le': _format_value(bound)})} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{self._labels(key)} {count}")
+        return lines
+
+
+def render() -> str:
+    """Renders every registered metric in the Prometheus text format."""
+    lines = []
+    for metric in _REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# --- Event poller ---
+EVENT_LAG_SECONDS = Histogram(
+    "flowlens_event_lag_seconds",
+    "Time from a row being written (updated_at/created_at) to it being processed.",
+    ("table",), buckets=LAG_BUCKETS
+)
+BACKLOG = Gauge(
+    "flowlens_backlog",
+    "Unprocessed rows left after the last poll cycle.",
+    ("table",)
+)
+POLL_CYCLE_SECONDS = Histogram(
+    "flowlens_poll_cycle_seconds",
+    "Duration of a poll cycle that claimed at least one row.",
+    ("table",)
+)
+STAGE_SECONDS = Histogram(
+    "flowlens_stage_seconds",
+    "Duration of each poll cycle stage: fetch (claim), process, ack.",
+    ("table", "stage")
+)
+EVENTS_PROCESSED = Counter(
+    "flowlens_events_processed_total",
+    "Rows processed and acknowledged.",
+    ("table",)
+)
+ERRORS = Counter(
+    "flowlens_errors_total",
+    "Errors by table and stage.",
+    ("table", "stage")
+)
+
+# --- Insight pipeline ---
+AI_REQUEST_SECONDS = Histogram(
+    "flowlens_ai_request_seconds",
+    "Duration of AI insight requests by outcome (success, failure, error).",
+    ("outcome",), buckets=AI_BUCKETS
+)
+AI_BATCH_ITEMS = Histogram(
+    "flowlens_ai_batch_items",
+    "PRs sent together in one batched AI request.",
+    buckets=(2, 3, 4, 6, 8, 12, 16, 24)
+)
+AI_RESPONSE_PARSE = Counter(
+    "flowlens_ai_response_parse_total",
+    "AI responses by how they were parsed: structured (validated JSON), fallback (regex extraction) or failed.",
+    ("path",)
+)
+AI_STREAM_RESULTS = Counter(
+    "flowlens_ai_stream_results_total",
+    "Streamed AI responses by how they ended (complete, truncated, no_json, invalid_json).",
+    ("result",)
+)
+AI_RATE_LIMIT_WAIT_SECONDS = Histogram(
+    "flowlens_ai_rate_limit_wait_seconds",
+    "Time AI requests waited for the requests/tokens-per-minute limiter.",
+    buckets=(0.1, 0.5, 1, 2, 5, 10, 30, 60)
+)
+AI_CIRCUIT_STATE = Gauge(
+    "flowlens_ai_circuit_state",
+    "AI circuit breaker state: 0 closed, 1 half-open, 2 open."
+)
+AI_CIRCUIT_TRANSITIONS = Counter(
+    "flowlens_ai_circuit_transitions_total",
+    "AI circuit breaker transitions by new state.",
+    ("state",)
+)
+AI_REJECTED = Counter(
+    "flowlens_ai_rejected_total",
+    "AI requests rejected without calling the provider because the circuit was open."
+)
+INSIGHT_INCREMENTAL_FILES = Counter(
+    "flowlens_insight_incremental_files_total",
+    "Files in incremental re-analyses, by whether their earlier analysis was reused or they were sent again.",
+    ("result",)
+)
+INSIGHT_JOBS = Counter(
+    "flowlens_insight_jobs_total",
+    "Insight jobs handled by the worker pool by outcome (completed, failed).",
+    ("outcome",)
+)
+INSIGHT_CACHE_REQUESTS = Counter(
+    "flowlens_insight_cache_requests_total",
+    "Insight cache lookups by result (memory_hit, db_hit, miss).",
+    ("result",)
+)
+
+# --- WebSocket ---
+BROADCAST_SECONDS = Histogram(
+    "flowlens_broadcast_seconds",
+    "Duration of a WebSocket broadcast to all connected clients."
+)
+BROADCASTS = Counter(
+    "flowlens_broadcasts_total",
+    "WebSocket messages broadcast."
+)
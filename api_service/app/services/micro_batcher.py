@@ -0,0 +1,85 @@
+# api_service/app/services/micro_batcher.py
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from loguru import logger
+
+# Handler receives [(key, item), ...] and returns {key: result}; missing keys resolve to None
+BatchHandler = Callable[[List[Tuple[Any, Any]]], Awaitable[Dict[Any, Any]]]
+
+
+class MicroBatcher:
+    """
+    Collects concurrent submissions for a short window and hands them to `handler`
+    as one batch. A batch is sent when the window elapses, when it reaches
+    `max_items`, or when its estimated size reaches `max_tokens`. While no batch is
+    in flight, a submission is sent at once instead of waiting the window, so
+    batching (and its added latency) only applies during bursts. Keys are unique
+    within a batch; submitting a key that is already pending sends the pending batch first.
+    Each submitter receives its own result, or None if the batch failed or skipped it;
+    if the batch is cancelled, its submitters are cancelled too.
+    """
+
+    def __init__(self, handler: BatchHandler, window_seconds: float, max_items: int, max_tokens: int):
+        self.handler = handler
+        self.window_seconds = window_seconds
+        self.max_items = max(max_items, 1)
+        self.max_tokens = max_tokens
+        self._pending: List[Tuple[Any, Any, asyncio.Future]] = []
+        self._pending_tokens = 0
+        self._timer: Optional[asyncio.Task] = None
+        # The event loop only keeps weak references to tasks
+        self._in_flight: Set[asyncio.Task] = set()
+
+    async def submit(self, key: Any, item: Any, tokens: int = 0) -> Any:
+        if any(pending_key == key for pending_key, _, _ in self._pending):
+            self._send_pending()
+
+        if self._pending and self._pending_tokens + tokens > self.max_tokens:
+            self._send_pending()
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((key, item, future))
+        self._pending_tokens += tokens
+
+        if not self._in_flight and len(self._pending) == 1:
+            self._send_pending()
+        elif len(self._pending) >= self.max_items or self._pending_tokens >= self.max_tokens:
+            self._send_pending()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._send_after_window())
+
+        return await future
+
+    async def _send_after_window(self):
+        await asyncio.sleep(self.window_seconds)
+        self._timer = None
+        self._send_pending()
+
+    def _send_pending(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending, self._pending_tokens = self._pending, [], 0
+        task = asyncio.create_task(self._run(batch))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    async def _run(self, batch: List[Tuple[Any, Any, asyncio.Future]]):
+        results: Optional[Dict[Any, Any]] = None
+        try:
+            results = await self.handler([(key, item) for key, item, _ in batch])
+        except Exception as e:
+            logger.error(f"Batch of {len(batch)} items failed: {e}")
+            results = {}
+        finally:
+            # Also runs when the batch is cancelled, so no submitter waits forever
+            for key, _, future in batch:
+                if future.done():
+                    continue
+                if results is None:
+                    future.cancel()
+                else:
+                    future.set_result(results.get(key))
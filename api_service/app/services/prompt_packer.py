@@ -0,0 +1,145 @@
+# api_service/app/services/prompt_packer.py
+
+from typing import Any, Dict, List
+from loguru import logger
+from app.data.configs.app_settings import settings
+from app.services.file_categories import LOCKFILE, categorize, risk_score
+
+# Packs a PR's changed files into the insight prompt in a single pass:
+# files are ranked by review risk and their patches fill a per-model token budget,
+# so the first request already fits and no size-driven retries are needed.
+
+# Rough token estimate for code and English text
+CHARS_PER_TOKEN = 4
+
+# Prompt tokens spent per request, by model name prefix (longest prefix wins)
+MODEL_PROMPT_BUDGETS = {
+    "gemini-2.5-pro": 32000,
+    "gemini-2.5-flash-lite": 8000,
+    "gemini-2.5-flash": 16000,
+    "gemini-2.0-flash": 16000,
+}
+DEFAULT_PROMPT_BUDGET = 8000
+
+_TRUNCATED = "\n  ... [truncated]"
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def prompt_token_budget(model: str) -> int:
+    """Prompt token budget for `model`; AI_PROMPT_TOKEN_BUDGET overrides the per-model default."""
+    if settings.AI_PROMPT_TOKEN_BUDGET > 0:
+        return settings.AI_PROMPT_TOKEN_BUDGET
+    for prefix in sorted(MODEL_PROMPT_BUDGETS, key=len, reverse=True):
+        if (model or "").startswith(prefix):
+            return MODEL_PROMPT_BUDGETS[prefix]
+    return DEFAULT_PROMPT_BUDGET
+
+
+def rank_files(files_changed: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Highest review risk first (see file_categories); larger changes first within a category."""
+    return sorted(
+        files_changed,
+        key=lambda f: (-risk_score(f.get('filename', '')), -((f.get('additions') or 0) + (f.get('deletions') or 0)))
+    )
+
+
+def _file_header(file_data: Dict[str, Any]) -> str:
+    filename = file_data.get('filename', 'unknown')
+    return (
+        f"- {filename} ({file_data.get('status', 'unknown')}) [{categorize(filename)}]: "
+        f"+{file_data.get('additions') or 0}/-{file_data.get('deletions') or 0} ({file_data.get('changes') or 0} changes)"
+    )
+
+
+def _fit_patch(patch: str, max_tokens: int) -> str:
+    """Indents the patch under its file and cuts it at a line boundary to fit `max_tokens`."""
+    text = "\n  Patch:\n" + "\n".join(f"  {line}" for line in patch.splitlines())
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max(max_chars - len(_TRUNCATED), 0)]
+    if "\n" in cut:
+        cut = cut.rsplit("\n", 1)[0]
+    return cut + _TRUNCATED
+
+
+def estimate_file_tokens(file_data: Dict[str, Any]) -> int:
+    """Tokens a file needs in the prompt with its patch capped at AI_MAX_PATCH_TOKENS."""
+    tokens = estimate_tokens(_file_header(file_data)) + 1
+    patch = file_data.get('patch') or ''
+    if patch and categorize(file_data.get('filename', '')) != LOCKFILE:
+        tokens += min(estimate_tokens(patch) + len(patch.splitlines()) + 3, settings.AI_MAX_PATCH_TOKENS)
+    return tokens
+
+
+def needs_chunking(files_changed: List[Dict[str, Any]], token_budget: int) -> bool:
+    """True when the PR cannot be shown in one prompt without dropping files or patches."""
+    return len(files_changed) > 1 and sum(estimate_file_tokens(f) for f in files_changed) > token_budget
+
+
+def split_into_chunks(files_changed: List[Dict[str, Any]], token_budget: int, max_chunks: int) -> List[List[Dict[str, Any]]]:
+    """
+    Splits ranked files into groups that each fit `token_budget`, riskiest files first.
+    Files beyond `max_chunks` groups go to the last group, where the packer trims the
+    lowest-risk tail.
+    """
+    chunks = [[]]
+    used = 0
+    for file_data in rank_files(files_changed):
+        cost = estimate_file_tokens(file_data)
+        if chunks[-1] and used + cost > token_budget and len(chunks) < max_chunks:
+            chunks.append([])
+            used = 0
+        chunks[-1].append(file_data)
+        used += cost
+    return chunks
+
+
+def pack_files_changed(files_changed: List[Dict[str, Any]], token_budget: int) -> str:
+    """
+    Formats changed files for the prompt within `token_budget` tokens.
+    1. One summary line per file, in risk order, as long as they fit.
+    2. Patches in the same order, each capped at AI_MAX_PATCH_TOKENS, until the
+       budget is spent. Lockfile patches are never included.
+    """
+    if not files_changed:
+        return "No files changed"
+
+    ranked = rank_files(files_changed)
+    headers = []
+    used = 0
+    for file_data in ranked:
+        header = _file_header(file_data)
+        cost = estimate_tokens(header) + 1
+        if used + cost > token_budget:
+            break
+        headers.append(header)
+        used += cost
+
+    omitted = len(ranked) - len(headers)
+    omitted_note = f"... and {omitted} lower-risk files not shown" if omitted else ""
+    used += estimate_tokens(omitted_note)
+
+    patches = [""] * len(headers)
+    for index, file_data in enumerate(ranked[:len(headers)]):
+        patch = file_data.get('patch') or ''
+        remaining = token_budget - used
+        if not patch or categorize(file_data.get('filename', '')) == LOCKFILE:
+            continue
+        if remaining < 50:
+            break
+        patches[index] = _fit_patch(patch, min(remaining, settings.AI_MAX_PATCH_TOKENS))
+        used += estimate_tokens(patches[index])
+
+    lines = [header + patch for header, patch in zip(headers, patches)]
+    if omitted_note:
+        lines.append(omitted_note)
+    result = "\n".join(lines)
+    logger.debug(
+        f"Packed {len(headers)}/{len(ranked)} files ({sum(1 for p in patches if p)} with patches) "
+        f"into ~{estimate_tokens(result)} of {token_budget} tokens"
+    )
+    return result
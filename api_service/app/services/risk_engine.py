@@ -0,0 +1,165 @@
+# api_service/app/services/risk_engine.py
+
+import re
+from typing import Any, Dict, List
+from app.services.file_categories import (
+    CONFIG, CORE, DOCS, LOCKFILE, MIGRATION, OTHER, SECURITY, TEST, categorize
+)
+
+# Rule-based risk scoring of a PR from its files_changed, in pure Python.
+# It runs in well under a millisecond for typical PRs, so its result can be stored and
+# broadcast as a provisional insight before the AI insight is available.
+
+# Paths that change how code is built, shipped or run (checked before the file categories)
+CI = "ci"
+INFRA = "infra"
+_CI_PATTERN = re.compile(
+    r"(^|/)\.github/workflows/|(^|/)\.gitlab-ci|(^|/)\.circleci/|(^|/)jenkinsfile"
+    r"|(^|/)azure-pipelines|(^|/)bitbucket-pipelines|(^|/)\.buildkite/"
+)
+_INFRA_PATTERN = re.compile(
+    r"\.(tf|tfvars|hcl)$|(^|/)(terraform|k8s|kubernetes|helm|charts|ansible|infra|deploy)/"
+    r"|(^|/)dockerfile[^/]*$|docker-compose"
+)
+
+# Points per changed file by kind
+KIND_POINTS = {
+    MIGRATION: 30,
+    SECURITY: 25,
+    INFRA: 20,
+    CI: 15,
+    CONFIG: 8,
+    CORE: 4,
+    OTHER: 2,
+    TEST: 0,
+    DOCS: 0,
+    LOCKFILE: 1,
+}
+
+LARGE_FILE_CHURN = 300        # Lines changed in one file that make it hard to review
+LARGE_PR_CHURN = 800          # Total lines changed that make the PR hard to review
+MANY_FILES = 25               # Changed files that make the PR hard to review
+HIGH_DELETION_RATIO = 0.7     # Share of deleted lines that suggests removed behavior
+MIN_DELETIONS = 40            # Deleted lines before the deletion ratio counts
+
+# Total score thresholds for each risk level
+HIGH_RISK_SCORE = 45
+MEDIUM_RISK_SCORE = 15
+
+_KIND_LABELS = {
+    MIGRATION: "database migration",
+    SECURITY: "auth/security",
+    INFRA: "infrastructure",
+    CI: "CI pipeline",
+    CONFIG: "configuration",
+}
+
+
+def file_kind(filename: str) -> str:
+    """File category with CI and infrastructure paths split out of config."""
+    path = (filename or "").lower()
+    category = categorize(path)
+    if category in (MIGRATION, SECURITY, LOCKFILE):
+        return category
+    if _CI_PATTERN.search(path):
+        return CI
+    if _INFRA_PATTERN.search(path):
+        return INFRA
+    return category
+
+
+def assess(pr_record: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Scores a PR and returns an insight-shaped dict:
+    {risk_level, summary, recommendation, score, signals}.
+    """
+    files_changed: List[Dict[str, Any]] = pr_record.get('files_changed') or []
+
+    # Per-file columns, evaluated once over the file list
+    kinds = [file_kind(f.get('filename', '')) for f in files_changed]
+    additions = [int(f.get('additions', 0) or 0) for f in files_changed]
+    deletions = [int(f.get('deletions', 0) or 0) for f in files_changed]
+    churn = [a + d for a, d in zip(additions, deletions)]
+    statuses = [f.get('status', '') for f in files_changed]
+
+    score = sum(KIND_POINTS.get(kind, 0) for kind in kinds)
+    signals = []
+
+    for kind, label in _KIND_LABELS.items():
+        touched = kinds.count(kind)
+        if touched:
+            signals.append(f"{touched} {label} file{'s' if touched != 1 else ''}")
+
+    large = sorted(
+        ((c, f.get('filename', 'unknown')) for f, c, k in zip(files_changed, churn, kinds)
+         if c >= LARGE_FILE_CHURN and k not in (LOCKFILE, DOCS, TEST)),
+        reverse=True
+    )
+    large_files = [filename for _, filename in large]
+    if large_files:
+        score += 8 * min(len(large_files), 3)
+        signals.append(f"large changes in {', '.join(large_files[:3])}")
+
+    total_churn = sum(churn) if files_changed else (pr_record.get('additions', 0) or 0) + (pr_record.get('deletions', 0) or 0)
+    file_count = len(files_changed) or (pr_record.get('changed_files', 0) or 0)
+    if total_churn >= LARGE_PR_CHURN:
+        score += 15
+        signals.append(f"{total_churn} lines changed")
+    if file_count >= MANY_FILES:
+        score += 10
+        signals.append(f"{file_count} files changed")
+
+    code_deletions = sum(d for d, k in zip(deletions, kinds) if k not in (TEST, DOCS, LOCKFILE))
+    code_churn = sum(c for c, k in zip(churn, kinds) if k not in (TEST, DOCS, LOCKFILE))
+    if code_deletions >= MIN_DELETIONS and code_deletions / max(code_churn, 1) >= HIGH_DELETION_RATIO:
+        score += 10
+        signals.append(f"mostly deletions ({code_deletions} lines removed)")
+
+    removed = sum(1 for s, k in zip(statuses, kinds) if s == 'removed' and k not in (TEST, DOCS))
+    if removed:
+        score += 3 * min(removed, 5)
+        signals.append(f"{removed} file{'s' if removed != 1 else ''} removed")
+
+    source_churn = sum(c for c, k in zip(churn, kinds) if k in (CORE, SECURITY, MIGRATION))
+    test_churn = sum(c for c, k in zip(churn, kinds) if k == TEST)
+    untested = source_churn >= 50 and test_churn == 0
+    if untested:
+        score += 10
+        signals.append("no test changes")
+    elif source_churn and test_churn >= source_churn / 2:
+        score -= 5
+
+    if score >= HIGH_RISK_SCORE:
+        risk_level = "high"
+    elif score >= MEDIUM_RISK_SCORE:
+        risk_level = "medium"
+    else:
+        risk_level = "low"
+
+    summary = f"Changes {file_count} file(s) with {total_churn} line changes"
+    summary += f": {'; '.join(signals[:3])}." if signals else "."
+    return {
+        "risk_level": risk_level,
+        "summary": summary,
+        "recommendation": _recommendation(kinds, large_files, untested),
+        "score": max(score, 0),
+        "signals": signals,
+    }
+
+
+def _recommendation(kinds: List[str], large_files: List[str], untested: bool) -> str:
+    advice = []
+    if MIGRATION in kinds:
+        advice.append("check the migrations are backward compatible and can be rolled back")
+    if SECURITY in kinds:
+        advice.append("have the auth/security changes reviewed by someone familiar with them")
+    if INFRA in kinds or CI in kinds:
+        advice.append("verify the infrastructure and pipeline changes in a staging run")
+    if large_files:
+        advice.append(f"review {large_files[0]} closely, it has the largest change")
+    if untested:
+        advice.append("ask for tests covering the changed code")
+    if not advice:
+        return "Routine change; a standard review should be sufficient."
+    text = "; ".join(advice)
+    return text[0].upper() + text[1:] + "."
@@ -1,16 +1,23 @@
 # api_service/app/services/websocket_manager.py
 
 import json
-from typing import List
+import asyncio
+from typing import Dict, List, Optional, Tuple
 from uuid import UUID
 from fastapi import WebSocket
 from loguru import logger
+from app.data.configs.app_settings import settings
 from app.data.database import db_helpers
+from app.services import metrics
 
 
 class WebSocketManager:
     def __init__(self):
         self.active_connections: List[WebSocket] = []
+        # Latest pending state per (repo_id, pr_number) and whether a provisional insight
+        # follows it, flushed after EVENT_COALESCE_WINDOW_MS
+        self._pending_updates: Dict[Tuple[str, int], Tuple[str, bool]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
@@ -32,12 +39,14 @@ class WebSocketManager:
         message = json.dumps(serializable_data)
         disconnected = []
         
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message)
-            except Exception as e:
-                logger.warning(f"Failed to send message to client: {e}")
-                disconnected.append(connection)
+        with metrics.BROADCAST_SECONDS.time():
+            for connection in self.active_connections:
+                try:
+                    await connection.send_text(message)
+                except Exception as e:
+                    logger.warning(f"Failed to send message to client: {e}")
+                    disconnected.append(connection)
+        metrics.BROADCASTS.inc()
         
         # Remove disconnected clients
         for connection in disconnected:
@@ -105,4 +114,63 @@ class WebSocketManager:
             logger.error(f"Failed to broadcast PR state update for #{pr_number} in {repo_id}: {e}")
 
 
+    async def broadcast_insight_ready(self, repo_id, pr_number: int, event_state: str, provisional: bool = False):
+        """
+        Notifies clients that an insight for a PR is available.
+        Same shape as a state update plus an "event" marker, so existing clients
+        simply refresh the PR while newer ones can fetch the insight. `provisional`
+        marks the risk engine's insight, which the AI insight later replaces.
+        """
+        try:
+            repo_id_str = str(repo_id) if isinstance(repo_id, UUID) else repo_id
+            await self.broadcast_json({
+                "repo_id": repo_id_str,
+                "pr_number": pr_number,
+                "state": event_state,
+                "event": "insight_ready",
+                "provisional": provisional
+            })
+            logger.success(f"Broadcasted insight ready for PR #{pr_number} in {repo_id_str}")
+        except Exception as e:
+            logger.error(f"Failed to broadcast insight ready for #{pr_number} in {repo_id}: {e}")
+
+    async def queue_pr_state_update(self, repo_id, pr_number: int, event_state: str, provisional_insight: bool = False):
+        """
+        Coalesces PR state updates before broadcasting.
+        All updates for the same PR within EVENT_COALESCE_WINDOW_MS (e.g. a PR event and
+        a pipeline event from the same CI run) collapse into one message with the final state.
+        With `provisional_insight`, a provisional insight_ready follows that message, so
+        clients never get the insight of a PR before the PR itself.
+        """
+        window = settings.EVENT_COALESCE_WINDOW_MS / 1000
+        if window <= 0:
+            await self._broadcast_pending(repo_id, pr_number, event_state, provisional_insight)
+            return
+
+        repo_id_str = str(repo_id) if isinstance(repo_id, UUID) else repo_id
+        key = (repo_id_str, pr_number)
+        if key in self._pending_updates:
+            previous_state, previous_insight = self._pending_updates[key]
+            logger.debug(f"Coalescing state update for PR #{pr_number}: {previous_state} -> {event_state}")
+            provisional_insight = provisional_insight or previous_insight
+        self._pending_updates[key] = (event_state, provisional_insight)
+
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_pending_updates(window))
+
+    async def _flush_pending_updates(self, delay: float):
+        """Broadcasts the final state of every PR queued during the coalescing window."""
+        # Keep flushing while updates keep arriving during broadcasts
+        while self._pending_updates:
+            await asyncio.sleep(delay)
+            pending, self._pending_updates = self._pending_updates, {}
+            for (repo_id, pr_number), (event_state, provisional_insight) in pending.items():
+                await self._broadcast_pending(repo_id, pr_number, event_state, provisional_insight)
+
+    async def _broadcast_pending(self, repo_id, pr_number: int, event_state: str, provisional_insight: bool):
+        await self.broadcast_pr_state_update(repo_id, pr_number, event_state)
+        if provisional_insight:
+            await self.broadcast_insight_ready(repo_id, pr_number, event_state, provisional=True)
+
+
 websocket_manager = WebSocketManager()
\ No newline at end of file
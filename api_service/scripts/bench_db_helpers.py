@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for the per-query overhead of db_helpers.
+
+Compares the previous query path (build the SQL string from dicts on every call, then
+let `databases` convert :name parameters through SQLAlchemy) with the query shape
+cache (SQL built once per shape, values passed positionally to asyncpg).
+
+By default only the client-side work is measured, so no database is needed. With
+--live the same query shapes also run against DATABASE_URL, where the cached path
+additionally reuses server-side prepared statements.
+
+Usage:
+    python scripts/bench_db_helpers.py --iterations 20000
+    DATABASE_URL=postgresql://... python scripts/bench_db_helpers.py --live --live-iterations 2000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+os.environ.setdefault("DATABASE_URL", "postgresql://unused/unused")  # Only used with --live
+
+# Add the parent directory to the path so we can import from app
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+# Shapes the poller and the API issue most often
+SHAPES = [
+    ("select_one", "pull_requests", {"repo_id": "00000000-0000-0000-0000-000000000000", "pr_number": 42}, "*"),
+    ("select", "insights", {"repo_id": "00000000-0000-0000-0000-000000000000", "pr_number": 42}, "*"),
+    ("select", "repositories", {}, "id, name, full_name"),
+]
+
+
+def _legacy_select_sql(table, where, select_fields, order_by=None, desc=False, limit=None):
+    """The SQL construction db_helpers.select used before the shape cache."""
+    from app.data.database.db_helpers import quote_identifier
+    query_parts = [f"SELECT {select_fields} FROM {quote_identifier(table)}"]
+    values = {}
+    if where:
+        conditions = []
+        for key, val in where.items():
+            conditions.append(f'{quote_identifier(key)} = :{key}')
+            values[key] = val
+        query_parts.append("WHERE " + " AND ".join(conditions))
+    if order_by:
+        query_parts.append(f"ORDER BY {quote_identifier(order_by)} {'DESC' if desc else 'ASC'}")
+    if limit is not None:
+        query_parts.append("LIMIT :limit")
+        values["limit"] = limit
+    return " ".join(query_parts), values
+
+
+def _time(label: str, iterations: int, fn) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    per_call = (time.perf_counter() - started) / iterations
+    print(f"  {label:<34} {per_call * 1e6:8.1f} us/query")
+    return per_call
+
+
+def bench_client_side(iterations: int):
+    from databases.backends.postgres import PostgresBackend
+    from databases.core import Connection
+    from app.data.database import db_helpers
+
+    backend = PostgresBackend(os.environ["DATABASE_URL"])
+    compiler = backend.connection()
+
+    for operation, table, where, fields in SHAPES:
+        limit = 1 if operation == "select_one" else 100
+        print(f"{operation} on {table} ({', '.join(where) or 'no filter'}):")
+
+        def legacy():
+            query, values = _legacy_select_sql(table, where, fields, limit=limit)
+            compiler._compile(Connection._build_query(query, values))
+
+        def cached():
+            return db_helpers._select_sql(table, tuple(where), fields, None, False, True), [*where.values(), limit]
+
+        before = _time("before (dict SQL + databases)", iterations, legacy)
+        after = _time("after (shape cache)", iterations, cached)
+        print(f"  {'speedup':<34} {before / after:8.1f}x")
+
+    print(f"\nShape cache: {db_helpers.query_cache_info()['select']}")
+
+
+async def bench_live(iterations: int):
+    from app.data.database import core_db, db_helpers
+
+    await core_db.connect()
+    db = core_db.get_db()
+    try:
+        for operation, table, where, fields in SHAPES:
+            limit = 1 if operation == "select_one" else 100
+            print(f"{operation} on {table} ({', '.join(where) or 'no filter'}), round trip included:")
+
+            query, values = _legacy_select_sql(table, where, fields, limit=limit)
+            started = time.perf_counter()
+            for _ in range(iterations):
+                [dict(row) for row in await db.fetch_all(query, values)]
+            before = (time.perf_counter() - started) / iterations
+            print(f"  {'before (dict SQL + databases)':<34} {before * 1e6:8.1f} us/query")
+
+            started = time.perf_counter()
+            for _ in range(iterations):
+                await db_helpers.select(table, where=where, select_fields=fields, limit=limit)
+            after = (time.perf_counter() - started) / iterations
+            print(f"  {'after (shape cache, prepared)':<34} {after * 1e6:8.1f} us/query")
+            print(f"  {'speedup':<34} {before / after:8.1f}x")
+    finally:
+        await core_db.disconnect()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000, help="Client-side runs per shape and path")
+    parser.add_argument("--live-iterations", type=int, default=2000, help="Queries per shape and path with --live")
+    parser.add_argument("--live", action="store_true", help="Also run the queries against DATABASE_URL")
+    args = parser.parse_args()
+
+    from loguru import logger
+    logger.remove()  # Keep debug logging out of the measurement
+
+    print("Client-side overhead per query (no database round trip):")
+    bench_client_side(args.iterations)
+    if args.live:
+        print()
+        asyncio.run(bench_live(args.live_iterations))
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Benchmarks insight generation against the fake LLM server (scripts/fake_llm_server.py),
+offline and without quota. Runs synthetic PRs through ai_service.get_ai_insights with
+the configured concurrency, retries failed PRs like the insight job queue does, and
+measures event-loop lag while requests are in flight.
+
+Reports throughput, per-PR latency, outcomes, retries, circuit breaker rejections,
+streaming results and the server's own counters.
+
+Usage:
+    python scripts/fake_llm_server.py --latency-ms 800 --throttle-rate 0.05 &
+    python scripts/bench_insights.py --prs 200 --concurrency 32
+    python scripts/bench_insights.py --no-streaming --no-batching   # compare modes
+
+The response cache and incremental re-analysis are disabled, so every PR reaches the
+server and no database is needed.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+# Configuration is read when the app modules are imported
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ["INSIGHT_CACHE_ENABLED"] = "false"
+os.environ["AI_INCREMENTAL_ENABLED"] = "false"  # No insight fragments are stored or loaded
+os.environ.setdefault("DATABASE_URL", "postgresql://unused/unused")  # Not used: the cache and fragments are disabled
+
+# Add the parent directory to the path so we can import from app
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+
+def _percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+
+def _synthetic_pr(pr_number: int, files: int, rng: random.Random) -> dict:
+    kinds = ["app/services/{}.py", "tests/test_{}.py", "docs/{}.md", "config/{}.yaml", "migrations/{}.sql"]
+    files_changed = []
+    for index in range(files):
+        additions, deletions = rng.randint(1, 120), rng.randint(0, 60)
+        patch = "\n".join(f"+line {n} of change {index}" for n in range(min(additions, 40)))
+        files_changed.append({
+            "filename": rng.choice(kinds).format(f"module_{pr_number}_{index}"),
+            "status": "modified",
+            "additions": additions,
+            "deletions": deletions,
+            "changes": additions + deletions,
+            "patch": patch,
+        })
+    return {
+        "repo_id": "00000000-0000-0000-0000-000000000000",
+        "pr_number": pr_number,
+        "title": f"Synthetic change {pr_number}",
+        "author": "bench",
+        "branch_name": f"bench/{pr_number}",
+        "commit_sha": f"{pr_number:040x}",
+        "files_changed": files_changed,
+    }
+
+
+async def _monitor_loop_lag(interval: float, samples: list, stop: asyncio.Event):
+    """Measures how late the event loop wakes a sleeping task."""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(max(time.perf_counter() - started - interval, 0.0))
+
+
+async def _run_pr(ai_service, pr: dict, attempts: int, retry_delay: float, stats: dict) -> float:
+    started = time.perf_counter()
+    for attempt in range(1, attempts + 1):
+        stats["attempts"] += 1
+        try:
+            insight = await ai_service.get_ai_insights(pr)
+        except ai_service.CircuitOpenError as e:
+            # The job queue defers without counting the attempt
+            stats["deferred"] += 1
+            await asyncio.sleep(e.retry_after)
+            continue
+        if insight is ai_service.TRUNCATED_INSIGHT:
+            stats["truncated"] += 1
+            break
+        if insight:
+            stats["ok"] += 1
+            break
+        if attempt < attempts:
+            await asyncio.sleep(retry_delay * (2 ** (attempt - 1)))
+    else:
+        stats["failed"] += 1
+    return time.perf_counter() - started
+
+
+async def main(args):
+    from app.data.configs.app_settings import settings
+    settings.AI_STREAMING_ENABLED = args.streaming
+    settings.AI_BATCHING_ENABLED = args.batching
+    from app.services import ai_service, metrics
+    import httpx
+
+    if not ai_service.backend:
+        print("No LLM backend is configured. Set LLM_BACKEND=fake and start scripts/fake_llm_server.py.")
+        return 1
+
+    rng = random.Random(args.seed)
+    prs = [_synthetic_pr(number, rng.randint(1, args.max_files), rng) for number in range(1, args.prs + 1)]
+    stats = {"attempts": 0, "ok": 0, "truncated": 0, "failed": 0, "deferred": 0}
+    server_url = settings.FAKE_LLM_URL
+    async with httpx.AsyncClient(base_url=server_url) as http:
+        await http.post("/stats/reset")
+
+        lag_samples, stop = [], asyncio.Event()
+        monitor = asyncio.create_task(_monitor_loop_lag(0.01, lag_samples, stop))
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def _bounded(pr):
+            async with semaphore:
+                return await _run_pr(ai_service, pr, args.attempts, args.retry_delay, stats)
+
+        print(f"Running {len(prs)} PRs against {server_url} (concurrency {args.concurrency}, "
+              f"streaming {'on' if args.streaming else 'off'}, batching {'on' if args.batching else 'off'})")
+        started = time.perf_counter()
+        latencies = await asyncio.gather(*(_bounded(pr) for pr in prs))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await monitor
+        server_stats = (await http.get("/stats")).json()
+
+    print(f"\nWall time:        {elapsed:.2f}s")
+    print(f"Throughput:       {len(prs) / elapsed:.2f} PRs/s")
+    print(f"PR latency:       p50 {_percentile(latencies, 50):.2f}s  p95 {_percentile(latencies, 95):.2f}s  "
+          f"p99 {_percentile(latencies, 99):.2f}s  max {max(latencies):.2f}s")
+    print(f"Outcomes:         {stats['ok']} ok, {stats['truncated']} truncated, {stats['failed']} failed")
+    print(f"Attempts:         {stats['attempts']} ({stats['attempts'] / len(prs):.2f} per PR), "
+          f"{stats['deferred']} deferred by the open circuit")
+    print(f"Event loop lag:   p50 {_percentile(lag_samples, 50) * 1000:.1f}ms  p99 {_percentile(lag_samples, 99) * 1000:.1f}ms  "
+          f"max {max(lag_samples, default=0) * 1000:.1f}ms")
+    print(f"Circuit breaker:  {ai_service.circuit_breaker.snapshot()}")
+    stream_results = {
+        result: int(metrics.AI_STREAM_RESULTS.value(result=result))
+        for result in ("complete", "truncated", "no_json", "invalid_json")
+    }
+    print(f"Stream results:   {stream_results}")
+    print(f"Server counters:  {server_stats}")
+    return 0 if stats["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--prs", type=int, default=100, help="Number of synthetic PRs")
+    parser.add_argument("--concurrency", type=int, default=16, help="PRs in flight at once (like INSIGHT_WORKERS)")
+    parser.add_argument("--max-files", type=int, default=12, help="Maximum changed files per PR")
+    parser.add_argument("--attempts", type=int, default=3, help="Attempts per PR before it counts as failed")
+    parser.add_argument("--retry-delay", type=float, default=0.5, help="Base backoff between attempts in seconds")
+    parser.add_argument("--no-streaming", dest="streaming", action="store_false", help="Use unary requests")
+    parser.add_argument("--no-batching", dest="batching", action="store_false", help="Send every PR individually")
+    parser.add_argument("--seed", type=int, default=7)
+    sys.exit(asyncio.run(main(parser.parse_args())))
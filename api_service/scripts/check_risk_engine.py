@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Checks the provisional risk levels of the local risk engine on a few reference PRs,
+e.g. that docs-only and test-only PRs score low even when their paths mention
+auth or security.
+
+Usage:
+    python scripts/check_risk_engine.py
+
+Exits with status 1 if any PR gets a different risk level than expected.
+"""
+import os
+import sys
+
+os.environ.setdefault("DATABASE_URL", "postgresql://unused/unused")  # Not used: scoring is pure Python
+
+# Add the parent directory to the path so we can import from app
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services import risk_engine
+
+
+def _file(filename: str, additions: int = 20, deletions: int = 5, status: str = "modified") -> dict:
+    return {"filename": filename, "additions": additions, "deletions": deletions, "status": status}
+
+
+# (description, files_changed, expected risk level)
+CASES = [
+    ("security docs", [_file("docs/security.md", 1, 0)], "low"),
+    ("authors and authoring guide", [_file("AUTHORS", 2, 0), _file("docs/authoring.md", 40, 10)], "low"),
+    ("docs only", [_file("README.md", 120, 30), _file("SECURITY.md"), _file("docs/auth/login.md", 80, 20)], "low"),
+    ("tests only", [_file("tests/test_auth.py", 150, 20), _file("tests/test_permissions.py"), _file("src/login.test.ts")], "low"),
+    ("encrypted readme", [_file("encrypted_readme.md")], "low"),
+    ("author profile code", [_file("src/author_profile.py", 30, 5), _file("tests/test_author_profile.py", 30, 0)], "low"),
+    ("auth code without tests", [_file("app/auth/session.py", 60, 10), _file("app/security/jwt.py", 40, 5)], "high"),
+    ("migration and auth", [_file("db/migrations/002_users.sql", 40, 0), _file("app/services/auth_service.py", 80, 20)], "high"),
+]
+
+
+def main() -> int:
+    failures = 0
+    for description, files_changed, expected in CASES:
+        insight = risk_engine.assess({"files_changed": files_changed})
+        ok = insight["risk_level"] == expected
+        failures += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {description:<30} {insight['risk_level']:<7} (expected {expected}, score {insight['score']}): {insight['summary']}")
+    print(f"\n{len(CASES) - failures}/{len(CASES)} PRs scored as expected")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Gemini API, used with LLM_BACKEND=fake to benchmark insight
+throughput, retry behavior and event-loop impact offline (no network, no quota).
+
+Serves POST /v1/generate with {"model", "prompt", "max_output_tokens", "response_mime_type", "stream"}:
+  - non-streamed: {"text": ..., "finish_reason": "STOP" | "MAX_TOKENS"}
+  - streamed: newline-delimited JSON chunks of the same shape
+Batched prompts (sections starting with "=== PR #<n> in repository <id> ===") get a JSON array back.
+With response_mime_type "application/json" the output is bare JSON, as with Gemini's
+structured output; otherwise it is fenced and followed by commentary.
+GET /stats returns request counters; POST /stats/reset clears them.
+
+Simulated behavior:
+  - latency: log-normal time to first token (--latency-ms median, --latency-sigma spread)
+  - throttling: --rpm requests per minute, plus random 429s (--throttle-rate)
+  - server errors: random 500s (--error-rate)
+  - truncation: output cut short with finish_reason MAX_TOKENS (--truncate-rate)
+  - malformed JSON: a broken insight object (--malformed-rate)
+
+Usage:
+    python scripts/fake_llm_server.py --port 8090 --latency-ms 800 --throttle-rate 0.05
+    LLM_BACKEND=fake FAKE_LLM_URL=http://127.0.0.1:8090 python scripts/bench_insights.py
+"""
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RISK_LEVELS = ["low", "medium", "high"]
+TRAILING_TEXT = (
+    "\n\nNotes: the assessment above is based on the diff only. Runtime behavior, "
+    "deployment configuration and test coverage outside the changed files were not reviewed. "
+) * 4
+
+
+class FakeLLM:
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.lock = threading.Lock()
+        self.stats = Counter()
+        self.recent = deque()
+
+    def _random(self) -> float:
+        with self.lock:
+            return self.rng.random()
+
+    def latency(self) -> float:
+        with self.lock:
+            sample = self.rng.lognormvariate(math.log(max(self.args.latency_ms, 1)), self.args.latency_sigma)
+        return sample / 1000
+
+    def throttled(self) -> bool:
+        """Sliding one-minute window for --rpm, plus random throttling."""
+        now = time.monotonic()
+        with self.lock:
+            while self.recent and now - self.recent[0] > 60:
+                self.recent.popleft()
+            if self.args.rpm and len(self.recent) >= self.args.rpm:
+                return True
+            self.recent.append(now)
+        return self._random() < self.args.throttle_rate
+
+    def count(self, key: str, amount: int = 1):
+        with self.lock:
+            self.stats[key] += amount
+
+    def _insight(self, repo_id=None, pr_number=None) -> dict:
+        with self.lock:
+            risk = self.rng.choice(RISK_LEVELS)
+        insight = {
+            "risk_level": risk,
+            "summary": "Simulated analysis of the changed files.",
+            "recommendation": "Review the riskiest files first; this insight comes from the fake LLM server.",
+        }
+        if pr_number is not None:
+            insight = {"repo_id": repo_id, "pr_number": pr_number, **insight}
+        return insight
+
+    def completion(self, prompt: str, max_output_tokens: int, json_only: bool = False) -> tuple:
+        """Returns (text, finish_reason, kind) for a prompt."""
+        sections = re.findall(r"=== PR #(\d+) in repository (\S+) ===", prompt)
+        if sections:
+            body = json.dumps([self._insight(repo_id, int(n)) for n, repo_id in sections], indent=2)
+        else:
+            body = json.dumps(self._insight(), indent=2)
+
+        kind = "ok"
+        if self._random() < self.args.malformed_rate:
+            # A missing comma between fields, as models occasionally produce
+            body = re.sub(r'",(\n\s*"recommendation")', r'"\1', body, count=1)
+            kind = "malformed"
+        text = body if json_only else f"```json\n{body}\n```{TRAILING_TEXT}"
+
+        limit = max((max_output_tokens or 2048) * 4, 1)
+        if self._random() < self.args.truncate_rate:
+            return text[:max(len(body) // 2, 1)], "MAX_TOKENS", "truncated"
+        if len(text) > limit:
+            return text[:limit], "MAX_TOKENS", "truncated"
+        return text, "STOP", kind
+
+
+def make_handler(llm: FakeLLM):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            if llm.args.verbose:
+                super().log_message(format, *args)
+
+        def _send_json(self, status: int, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _send_error(self, status: int, message: str, reason: str):
+            self._send_json(status, {"error": {"code": status, "message": message, "status": reason}})
+
+        def do_GET(self):
+            if self.path == "/stats":
+                with llm.lock:
+                    self._send_json(200, dict(llm.stats))
+            else:
+                self._send_error(404, "Not found", "NOT_FOUND")
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            raw = self.rfile.read(length) if length else b""
+            if self.path == "/stats/reset":
+                with llm.lock:
+                    llm.stats.clear()
+                self._send_json(200, {})
+                return
+            if self.path != "/v1/generate":
+                self._send_error(404, "Not found", "NOT_FOUND")
+                return
+
+            request = json.loads(raw or b"{}")
+            llm.count("requests")
+            if llm.throttled():
+                llm.count("throttled")
+                self._send_error(429, "Resource has been exhausted (fake quota).", "RESOURCE_EXHAUSTED")
+                return
+            time.sleep(llm.latency())
+            if llm._random() < llm.args.error_rate:
+                llm.count("server_errors")
+                self._send_error(500, "Internal error (fake).", "INTERNAL")
+                return
+
+            text, finish_reason, kind = llm.completion(
+                request.get("prompt", ""),
+                request.get("max_output_tokens"),
+                json_only=request.get("response_mime_type") == "application/json",
+            )
+            llm.count(kind)
+            if request.get("stream"):
+                self._stream(text, finish_reason)
+            else:
+                llm.count("chars_sent", len(text))
+                self._send_json(200, {"text": text, "finish_reason": finish_reason})
+
+        def _stream(self, text: str, finish_reason: str):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            size = max(llm.args.chunk_chars, 1)
+            pieces = [text[i:i + size] for i in range(0, len(text), size)] or [""]
+            try:
+                for index, piece in enumerate(pieces):
+                    last = index == len(pieces) - 1
+                    line = json.dumps({"text": piece, "finish_reason": finish_reason if last else None}) + "\n"
+                    data = line.encode()
+                    self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                    self.wfile.flush()
+                    llm.count("chars_sent", len(piece))
+                    if not last:
+                        time.sleep(llm.args.chunk_delay_ms / 1000)
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                # The client stopped reading early (streamed insight already complete)
+                llm.count("streams_closed_early")
+                self.close_connection = True
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency-ms", type=float, default=800, help="Median time to first token")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="Log-normal spread of the latency")
+    parser.add_argument("--chunk-chars", type=int, default=24, help="Characters per streamed chunk")
+    parser.add_argument("--chunk-delay-ms", type=float, default=15, help="Delay between streamed chunks")
+    parser.add_argument("--rpm", type=int, default=0, help="Requests per minute before 429s (0 = unlimited)")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of requests answered with 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 500")
+    parser.add_argument("--truncate-rate", type=float, default=0.0, help="Share of responses cut at MAX_TOKENS")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="Share of responses with broken JSON")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(FakeLLM(args)))
+    server.daemon_threads = True
+    print(f"Fake LLM server listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+-- ================================
+-- Persistent Insight Cache
+-- ================================
+-- Safe to re-run. Apply once to an existing database created from docs/schema.sql.
+--
+-- Second tier of the api_service insight cache (the first is an in-memory LRU).
+-- Keyed by a SHA-256 of the prompt inputs (commit sha, normalized files_changed
+-- digest, PR metadata, model and prompt template), so re-analysing the same diff
+-- returns the stored insight without calling Gemini. Expired rows are purged
+-- periodically by the api_service.
+
+CREATE TABLE IF NOT EXISTS insight_cache (
+    cache_key TEXT PRIMARY KEY,                   -- SHA-256 hex digest of the prompt inputs
+    insight JSONB NOT NULL,                       -- {risk_level, summary, recommendation}
+    model TEXT,                                   -- Model that produced the insight
+    created_at TIMESTAMPTZ DEFAULT now(),
+    expires_at TIMESTAMPTZ NOT NULL               -- Entries are ignored and purged after this time
+);
+
+-- Purging deletes by expiry
+CREATE INDEX IF NOT EXISTS idx_insight_cache_expires ON insight_cache (expires_at);
+
+COMMENT ON TABLE insight_cache IS 'Content-addressed cache of AI insights keyed by commit and diff fingerprint';
@@ -0,0 +1,23 @@
+-- ================================
+-- Per-File Insight Fragments
+-- ================================
+-- Safe to re-run. Apply once to an existing database created from docs/schema.sql.
+--
+-- Records which file patches the api_service has already analysed, keyed by file
+-- path and patch hash. When a PR receives new commits, only files whose patch is
+-- not covered here are sent to Gemini again; the rest are summarised from their
+-- stored fragment and the previous insight.
+
+CREATE TABLE IF NOT EXISTS insight_file_fragments (
+    repo_id UUID NOT NULL REFERENCES repositories(id) ON DELETE CASCADE,
+    filename TEXT NOT NULL,
+    patch_hash TEXT NOT NULL,                     -- SHA-256 hex digest of the file's patch
+    risk_level TEXT CHECK (risk_level IN ('low', 'medium', 'high')),  -- NULL when only the whole PR was rated
+    note TEXT,                                    -- One-line per-file finding, if any
+    commit_sha TEXT,                              -- Commit whose analysis produced the fragment
+    model TEXT,                                   -- Model that produced the fragment
+    created_at TIMESTAMPTZ DEFAULT now(),
+    PRIMARY KEY (repo_id, filename, patch_hash)
+);
+
+COMMENT ON TABLE insight_file_fragments IS 'Per-file AI analysis fragments reused by incremental insight generation';
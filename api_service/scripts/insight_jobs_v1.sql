@@ -0,0 +1,30 @@
+-- ================================
+-- Durable Insight Job Queue
+-- ================================
+-- Safe to re-run. Apply once to an existing database created from docs/schema.sql.
+--
+-- Replaces the in-memory retry dict of the api_service. Each row is one pending
+-- insight generation for a PR; workers claim due rows with FOR UPDATE SKIP LOCKED,
+-- so retries survive restarts and are shared between workers and replicas.
+
+CREATE TABLE IF NOT EXISTS insight_jobs (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    repo_id UUID NOT NULL REFERENCES repositories(id) ON DELETE CASCADE,
+    pr_number INT NOT NULL,
+    attempts INT DEFAULT 0,                       -- Attempts made so far (incremented on claim)
+    next_attempt_at TIMESTAMPTZ DEFAULT now(),    -- When the job is due; pushed forward while claimed
+    last_error TEXT,                              -- Reason of the most recent failure
+    claimed_by TEXT,                              -- Worker currently running the job
+    requeued BOOLEAN DEFAULT FALSE,               -- Enqueued again while claimed; the holder releases it
+    created_at TIMESTAMPTZ DEFAULT now(),
+    updated_at TIMESTAMPTZ DEFAULT now(),
+    UNIQUE (repo_id, pr_number)                   -- At most one pending job per PR
+);
+
+-- Databases that applied an earlier version of this script
+ALTER TABLE insight_jobs ADD COLUMN IF NOT EXISTS requeued BOOLEAN DEFAULT FALSE;
+
+-- The scheduler always asks for the earliest due job
+CREATE INDEX IF NOT EXISTS idx_insight_jobs_due ON insight_jobs (next_attempt_at);
+
+COMMENT ON TABLE insight_jobs IS 'Durable, time-ordered queue of pending AI insight generations and retries';
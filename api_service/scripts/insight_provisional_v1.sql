@@ -0,0 +1,12 @@
+-- ================================
+-- Provisional Insights
+-- ================================
+-- Safe to re-run. Apply once to an existing database created from docs/schema.sql.
+--
+-- New PRs get a rule-based insight from the api_service risk engine as soon as they
+-- are seen. It is stored with provisional = TRUE and updated in place, with
+-- provisional = FALSE, when the Gemini insight is ready.
+
+ALTER TABLE insights ADD COLUMN IF NOT EXISTS provisional BOOLEAN DEFAULT FALSE;
+
+COMMENT ON COLUMN insights.provisional IS 'TRUE while the insight is the rule-based estimate awaiting the AI result';
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Simulates the poller's claim scheduling under a steady event rate and checks that
+no row waits longer than a bound before it is processed.
+
+Events arrive as a Poisson stream, with --hot-share of them going to one busy
+repository. Each poll cycle claims one batch (the same selection the poller uses)
+and takes --cycle-seconds to process it. Rows still pending when the simulation
+ends count with the time they have waited so far, so starvation is not hidden.
+
+Usage:
+    python scripts/simulate_fair_scheduling.py --rate 45 --bound 10
+    python scripts/simulate_fair_scheduling.py --mode newest   # shows starvation
+
+Exits with status 1 if the maximum wait exceeds --bound.
+"""
+import argparse
+import os
+import random
+import sys
+from datetime import datetime, timedelta, timezone
+
+# Add the parent directory to the path so we can import from app
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services.fair_scheduler import fair_select
+
+
+def _generate_events(rate: float, duration: float, repos: int, hot_share: float, rng: random.Random) -> list:
+    events = []
+    t = 0.0
+    while True:
+        t += rng.expovariate(rate)
+        if t >= duration:
+            return events
+        repo = 0 if rng.random() < hot_share else rng.randrange(1, repos)
+        events.append({"id": len(events), "repo_id": f"repo-{repo}", "arrived": t})
+
+
+def _select(mode: str, pending: list, batch_size: int, candidate_factor: int, now: float, start: datetime, max_wait: float) -> list:
+    if mode == "newest":
+        return [row["id"] for row in pending[-batch_size:]]
+
+    candidates = [
+        {"id": row["id"], "repo_id": row["repo_id"], "updated_at": start + timedelta(seconds=row["arrived"])}
+        for row in pending[:batch_size * candidate_factor]
+    ]
+    return fair_select(candidates, batch_size, "updated_at", start + timedelta(seconds=now), max_wait)
+
+
+def simulate(args, mode: str) -> dict:
+    rng = random.Random(args.seed)
+    events = _generate_events(args.rate, args.duration, args.repos, args.hot_share, rng)
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+    pending = []  # oldest first, like the candidate query
+    next_event = 0
+    now = 0.0
+    waits = []
+    other_waits = []
+
+    while now < args.duration:
+        while next_event < len(events) and events[next_event]["arrived"] <= now:
+            pending.append(events[next_event])
+            next_event += 1
+
+        chosen = set(_select(mode, pending, args.batch_size, args.candidate_factor, now, start, args.max_wait))
+        done_at = now + args.cycle_seconds
+        remaining = []
+        for row in pending:
+            if row["id"] in chosen:
+                wait = done_at - row["arrived"]
+                waits.append(wait)
+                if row["repo_id"] != "repo-0":
+                    other_waits.append(wait)
+            else:
+                remaining.append(row)
+        pending = remaining
+        now = done_at if chosen else now + args.cycle_seconds
+
+    # Rows never processed have been waiting since they arrived
+    pending.extend(events[next_event:])
+    starved = [args.duration - row["arrived"] for row in pending]
+    all_waits = waits + starved
+    all_waits.sort()
+    return {
+        "events": len(events),
+        "processed": len(waits),
+        "pending_at_end": len(pending),
+        "max_wait": all_waits[-1] if all_waits else 0.0,
+        "p99_wait": all_waits[int(len(all_waits) * 0.99) - 1] if all_waits else 0.0,
+        "max_wait_other_repos": max(other_waits) if other_waits else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["fair", "newest"], default="fair")
+    parser.add_argument("--rate", type=float, default=45, help="events per second across all repositories")
+    parser.add_argument("--duration", type=float, default=600, help="simulated seconds")
+    parser.add_argument("--repos", type=int, default=20)
+    parser.add_argument("--hot-share", type=float, default=0.7, help="share of events from the busiest repository")
+    parser.add_argument("--batch-size", type=int, default=10)
+    parser.add_argument("--cycle-seconds", type=float, default=0.2, help="time to process one batch")
+    parser.add_argument("--candidate-factor", type=int, default=5, help="POLL_FAIR_CANDIDATE_FACTOR")
+    parser.add_argument("--max-wait", type=float, default=5, help="POLL_MAX_WAIT_SECONDS")
+    parser.add_argument("--bound", type=float, default=10, help="maximum allowed wait in seconds")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    capacity = args.batch_size / args.cycle_seconds
+    print(f"Mode: {args.mode}, rate {args.rate}/s, capacity {capacity:.0f}/s (load {args.rate / capacity:.0%}), "
+          f"{args.repos} repositories, {args.hot_share:.0%} from the busiest")
+
+    result = simulate(args, args.mode)
+    print(f"Events: {result['events']}, processed: {result['processed']}, pending at end: {result['pending_at_end']}")
+    print(f"Max wait: {result['max_wait']:.2f}s, p99 wait: {result['p99_wait']:.2f}s, "
+          f"max wait outside the busiest repository: {result['max_wait_other_repos']:.2f}s")
+
+    if result["max_wait"] > args.bound:
+        print(f"FAIL: a row waited {result['max_wait']:.2f}s, bound is {args.bound}s")
+        sys.exit(1)
+    print(f"OK: no row waited longer than {args.bound}s")
+
+
+if __name__ == "__main__":
+    main()
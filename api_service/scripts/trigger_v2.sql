@@ -0,0 +1,94 @@
+-- ================================
+-- Poller Support: Claim Columns and Change Notification Triggers
+-- ================================
+-- Safe to re-run. Apply once to an existing database created from docs/schema.sql.
+
+-- ---
+-- Part 1: Claim/lease columns
+-- ---
+-- Each api_service worker claims a batch of unprocessed rows by stamping them with
+-- its worker id and a lease expiry (FOR UPDATE SKIP LOCKED), so several workers or
+-- replicas can share the backlog without processing the same row twice.
+ALTER TABLE pull_requests ADD COLUMN IF NOT EXISTS claimed_by TEXT;
+ALTER TABLE pull_requests ADD COLUMN IF NOT EXISTS claim_expires_at TIMESTAMPTZ;
+ALTER TABLE pipeline_runs ADD COLUMN IF NOT EXISTS claimed_by TEXT;
+ALTER TABLE pipeline_runs ADD COLUMN IF NOT EXISTS claim_expires_at TIMESTAMPTZ;
+ALTER TABLE insights ADD COLUMN IF NOT EXISTS claimed_by TEXT;
+ALTER TABLE insights ADD COLUMN IF NOT EXISTS claim_expires_at TIMESTAMPTZ;
+
+-- A new write from the ingestion service (processed = FALSE, lease untouched) drops
+-- any claim on the row. The worker holding the old claim then fails to acknowledge
+-- it, and the newer version is processed again instead of being lost.
+CREATE OR REPLACE FUNCTION reset_flowlens_claim() RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.processed = FALSE AND NEW.claim_expires_at IS NOT DISTINCT FROM OLD.claim_expires_at THEN
+        NEW.claimed_by := NULL;
+        NEW.claim_expires_at := NULL;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_pull_requests_reset_claim ON pull_requests;
+CREATE TRIGGER trg_pull_requests_reset_claim
+    BEFORE UPDATE ON pull_requests
+    FOR EACH ROW
+    EXECUTE FUNCTION reset_flowlens_claim();
+
+DROP TRIGGER IF EXISTS trg_pipeline_runs_reset_claim ON pipeline_runs;
+CREATE TRIGGER trg_pipeline_runs_reset_claim
+    BEFORE UPDATE ON pipeline_runs
+    FOR EACH ROW
+    EXECUTE FUNCTION reset_flowlens_claim();
+
+DROP TRIGGER IF EXISTS trg_insights_reset_claim ON insights;
+CREATE TRIGGER trg_insights_reset_claim
+    BEFORE UPDATE ON insights
+    FOR EACH ROW
+    EXECUTE FUNCTION reset_flowlens_claim();
+
+-- ---
+-- Part 2: Change notifications
+-- ---
+-- The api_service LISTENs on the 'flowlens_events' channel (EVENT_NOTIFY_CHANNEL)
+-- and wakes its poller as soon as one of these triggers fires, instead of
+-- waiting for the next poll interval. The payload is the table name.
+
+-- 1. Create the function that will be triggered
+CREATE OR REPLACE FUNCTION notify_flowlens_change() RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('flowlens_events', TG_TABLE_NAME);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 2. Fire only for writes that leave the row unprocessed and immediately claimable
+-- (new events for the poller). Claims and delayed releases by the poller itself
+-- set claim_expires_at and therefore do not notify.
+-- Drop the triggers first to ensure idempotency on re-runs.
+DROP TRIGGER IF EXISTS trg_pull_requests_notify ON pull_requests;
+CREATE TRIGGER trg_pull_requests_notify
+    AFTER INSERT OR UPDATE ON pull_requests
+    FOR EACH ROW
+    WHEN (NEW.processed = FALSE AND NEW.claim_expires_at IS NULL)
+    EXECUTE FUNCTION notify_flowlens_change();
+
+DROP TRIGGER IF EXISTS trg_pipeline_runs_notify ON pipeline_runs;
+CREATE TRIGGER trg_pipeline_runs_notify
+    AFTER INSERT OR UPDATE ON pipeline_runs
+    FOR EACH ROW
+    WHEN (NEW.processed = FALSE AND NEW.claim_expires_at IS NULL)
+    EXECUTE FUNCTION notify_flowlens_change();
+
+DROP TRIGGER IF EXISTS trg_insights_notify ON insights;
+CREATE TRIGGER trg_insights_notify
+    AFTER INSERT OR UPDATE ON insights
+    FOR EACH ROW
+    WHEN (NEW.processed = FALSE AND NEW.claim_expires_at IS NULL)
+    EXECUTE FUNCTION notify_flowlens_change();
+
+COMMENT ON FUNCTION reset_flowlens_claim IS 'Drops a poller claim when the row is rewritten with processed = FALSE by the ingestion service.';
+COMMENT ON FUNCTION notify_flowlens_change IS 'Sends a pg_notify signal with the table name when a row needs processing by the API service.';
+COMMENT ON TRIGGER trg_pull_requests_notify ON pull_requests IS 'Wakes the API service poller when a pull request is written with processed = FALSE.';
+COMMENT ON TRIGGER trg_pipeline_runs_notify ON pipeline_runs IS 'Wakes the API service poller when a pipeline run is written with processed = FALSE.';
+COMMENT ON TRIGGER trg_insights_notify ON insights IS 'Wakes the API service poller when an insight is written with processed = FALSE.';
@@ -50,7 +50,10 @@ CREATE TABLE insights (
     risk_level TEXT CHECK (risk_level IN ('low', 'medium', 'high')),
     summary TEXT,                      -- One-line description from Gemini
     recommendation TEXT,               -- Suggested action from Gemini
+    provisional BOOLEAN DEFAULT FALSE, -- Rule-based insight awaiting the Gemini result
     processed BOOLEAN DEFAULT FALSE,   -- Flag for polling system
+    claimed_by TEXT,                   -- Poller worker currently holding the row
+    claim_expires_at TIMESTAMPTZ,      -- Lease expiry; expired claims can be taken over
     created_at TIMESTAMPTZ DEFAULT now()
 );
 
@@ -78,6 +81,8 @@ CREATE TABLE pipeline_runs (
     status_merge TEXT DEFAULT 'pending',    -- Merged stage
     history JSONB DEFAULT '[]'::jsonb,      -- Timeline of status changes (small audit trail)
     processed BOOLEAN DEFAULT FALSE,        -- Flag for polling system
+    claimed_by TEXT,                        -- Poller worker currently holding the row
+    claim_expires_at TIMESTAMPTZ,           -- Lease expiry; expired claims can be taken over
     created_at TIMESTAMPTZ DEFAULT now(),
     updated_at TIMESTAMPTZ DEFAULT now(),
     UNIQUE (repo_id, pr_number)             -- One pipeline per PR per repository
@@ -123,6 +128,8 @@ CREATE TABLE pull_requests (
     closed_at TIMESTAMPTZ,                              -- When PR was closed
     history JSONB DEFAULT '[]'::jsonb,                   -- Timeline of PR-level changes (audit trail)
     processed BOOLEAN DEFAULT FALSE,                     -- Flag for polling system
+    claimed_by TEXT,                                     -- Poller worker currently holding the row
+    claim_expires_at TIMESTAMPTZ,                        -- Lease expiry; expired claims can be taken over
     created_at TIMESTAMPTZ DEFAULT now(),
     updated_at TIMESTAMPTZ DEFAULT now(),
     UNIQUE (repo_id, pr_number)                         -- One PR per number per repository
@@ -134,6 +141,61 @@ CREATE INDEX idx_pr_repo_state ON pull_requests (repo_id, state);
 CREATE INDEX idx_pr_author ON pull_requests (author);
 CREATE INDEX idx_pr_processed ON pull_requests (processed, updated_at DESC) WHERE processed = FALSE;
 
+-- ================================
+-- Table 5: Insight Jobs (Durable Retry Queue)
+-- ================================
+
+-- Pending insight generations and retries, claimed by API service workers
+CREATE TABLE insight_jobs (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    repo_id UUID NOT NULL REFERENCES repositories(id) ON DELETE CASCADE,
+    pr_number INT NOT NULL,
+    attempts INT DEFAULT 0,                       -- Attempts made so far (incremented on claim)
+    next_attempt_at TIMESTAMPTZ DEFAULT now(),    -- When the job is due; pushed forward while claimed
+    last_error TEXT,                              -- Reason of the most recent failure
+    claimed_by TEXT,                              -- Worker currently running the job
+    requeued BOOLEAN DEFAULT FALSE,               -- Enqueued again while claimed; the holder releases it
+    created_at TIMESTAMPTZ DEFAULT now(),
+    updated_at TIMESTAMPTZ DEFAULT now(),
+    UNIQUE (repo_id, pr_number)                   -- At most one pending job per PR
+);
+
+-- Index for the retry scheduler (earliest due job first)
+CREATE INDEX idx_insight_jobs_due ON insight_jobs (next_attempt_at);
+
+-- ================================
+-- Table 6: Insight Cache
+-- ================================
+
+-- AI insights keyed by a hash of the prompt inputs (commit sha + files_changed digest)
+CREATE TABLE insight_cache (
+    cache_key TEXT PRIMARY KEY,                   -- SHA-256 hex digest of the prompt inputs
+    insight JSONB NOT NULL,                       -- {risk_level, summary, recommendation}
+    model TEXT,                                   -- Model that produced the insight
+    created_at TIMESTAMPTZ DEFAULT now(),
+    expires_at TIMESTAMPTZ NOT NULL               -- Entries are ignored and purged after this time
+);
+
+-- Index for purging expired entries
+CREATE INDEX idx_insight_cache_expires ON insight_cache (expires_at);
+
+-- ================================
+-- Table 7: Per-File Insight Fragments
+-- ================================
+
+-- Per-file analysis keyed by file path and patch hash, reused when a PR gets new commits
+CREATE TABLE insight_file_fragments (
+    repo_id UUID NOT NULL REFERENCES repositories(id) ON DELETE CASCADE,
+    filename TEXT NOT NULL,
+    patch_hash TEXT NOT NULL,                     -- SHA-256 hex digest of the file's patch
+    risk_level TEXT CHECK (risk_level IN ('low', 'medium', 'high')),  -- NULL when only the whole PR was rated
+    note TEXT,                                    -- One-line per-file finding, if any
+    commit_sha TEXT,                              -- Commit whose analysis produced the fragment
+    model TEXT,                                   -- Model that produced the fragment
+    created_at TIMESTAMPTZ DEFAULT now(),
+    PRIMARY KEY (repo_id, filename, patch_hash)
+);
+
 -- ================================
 -- Comments for Clarity
 -- ================================
@@ -142,7 +204,11 @@ COMMENT ON TABLE repositories IS 'GitHub repositories tracked by the system with
 COMMENT ON TABLE insights IS 'AI-generated insights from Gemini API for each PR';
 COMMENT ON TABLE pipeline_runs IS 'Tracks PR workflow status: Created → Build → Approval → Merged';
 COMMENT ON TABLE pull_requests IS 'Essential PR data for Flutter app with repository relationship';
+COMMENT ON TABLE insight_jobs IS 'Durable, time-ordered queue of pending AI insight generations and retries';
+COMMENT ON TABLE insight_cache IS 'Content-addressed cache of AI insights keyed by commit and diff fingerprint';
+COMMENT ON TABLE insight_file_fragments IS 'Per-file AI analysis fragments reused by incremental insight generation';
 
 COMMENT ON COLUMN insights.processed IS 'Flag to track if this insight has been processed by the API service polling system';
 COMMENT ON COLUMN pipeline_runs.processed IS 'Flag to track if this pipeline run has been processed by the API service polling system';
 COMMENT ON COLUMN pull_requests.processed IS 'Flag to track if this PR has been processed by the API service polling system';
+COMMENT ON COLUMN pull_requests.claimed_by IS 'API service worker that has claimed this row for processing (see api_service/scripts/trigger_v2.sql)';